@@ -4,6 +4,7 @@ from .models import *
 
 # Register your models here.
 
+admin.site.register(Appointment)
 admin.site.register(StudentAppointment)
 admin.site.register(EmployeeAppointment)
 admin.site.register(VisitorAppointment)
\ No newline at end of file
@@ -0,0 +1,209 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:49
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import UnaccentExtension
+from django.db import migrations
+
+
+# Text search configuration used by the appointment search documents: Portuguese stemming
+# applied to unaccented words, so "febre" matches "Febres" and "joao" matches "João".
+CREATE_SEARCH_CONFIGURATION = '''
+CREATE TEXT SEARCH CONFIGURATION portuguese_unaccent (COPY = portuguese);
+ALTER TEXT SEARCH CONFIGURATION portuguese_unaccent
+    ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+'''
+
+DROP_SEARCH_CONFIGURATION = 'DROP TEXT SEARCH CONFIGURATION IF EXISTS portuguese_unaccent;'
+
+# The search document of each appointment is computed by a BEFORE INSERT OR UPDATE trigger.
+# Weights: A = patient name, B = class group/department/relationship, C = clinical text,
+# D = infirmary and nurse.
+CREATE_APPOINTMENT_TRIGGERS = '''
+CREATE FUNCTION appointments_student_search_document() RETURNS trigger AS $$
+DECLARE
+    patient_name text;
+    group_name text;
+BEGIN
+    SELECT s.name, g.name INTO patient_name, group_name
+    FROM patients_student s LEFT JOIN patients_classgroup g ON g.id = s.class_group_id
+    WHERE s.id = NEW.student_id;
+    NEW.search_document :=
+        setweight(to_tsvector('portuguese_unaccent', coalesce(patient_name, '')), 'A') ||
+        setweight(to_tsvector('portuguese_unaccent', concat_ws(' ', group_name, NEW.current_class)), 'B') ||
+        setweight(to_tsvector('portuguese_unaccent', concat_ws(' ', NEW.reason, NEW.treatment, NEW.notes)), 'C') ||
+        setweight(to_tsvector('portuguese_unaccent', concat_ws(' ', NEW.infirmary, NEW.nurse)), 'D');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION appointments_employee_search_document() RETURNS trigger AS $$
+DECLARE
+    patient_name text;
+    department_name text;
+BEGIN
+    SELECT e.name, d.name INTO patient_name, department_name
+    FROM patients_employee e LEFT JOIN patients_department d ON d.id = e.department_id
+    WHERE e.id = NEW.employee_id;
+    NEW.search_document :=
+        setweight(to_tsvector('portuguese_unaccent', coalesce(patient_name, '')), 'A') ||
+        setweight(to_tsvector('portuguese_unaccent', coalesce(department_name, '')), 'B') ||
+        setweight(to_tsvector('portuguese_unaccent', concat_ws(' ', NEW.reason, NEW.treatment, NEW.notes)), 'C') ||
+        setweight(to_tsvector('portuguese_unaccent', concat_ws(' ', NEW.infirmary, NEW.nurse)), 'D');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION appointments_visitor_search_document() RETURNS trigger AS $$
+DECLARE
+    patient_name text;
+    patient_relationship text;
+BEGIN
+    SELECT v.name, v.relationship INTO patient_name, patient_relationship
+    FROM patients_visitor v
+    WHERE v.id = NEW.visitor_id;
+    NEW.search_document :=
+        setweight(to_tsvector('portuguese_unaccent', coalesce(patient_name, '')), 'A') ||
+        setweight(to_tsvector('portuguese_unaccent', coalesce(patient_relationship, '')), 'B') ||
+        setweight(to_tsvector('portuguese_unaccent', concat_ws(' ', NEW.reason, NEW.treatment, NEW.notes)), 'C') ||
+        setweight(to_tsvector('portuguese_unaccent', concat_ws(' ', NEW.infirmary, NEW.nurse)), 'D');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER student_appointment_search_document
+    BEFORE INSERT OR UPDATE ON appointments_studentappointment
+    FOR EACH ROW EXECUTE FUNCTION appointments_student_search_document();
+CREATE TRIGGER employee_appointment_search_document
+    BEFORE INSERT OR UPDATE ON appointments_employeeappointment
+    FOR EACH ROW EXECUTE FUNCTION appointments_employee_search_document();
+CREATE TRIGGER visitor_appointment_search_document
+    BEFORE INSERT OR UPDATE ON appointments_visitorappointment
+    FOR EACH ROW EXECUTE FUNCTION appointments_visitor_search_document();
+'''
+
+DROP_APPOINTMENT_TRIGGERS = '''
+DROP TRIGGER IF EXISTS student_appointment_search_document ON appointments_studentappointment;
+DROP TRIGGER IF EXISTS employee_appointment_search_document ON appointments_employeeappointment;
+DROP TRIGGER IF EXISTS visitor_appointment_search_document ON appointments_visitorappointment;
+DROP FUNCTION IF EXISTS appointments_student_search_document();
+DROP FUNCTION IF EXISTS appointments_employee_search_document();
+DROP FUNCTION IF EXISTS appointments_visitor_search_document();
+'''
+
+# Patient data copied into the documents (names, class group, department, relationship) is
+# refreshed by touching the affected appointments, which fires the triggers above.
+CREATE_PATIENT_TRIGGERS = '''
+CREATE FUNCTION appointments_refresh_student_documents() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'patients_classgroup' THEN
+        UPDATE appointments_studentappointment a SET search_document = NULL
+        FROM patients_student s WHERE a.student_id = s.id AND s.class_group_id = NEW.id;
+    ELSE
+        UPDATE appointments_studentappointment SET search_document = NULL WHERE student_id = NEW.id;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION appointments_refresh_employee_documents() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'patients_department' THEN
+        UPDATE appointments_employeeappointment a SET search_document = NULL
+        FROM patients_employee e WHERE a.employee_id = e.id AND e.department_id = NEW.id;
+    ELSE
+        UPDATE appointments_employeeappointment SET search_document = NULL WHERE employee_id = NEW.id;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION appointments_refresh_visitor_documents() RETURNS trigger AS $$
+BEGIN
+    UPDATE appointments_visitorappointment SET search_document = NULL WHERE visitor_id = NEW.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER student_search_documents
+    AFTER UPDATE ON patients_student FOR EACH ROW
+    WHEN (OLD.name IS DISTINCT FROM NEW.name OR OLD.class_group_id IS DISTINCT FROM NEW.class_group_id)
+    EXECUTE FUNCTION appointments_refresh_student_documents();
+CREATE TRIGGER classgroup_search_documents
+    AFTER UPDATE ON patients_classgroup FOR EACH ROW
+    WHEN (OLD.name IS DISTINCT FROM NEW.name)
+    EXECUTE FUNCTION appointments_refresh_student_documents();
+CREATE TRIGGER employee_search_documents
+    AFTER UPDATE ON patients_employee FOR EACH ROW
+    WHEN (OLD.name IS DISTINCT FROM NEW.name OR OLD.department_id IS DISTINCT FROM NEW.department_id)
+    EXECUTE FUNCTION appointments_refresh_employee_documents();
+CREATE TRIGGER department_search_documents
+    AFTER UPDATE ON patients_department FOR EACH ROW
+    WHEN (OLD.name IS DISTINCT FROM NEW.name)
+    EXECUTE FUNCTION appointments_refresh_employee_documents();
+CREATE TRIGGER visitor_search_documents
+    AFTER UPDATE ON patients_visitor FOR EACH ROW
+    WHEN (OLD.name IS DISTINCT FROM NEW.name OR OLD.relationship IS DISTINCT FROM NEW.relationship)
+    EXECUTE FUNCTION appointments_refresh_visitor_documents();
+'''
+
+DROP_PATIENT_TRIGGERS = '''
+DROP TRIGGER IF EXISTS student_search_documents ON patients_student;
+DROP TRIGGER IF EXISTS classgroup_search_documents ON patients_classgroup;
+DROP TRIGGER IF EXISTS employee_search_documents ON patients_employee;
+DROP TRIGGER IF EXISTS department_search_documents ON patients_department;
+DROP TRIGGER IF EXISTS visitor_search_documents ON patients_visitor;
+DROP FUNCTION IF EXISTS appointments_refresh_student_documents();
+DROP FUNCTION IF EXISTS appointments_refresh_employee_documents();
+DROP FUNCTION IF EXISTS appointments_refresh_visitor_documents();
+'''
+
+# Backfill of the existing appointments (the UPDATE fires the triggers).
+BACKFILL_SEARCH_DOCUMENTS = '''
+UPDATE appointments_studentappointment SET search_document = NULL;
+UPDATE appointments_employeeappointment SET search_document = NULL;
+UPDATE appointments_visitorappointment SET search_document = NULL;
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0001_initial'),
+        ('patients', '0001_initial'),
+    ]
+
+    operations = [
+        UnaccentExtension(),
+        migrations.RunSQL(CREATE_SEARCH_CONFIGURATION, DROP_SEARCH_CONFIGURATION),
+        migrations.AddField(
+            model_name='employeeappointment',
+            name='search_document',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='studentappointment',
+            name='search_document',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='visitorappointment',
+            name='search_document',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='employeeappointment',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_document'], name='employee_appt_search_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='studentappointment',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_document'], name='student_appt_search_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='visitorappointment',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_document'], name='visitor_appt_search_gin'),
+        ),
+        migrations.RunSQL(CREATE_APPOINTMENT_TRIGGERS, DROP_APPOINTMENT_TRIGGERS),
+        migrations.RunSQL(CREATE_PATIENT_TRIGGERS, DROP_PATIENT_TRIGGERS),
+        migrations.RunSQL(BACKFILL_SEARCH_DOCUMENTS, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.0.7 on 2026-10-18 09:05
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def populate_daily_stats(apps, schema_editor):
+    # Same aggregation as controller.crud.rebuild_daily_stats, on the historical models
+    DailyAppointmentStats = apps.get_model('appointments', 'DailyAppointmentStats')
+    rows = []
+    for model_name, patient_type in (('StudentAppointment', 'student'), ('EmployeeAppointment', 'employee'),
+                                     ('VisitorAppointment', 'visitor')):
+        grouped = (
+            apps.get_model('appointments', model_name).objects
+            .annotate(day=TruncDate('date'))
+            .values('day', 'infirmary', 'nurse')
+            .annotate(count=Count('id'))
+            .order_by()
+        )
+        rows.extend(DailyAppointmentStats(patient_type=patient_type, **row) for row in grouped)
+    DailyAppointmentStats.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0002_appointment_search_document'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAppointmentStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('infirmary', models.CharField(max_length=50)),
+                ('nurse', models.CharField(max_length=50)),
+                ('patient_type', models.CharField(choices=[('student', 'Estudante'), ('employee', 'Funcionário'), ('visitor', 'Visitante')], max_length=10)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='dailyappointmentstats',
+            constraint=models.UniqueConstraint(fields=('day', 'infirmary', 'nurse', 'patient_type'), name='daily_stats_unique_key'),
+        ),
+        migrations.RunPython(populate_daily_stats, migrations.RunPython.noop),
+    ]
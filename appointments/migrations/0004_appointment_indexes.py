@@ -0,0 +1,54 @@
+# Generated by Django 5.0.7 on 2026-10-18 09:15
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY does not lock the appointment tables against writes,
+    # but cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('appointments', '0003_daily_appointment_stats'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='employeeappointment',
+            index=models.Index(fields=['infirmary', 'date'], name='employee_appt_infirmary_date'),
+        ),
+        AddIndexConcurrently(
+            model_name='employeeappointment',
+            index=django.contrib.postgres.indexes.BrinIndex(autosummarize=True, fields=['date'], name='employee_appt_date_brin'),
+        ),
+        AddIndexConcurrently(
+            model_name='employeeappointment',
+            index=models.Index(fields=['nurse'], name='employee_appt_nurse'),
+        ),
+        AddIndexConcurrently(
+            model_name='studentappointment',
+            index=models.Index(fields=['infirmary', 'date'], name='student_appt_infirmary_date'),
+        ),
+        AddIndexConcurrently(
+            model_name='studentappointment',
+            index=django.contrib.postgres.indexes.BrinIndex(autosummarize=True, fields=['date'], name='student_appt_date_brin'),
+        ),
+        AddIndexConcurrently(
+            model_name='studentappointment',
+            index=models.Index(fields=['nurse'], name='student_appt_nurse'),
+        ),
+        AddIndexConcurrently(
+            model_name='visitorappointment',
+            index=models.Index(fields=['infirmary', 'date'], name='visitor_appt_infirmary_date'),
+        ),
+        AddIndexConcurrently(
+            model_name='visitorappointment',
+            index=django.contrib.postgres.indexes.BrinIndex(autosummarize=True, fields=['date'], name='visitor_appt_date_brin'),
+        ),
+        AddIndexConcurrently(
+            model_name='visitorappointment',
+            index=models.Index(fields=['nurse'], name='visitor_appt_nurse'),
+        ),
+    ]
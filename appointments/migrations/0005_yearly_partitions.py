@@ -0,0 +1,27 @@
+from django.db import migrations
+from appointments.partitions import APPOINTMENT_TABLES, partition_table, unpartition_table
+
+
+def partition_appointments(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        for table in APPOINTMENT_TABLES:
+            partition_table(cursor, table)
+
+
+def unpartition_appointments(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        for table in APPOINTMENT_TABLES:
+            unpartition_table(cursor, table)
+
+
+class Migration(migrations.Migration):
+    # Rebuilds the appointment tables partitioned by year (see appointments/partitions.py).
+    # The rows are copied, so the tables are locked for the length of the copy.
+
+    dependencies = [
+        ('appointments', '0004_appointment_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_appointments, unpartition_appointments),
+    ]
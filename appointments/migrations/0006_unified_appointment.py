@@ -0,0 +1,392 @@
+# Generated by Django 5.0.7 on 2026-10-18 09:21
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+from appointments.partitions import create_year_partition, partition_table
+
+
+# One search document function for the three patient types, with the same weights as the
+# per-type functions of 0002_appointment_search_document: A = patient name, B = class
+# group/department/relationship (and the class at the visit), C = clinical text, D = infirmary
+# and nurse.
+CREATE_APPOINTMENT_TRIGGER = '''
+CREATE FUNCTION appointments_search_document() RETURNS trigger AS $$
+DECLARE
+    patient_name text;
+    group_name text;
+BEGIN
+    IF NEW.patient_type = 'student' THEN
+        SELECT s.name, g.name INTO patient_name, group_name
+        FROM patients_student s LEFT JOIN patients_classgroup g ON g.id = s.class_group_id
+        WHERE s.id = NEW.student_id;
+    ELSIF NEW.patient_type = 'employee' THEN
+        SELECT e.name, d.name INTO patient_name, group_name
+        FROM patients_employee e LEFT JOIN patients_department d ON d.id = e.department_id
+        WHERE e.id = NEW.employee_id;
+    ELSE
+        SELECT v.name, v.relationship INTO patient_name, group_name
+        FROM patients_visitor v
+        WHERE v.id = NEW.visitor_id;
+    END IF;
+    NEW.search_document :=
+        setweight(to_tsvector('portuguese_unaccent', coalesce(patient_name, '')), 'A') ||
+        setweight(to_tsvector('portuguese_unaccent', concat_ws(' ', group_name, NEW.current_class)), 'B') ||
+        setweight(to_tsvector('portuguese_unaccent', concat_ws(' ', NEW.reason, NEW.treatment, NEW.notes)), 'C') ||
+        setweight(to_tsvector('portuguese_unaccent', concat_ws(' ', NEW.infirmary, NEW.nurse)), 'D');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER appointment_search_document
+    BEFORE INSERT OR UPDATE ON appointments_appointment
+    FOR EACH ROW EXECUTE FUNCTION appointments_search_document();
+'''
+
+# The patient triggers of 0002 keep their names and now touch the unified table.
+REPLACE_PATIENT_FUNCTIONS = '''
+CREATE OR REPLACE FUNCTION appointments_refresh_student_documents() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'patients_classgroup' THEN
+        UPDATE appointments_appointment a SET search_document = NULL
+        FROM patients_student s WHERE a.student_id = s.id AND s.class_group_id = NEW.id;
+    ELSE
+        UPDATE appointments_appointment SET search_document = NULL WHERE student_id = NEW.id;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION appointments_refresh_employee_documents() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'patients_department' THEN
+        UPDATE appointments_appointment a SET search_document = NULL
+        FROM patients_employee e WHERE a.employee_id = e.id AND e.department_id = NEW.id;
+    ELSE
+        UPDATE appointments_appointment SET search_document = NULL WHERE employee_id = NEW.id;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION appointments_refresh_visitor_documents() RETURNS trigger AS $$
+BEGIN
+    UPDATE appointments_appointment SET search_document = NULL WHERE visitor_id = NEW.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+'''
+
+# The patient functions as created by 0002_appointment_search_document, for the per-type tables.
+RESTORE_PATIENT_FUNCTIONS = '''
+CREATE OR REPLACE FUNCTION appointments_refresh_student_documents() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'patients_classgroup' THEN
+        UPDATE appointments_studentappointment a SET search_document = NULL
+        FROM patients_student s WHERE a.student_id = s.id AND s.class_group_id = NEW.id;
+    ELSE
+        UPDATE appointments_studentappointment SET search_document = NULL WHERE student_id = NEW.id;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION appointments_refresh_employee_documents() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'patients_department' THEN
+        UPDATE appointments_employeeappointment a SET search_document = NULL
+        FROM patients_employee e WHERE a.employee_id = e.id AND e.department_id = NEW.id;
+    ELSE
+        UPDATE appointments_employeeappointment SET search_document = NULL WHERE employee_id = NEW.id;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION appointments_refresh_visitor_documents() RETURNS trigger AS $$
+BEGIN
+    UPDATE appointments_visitorappointment SET search_document = NULL WHERE visitor_id = NEW.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+'''
+
+DROP_APPOINTMENT_TRIGGER = '''
+DROP TRIGGER IF EXISTS appointment_search_document ON appointments_appointment;
+DROP FUNCTION IF EXISTS appointments_search_document();
+'''
+
+# The three histories merged in date order (the order the BRIN index expects). The per-type ids
+# overlap: the student appointments keep their id, the employee and visitor appointments get NEW
+# ids above the last student one. Every merged appointment keeps its former id in legacy_id, so a
+# former employee or visitor id must be looked up by (patient_type, legacy_id). No table refers to
+# appointment ids at this point (AppointmentSubmission comes in 0007), so nothing else is remapped.
+COPY_APPOINTMENTS = '''
+INSERT INTO appointments_appointment (
+    id, legacy_id, patient_type, student_id, employee_id, visitor_id, infirmary, nurse, current_class, date,
+    reason, treatment, notes, revaluation, contact_parents, created_at, updated_at
+)
+OVERRIDING SYSTEM VALUE
+SELECT CASE WHEN patient_type = 'student' THEN legacy_id
+            ELSE (SELECT coalesce(max(id), 0) FROM appointments_studentappointment)
+                 + row_number() OVER (PARTITION BY patient_type = 'student' ORDER BY date, patient_type, legacy_id)
+       END,
+       appointments.*
+FROM (
+    SELECT id AS legacy_id, 'student' AS patient_type, student_id, NULL::varchar AS employee_id,
+           NULL::integer AS visitor_id, infirmary, nurse, current_class, date,
+           reason, treatment, notes, revaluation, contact_parents, created_at, updated_at
+    FROM appointments_studentappointment
+    UNION ALL
+    SELECT id, 'employee', NULL, employee_id, NULL, infirmary, nurse, '', date,
+           reason, treatment, notes, revaluation, false, created_at, updated_at
+    FROM appointments_employeeappointment
+    UNION ALL
+    SELECT id, 'visitor', NULL, NULL, visitor_id, infirmary, nurse, '', date,
+           reason, treatment, notes, revaluation, false, created_at, updated_at
+    FROM appointments_visitorappointment
+) appointments
+ORDER BY date, patient_type;
+
+SELECT setval(pg_get_serial_sequence('appointments_appointment', 'id'), coalesce(max(id), 0) + 1, false)
+FROM appointments_appointment;
+'''
+
+# Per patient type: the former table, its own columns and the id the appointments get back.
+# Student appointments have the same id in both tables; employee and visitor appointments get
+# back their legacy_id, and the ones recorded after the merge a new id from the table sequence.
+PER_TYPE_TABLES = {
+    'student': ('appointments_studentappointment', 'student_id, current_class, contact_parents', 'id'),
+    'employee': ('appointments_employeeappointment', 'employee_id', 'legacy_id'),
+    'visitor': ('appointments_visitorappointment', 'visitor_id', 'legacy_id'),
+}
+
+COMMON_COLUMNS = 'infirmary, nurse, date, reason, treatment, notes, revaluation, created_at, updated_at, search_document'
+
+# The search document triggers of 0002_appointment_search_document (their functions are
+# recreated by the reverse of DROP_PER_TYPE_FUNCTIONS)
+CREATE_PER_TYPE_TRIGGERS = '''
+CREATE TRIGGER student_appointment_search_document
+    BEFORE INSERT OR UPDATE ON appointments_studentappointment
+    FOR EACH ROW EXECUTE FUNCTION appointments_student_search_document();
+CREATE TRIGGER employee_appointment_search_document
+    BEFORE INSERT OR UPDATE ON appointments_employeeappointment
+    FOR EACH ROW EXECUTE FUNCTION appointments_employee_search_document();
+CREATE TRIGGER visitor_appointment_search_document
+    BEFORE INSERT OR UPDATE ON appointments_visitorappointment
+    FOR EACH ROW EXECUTE FUNCTION appointments_visitor_search_document();
+'''
+
+DROP_PER_TYPE_FUNCTIONS = '''
+DROP FUNCTION IF EXISTS appointments_student_search_document();
+DROP FUNCTION IF EXISTS appointments_employee_search_document();
+DROP FUNCTION IF EXISTS appointments_visitor_search_document();
+'''
+
+# The per-type functions of 0002_appointment_search_document
+CREATE_PER_TYPE_FUNCTIONS = '''
+CREATE FUNCTION appointments_student_search_document() RETURNS trigger AS $$
+DECLARE
+    patient_name text;
+    group_name text;
+BEGIN
+    SELECT s.name, g.name INTO patient_name, group_name
+    FROM patients_student s LEFT JOIN patients_classgroup g ON g.id = s.class_group_id
+    WHERE s.id = NEW.student_id;
+    NEW.search_document :=
+        setweight(to_tsvector('portuguese_unaccent', coalesce(patient_name, '')), 'A') ||
+        setweight(to_tsvector('portuguese_unaccent', concat_ws(' ', group_name, NEW.current_class)), 'B') ||
+        setweight(to_tsvector('portuguese_unaccent', concat_ws(' ', NEW.reason, NEW.treatment, NEW.notes)), 'C') ||
+        setweight(to_tsvector('portuguese_unaccent', concat_ws(' ', NEW.infirmary, NEW.nurse)), 'D');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION appointments_employee_search_document() RETURNS trigger AS $$
+DECLARE
+    patient_name text;
+    department_name text;
+BEGIN
+    SELECT e.name, d.name INTO patient_name, department_name
+    FROM patients_employee e LEFT JOIN patients_department d ON d.id = e.department_id
+    WHERE e.id = NEW.employee_id;
+    NEW.search_document :=
+        setweight(to_tsvector('portuguese_unaccent', coalesce(patient_name, '')), 'A') ||
+        setweight(to_tsvector('portuguese_unaccent', coalesce(department_name, '')), 'B') ||
+        setweight(to_tsvector('portuguese_unaccent', concat_ws(' ', NEW.reason, NEW.treatment, NEW.notes)), 'C') ||
+        setweight(to_tsvector('portuguese_unaccent', concat_ws(' ', NEW.infirmary, NEW.nurse)), 'D');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION appointments_visitor_search_document() RETURNS trigger AS $$
+DECLARE
+    patient_name text;
+    patient_relationship text;
+BEGIN
+    SELECT v.name, v.relationship INTO patient_name, patient_relationship
+    FROM patients_visitor v
+    WHERE v.id = NEW.visitor_id;
+    NEW.search_document :=
+        setweight(to_tsvector('portuguese_unaccent', coalesce(patient_name, '')), 'A') ||
+        setweight(to_tsvector('portuguese_unaccent', coalesce(patient_relationship, '')), 'B') ||
+        setweight(to_tsvector('portuguese_unaccent', concat_ws(' ', NEW.reason, NEW.treatment, NEW.notes)), 'C') ||
+        setweight(to_tsvector('portuguese_unaccent', concat_ws(' ', NEW.infirmary, NEW.nurse)), 'D');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+'''
+
+
+def partition_appointments(apps, schema_editor):
+    # Partitions for the current and the next year, then one for every year of the histories
+    # about to be copied
+    with schema_editor.connection.cursor() as cursor:
+        partition_table(cursor, 'appointments_appointment')
+        cursor.execute('''
+            SELECT min(first), max(last) FROM (
+                SELECT min(date) AS first, max(date) AS last FROM appointments_studentappointment
+                UNION ALL SELECT min(date), max(date) FROM appointments_employeeappointment
+                UNION ALL SELECT min(date), max(date) FROM appointments_visitorappointment
+            ) bounds
+        ''')
+        first, last = cursor.fetchone()
+        if first:
+            for year in range(timezone.localtime(first).year, timezone.localtime(last).year + 1):
+                create_year_partition(cursor, 'appointments_appointment', year)
+
+
+def copy_appointments(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(COPY_APPOINTMENTS)
+
+
+def split_appointments(apps, schema_editor):
+    # Reverse of copy_appointments: the per-type tables were recreated (empty, not partitioned)
+    # by the reverse of the DeleteModel operations below
+    with schema_editor.connection.cursor() as cursor:
+        for patient_type, (table, columns, id_column) in PER_TYPE_TABLES.items():
+            cursor.execute(
+                f'INSERT INTO {table} (id, {columns}, {COMMON_COLUMNS}) OVERRIDING SYSTEM VALUE '
+                f'SELECT {id_column}, {columns}, {COMMON_COLUMNS} FROM appointments_appointment '
+                f'WHERE patient_type = %s AND {id_column} IS NOT NULL ORDER BY date',
+                [patient_type],
+            )
+            cursor.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), coalesce(max(id), 0) + 1, false) "
+                           f"FROM {table}")
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}, {COMMON_COLUMNS}) '
+                f'SELECT {columns}, {COMMON_COLUMNS} FROM appointments_appointment '
+                f'WHERE patient_type = %s AND {id_column} IS NULL ORDER BY date',
+                [patient_type],
+            )
+        cursor.execute(CREATE_PER_TYPE_TRIGGERS)
+        # As left by 0005_yearly_partitions
+        for table, _, _ in PER_TYPE_TABLES.values():
+            partition_table(cursor, table)
+
+
+class Migration(migrations.Migration):
+    # Merges the per-type appointment tables into appointments_appointment, partitioned by year
+    # like them (appointments/partitions.py). Reversible: migrating back to 0005 splits the table
+    # into the per-type tables again, with the former ids.
+
+    dependencies = [
+        ('appointments', '0005_yearly_partitions'),
+        ('patients', '0003_import_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Appointment',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('patient_type', models.CharField(choices=[('student', 'Estudante'), ('employee', 'Funcionário'), ('visitor', 'Visitante')], max_length=10)),
+                ('infirmary', models.CharField(max_length=50)),
+                ('nurse', models.CharField(max_length=50)),
+                ('current_class', models.CharField(blank=True, default='', max_length=50)),
+                ('date', models.DateTimeField()),
+                ('reason', models.TextField()),
+                ('treatment', models.TextField()),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('revaluation', models.BooleanField(default=False)),
+                ('contact_parents', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('legacy_id', models.IntegerField(blank=True, editable=False, null=True)),
+                ('search_document', django.contrib.postgres.search.SearchVectorField(editable=False, null=True)),
+                ('employee', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='patients.employee')),
+                ('student', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='patients.student')),
+                ('visitor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='patients.visitor')),
+            ],
+        ),
+        migrations.RunPython(partition_appointments, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_document'], name='appt_search_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['infirmary', 'date'], name='appt_infirmary_date'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=django.contrib.postgres.indexes.BrinIndex(autosummarize=True, fields=['date'], name='appt_date_brin'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['nurse'], name='appt_nurse'),
+        ),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.CheckConstraint(check=models.Q(models.Q(('employee__isnull', True), ('patient_type', 'student'), ('student__isnull', False), ('visitor__isnull', True)), models.Q(('employee__isnull', False), ('patient_type', 'employee'), ('student__isnull', True), ('visitor__isnull', True)), models.Q(('employee__isnull', True), ('patient_type', 'visitor'), ('student__isnull', True), ('visitor__isnull', False)), _connector='OR'), name='appt_patient_matches_type'),
+        ),
+        migrations.RunSQL(CREATE_APPOINTMENT_TRIGGER, DROP_APPOINTMENT_TRIGGER),
+        migrations.RunSQL(REPLACE_PATIENT_FUNCTIONS, RESTORE_PATIENT_FUNCTIONS),
+        migrations.RunPython(copy_appointments, split_appointments),
+        migrations.DeleteModel(
+            name='EmployeeAppointment',
+        ),
+        migrations.DeleteModel(
+            name='StudentAppointment',
+        ),
+        migrations.DeleteModel(
+            name='VisitorAppointment',
+        ),
+        migrations.RunSQL(DROP_PER_TYPE_FUNCTIONS, CREATE_PER_TYPE_FUNCTIONS),
+        migrations.CreateModel(
+            name='EmployeeAppointment',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('appointments.appointment',),
+        ),
+        migrations.CreateModel(
+            name='StudentAppointment',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('appointments.appointment',),
+        ),
+        migrations.CreateModel(
+            name='VisitorAppointment',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('appointments.appointment',),
+        ),
+    ]
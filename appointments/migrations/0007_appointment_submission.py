@@ -0,0 +1,21 @@
+# Generated by Django 5.0.7 on 2026-10-18 09:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0006_unified_appointment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppointmentSubmission',
+            fields=[
+                ('key', models.UUIDField(primary_key=True, serialize=False)),
+                ('appointment_id', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
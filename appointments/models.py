@@ -1,4 +1,6 @@
 from django.db import models
+from django.contrib.postgres.indexes import BrinIndex, GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from patients.models import *
 
 # Create your models here.
@@ -7,12 +9,32 @@ from patients.models import *
 
 # appointment models
 
-class StudentAppointment(models.Model):
+PATIENT_TYPES = [
+    ('student', 'Estudante'),
+    ('employee', 'Funcionário'),
+    ('visitor', 'Visitante'),
+]
+
+
+class Appointment(models.Model):
+    """
+    The appointments of students, employees and visitors, in a single table.
+    patient_type tells which of the student, employee and visitor foreign keys is set;
+    current_class and contact_parents are only meaningful for students.
+    StudentAppointment, EmployeeAppointment and VisitorAppointment are proxies restricted to one
+    patient type, kept for the code written against the former per-type tables.
+    """
+    # Set by the proxies: the patient type of their appointments
+    PATIENT_TYPE = None
+
     id = models.AutoField(primary_key=True)
-    student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    patient_type = models.CharField(max_length=10, choices=PATIENT_TYPES)
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, null=True, blank=True)
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, null=True, blank=True)
+    visitor = models.ForeignKey(Visitor, on_delete=models.CASCADE, null=True, blank=True)
     infirmary = models.CharField(max_length=50)
     nurse = models.CharField(max_length=50)
-    current_class = models.CharField(max_length=50)
+    current_class = models.CharField(max_length=50, blank=True, default='')
     date = models.DateTimeField()
     reason = models.TextField()
     treatment = models.TextField()
@@ -21,38 +43,118 @@ class StudentAppointment(models.Model):
     contact_parents = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Id of the appointment in the per-type table it was merged from by migration
+    # 0006_unified_appointment (student appointments kept the same id)
+    legacy_id = models.IntegerField(null=True, blank=True, editable=False)
+    # Maintained by a database trigger (see migration 0006_unified_appointment)
+    search_document = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_document'], name='appt_search_gin'),
+            # Reports and history: filter by infirmary and a date range, ordered by date
+            models.Index(fields=['infirmary', 'date'], name='appt_infirmary_date'),
+            # Date-only ranges over the append-only history (rows arrive in date order)
+            BrinIndex(fields=['date'], name='appt_date_brin', autosummarize=True),
+            models.Index(fields=['nurse'], name='appt_nurse'),
+        ]
+        constraints = [
+            # Exactly the foreign key of the patient type is set
+            models.CheckConstraint(
+                check=(
+                    models.Q(patient_type='student', student__isnull=False, employee__isnull=True, visitor__isnull=True)
+                    | models.Q(patient_type='employee', student__isnull=True, employee__isnull=False, visitor__isnull=True)
+                    | models.Q(patient_type='visitor', student__isnull=True, employee__isnull=True, visitor__isnull=False)
+                ),
+                name='appt_patient_matches_type',
+            ),
+        ]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.PATIENT_TYPE and not self.patient_type:
+            self.patient_type = self.PATIENT_TYPE
+
+    @property
+    def patient(self):
+        return getattr(self, self.patient_type) if self.patient_type else None
 
     def __str__(self):
-        return f"{self.student.name} - {self.date}"
+        return f"{self.patient.name} - {self.date}"
 
-class EmployeeAppointment(models.Model):
-    id = models.AutoField(primary_key=True)
-    employee = models.ForeignKey(Employee, on_delete=models.CASCADE)
+
+class PatientAppointmentManager(models.Manager):
+    """
+    Manager of the per-type proxies: only the appointments of the proxy's patient type.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(patient_type=self.model.PATIENT_TYPE)
+
+
+class StudentAppointment(Appointment):
+    PATIENT_TYPE = 'student'
+
+    objects = PatientAppointmentManager()
+
+    class Meta:
+        proxy = True
+
+
+class EmployeeAppointment(Appointment):
+    PATIENT_TYPE = 'employee'
+
+    objects = PatientAppointmentManager()
+
+    class Meta:
+        proxy = True
+
+
+class VisitorAppointment(Appointment):
+    PATIENT_TYPE = 'visitor'
+
+    objects = PatientAppointmentManager()
+
+    class Meta:
+        proxy = True
+
+# statistics models
+
+class DailyAppointmentStats(models.Model):
+    """
+    Appointments per day, infirmary, nurse and patient type, read by the dashboard and charts
+    instead of counting the appointment tables. Kept up to date by appointments.signals and
+    rebuilt by the rebuild_daily_stats command.
+    """
+    PATIENT_TYPES = PATIENT_TYPES
+
+    day = models.DateField()
     infirmary = models.CharField(max_length=50)
     nurse = models.CharField(max_length=50)
-    date = models.DateTimeField()
-    reason = models.TextField()
-    treatment = models.TextField ()
-    notes = models.TextField(blank=True, null=True)
-    revaluation = models.BooleanField(default=False)
-    created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    patient_type = models.CharField(max_length=10, choices=PATIENT_TYPES)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'infirmary', 'nurse', 'patient_type'], name='daily_stats_unique_key'),
+        ]
 
     def __str__(self):
-        return f"{self.employee.name} - {self.date}"
+        return f"{self.day} - {self.infirmary} - {self.nurse} - {self.patient_type}: {self.count}"
 
-class VisitorAppointment(models.Model):
-    id = models.AutoField(primary_key=True)
-    visitor = models.ForeignKey(Visitor, on_delete=models.CASCADE)
-    infirmary = models.CharField(max_length=50)
-    nurse = models.CharField(max_length=50)
-    date = models.DateTimeField()
-    reason = models.TextField()
-    treatment = models.TextField()
-    notes = models.TextField(blank=True, null=True)
-    revaluation = models.BooleanField(default=False)
+
+# batch submission models
+
+class AppointmentSubmission(models.Model):
+    """
+    The idempotency key of an appointment sent to the batch endpoint (/appointments/batch/).
+    The key is generated by the client when the nurse saves the record, so a batch resent after
+    a dropped connection returns the appointments already created instead of creating them again.
+    """
+    key = models.UUIDField(primary_key=True)
+    # Not a foreign key: the partitioned appointment table is keyed by (id, date)
+    appointment_id = models.IntegerField()
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"{self.visitor.name} - {self.date}"
\ No newline at end of file
+        return f"{self.key} - {self.appointment_id}"
@@ -0,0 +1,245 @@
+from datetime import datetime
+from django.utils import timezone
+
+'''
+    Yearly range partitioning of the appointment table (PostgreSQL declarative partitioning).
+
+    Each table is partitioned by date: one partition per local year (<table>_y2026) plus a
+    default partition (<table>_default) that catches any date without a yearly partition, so an
+    insert never fails. Queries filtered by a date range only scan the partitions of the years
+    in the range, and vacuum and index maintenance work on one year at a time.
+
+    A partitioned table needs the partition key in its primary key, so the database key is
+    (id, date). Django keeps id as the model's primary key: ids stay unique because they come
+    from a single identity sequence.
+
+    The partitions of the coming years are created by the manage_partitions command, which
+    can also detach the partitions of old years into the ARCHIVE_SCHEMA schema.
+'''
+
+# The appointment table
+APPOINTMENT_TABLE = 'appointments_appointment'
+
+# The per-type tables partitioned by migration 0005_yearly_partitions, before 0006_unified_appointment
+# merged them into APPOINTMENT_TABLE
+APPOINTMENT_TABLES = (
+    'appointments_studentappointment',
+    'appointments_employeeappointment',
+    'appointments_visitorappointment',
+)
+
+PARTITION_KEY = 'date'
+
+ARCHIVE_SCHEMA = 'archive'
+
+
+def _quote(name):
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def partition_name(table, year):
+    return f'{table}_y{year}'
+
+
+def default_partition_name(table):
+    return f'{table}_default'
+
+
+def year_bounds(year):
+    """
+    Returns the [start, end) range of a local year, as aware datetimes in the default time zone.
+    """
+    tz = timezone.get_default_timezone()
+    return (timezone.make_aware(datetime(year, 1, 1), tz), timezone.make_aware(datetime(year + 1, 1, 1), tz))
+
+
+def is_partitioned(cursor, table):
+    cursor.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = %s::regclass", [table])
+    return cursor.fetchone()[0]
+
+
+def list_partitions(cursor, table):
+    """
+    Returns the partitions attached to a table.
+    Returns:
+        list: (name, bound) pairs, where bound is the partition bound expression.
+    """
+    cursor.execute(
+        """
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+        ORDER BY c.relname
+        """,
+        [table],
+    )
+    return cursor.fetchall()
+
+
+def _table_objects(cursor, table):
+    """
+    Returns the definitions of the secondary indexes, foreign keys and triggers of a table,
+    to recreate them after the table is rebuilt.
+    """
+    cursor.execute(
+        """
+        SELECT ic.relname, pg_get_indexdef(i.indexrelid)
+        FROM pg_index i JOIN pg_class ic ON ic.oid = i.indexrelid
+        WHERE i.indrelid = %s::regclass AND NOT i.indisprimary
+        ORDER BY ic.relname
+        """,
+        [table],
+    )
+    indexes = cursor.fetchall()
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+        [table],
+    )
+    foreign_keys = cursor.fetchall()
+    cursor.execute(
+        "SELECT tgname, pg_get_triggerdef(oid) FROM pg_trigger WHERE tgrelid = %s::regclass AND NOT tgisinternal",
+        [table],
+    )
+    triggers = cursor.fetchall()
+    return indexes, foreign_keys, triggers
+
+
+def _rebuild_table(cursor, table, partitioned, years=()):
+    """
+    Recreates a table with the same columns and data, partitioned by year or not.
+    The secondary indexes, foreign keys and triggers are dropped from the old table and
+    recreated on the new one with the same names; the identity sequence continues where the
+    old one stopped.
+    """
+    indexes, foreign_keys, triggers = _table_objects(cursor, table)
+    legacy = f'{table}_legacy'
+
+    cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+    sequence = cursor.fetchone()[0]
+    cursor.execute(f'SELECT last_value, is_called FROM {sequence}')
+    last_value, is_called = cursor.fetchone()
+
+    for name, _ in triggers:
+        cursor.execute(f'DROP TRIGGER {_quote(name)} ON {_quote(table)}')
+    for name, _ in indexes:
+        cursor.execute(f'DROP INDEX {_quote(name)}')
+    cursor.execute(f'ALTER TABLE {_quote(table)} RENAME TO {_quote(legacy)}')
+    cursor.execute(f'ALTER TABLE {_quote(legacy)} RENAME CONSTRAINT {_quote(table + "_pkey")} TO {_quote(legacy + "_pkey")}')
+
+    like = f'LIKE {_quote(legacy)} INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING CONSTRAINTS INCLUDING STORAGE'
+    if partitioned:
+        cursor.execute(f'CREATE TABLE {_quote(table)} ({like}) PARTITION BY RANGE ({_quote(PARTITION_KEY)})')
+        cursor.execute(f'ALTER TABLE {_quote(table)} ADD CONSTRAINT {_quote(table + "_pkey")} '
+                       f'PRIMARY KEY (id, {_quote(PARTITION_KEY)})')
+        for year in sorted(years):
+            start, end = year_bounds(year)
+            cursor.execute(f'CREATE TABLE {_quote(partition_name(table, year))} PARTITION OF {_quote(table)} '
+                           f'FOR VALUES FROM (%s) TO (%s)', [start, end])
+        cursor.execute(f'CREATE TABLE {_quote(default_partition_name(table))} PARTITION OF {_quote(table)} DEFAULT')
+    else:
+        cursor.execute(f'CREATE TABLE {_quote(table)} ({like})')
+        cursor.execute(f'ALTER TABLE {_quote(table)} ADD CONSTRAINT {_quote(table + "_pkey")} PRIMARY KEY (id)')
+
+    cursor.execute(f'INSERT INTO {_quote(table)} OVERRIDING SYSTEM VALUE SELECT * FROM {_quote(legacy)}')
+    cursor.execute(f"SELECT pg_get_serial_sequence(%s, 'id')", [table])
+    new_sequence = cursor.fetchone()[0]
+    cursor.execute('SELECT setval(%s, %s, %s)', [new_sequence, last_value, is_called])
+    cursor.execute(f'DROP TABLE {_quote(legacy)} CASCADE')
+    # The new sequence got a suffixed name while the old one existed
+    if new_sequence != sequence:
+        cursor.execute(f"ALTER SEQUENCE {new_sequence} RENAME TO {sequence.rsplit('.', 1)[-1]}")
+
+    for _, definition in indexes:
+        cursor.execute(definition)
+    for name, definition in foreign_keys:
+        cursor.execute(f'ALTER TABLE {_quote(table)} ADD CONSTRAINT {_quote(name)} {definition}')
+    for _, definition in triggers:
+        cursor.execute(definition)
+
+
+def partition_table(cursor, table):
+    """
+    Converts an appointment table into a table partitioned by year, with a partition for every
+    year that has appointments, the current year and the next one.
+    """
+    cursor.execute(f'SELECT min({_quote(PARTITION_KEY)}), max({_quote(PARTITION_KEY)}) FROM {_quote(table)}')
+    first, last = cursor.fetchone()
+    current = timezone.localdate().year
+    years = set(range(
+        min(timezone.localtime(first).year, current) if first else current,
+        max(timezone.localtime(last).year, current + 1) + 1 if last else current + 2,
+    ))
+    _rebuild_table(cursor, table, partitioned=True, years=years)
+
+
+def unpartition_table(cursor, table):
+    """
+    Converts a partitioned appointment table back into a plain table. Detached (archived)
+    partitions are not included.
+    """
+    _rebuild_table(cursor, table, partitioned=False)
+
+
+def create_year_partition(cursor, table, year):
+    """
+    Creates the partition of a year, if it does not exist yet.
+    Rows of that year already stored in the default partition are moved into the new one (the
+    default partition is detached meanwhile, since PostgreSQL refuses a partition whose rows
+    are in the default one).
+    Returns:
+        bool: Whether the partition was created.
+    """
+    name = partition_name(table, year)
+    if name in dict(list_partitions(cursor, table)):
+        return False
+
+    start, end = year_bounds(year)
+    default = default_partition_name(table)
+    in_year = f'{_quote(PARTITION_KEY)} >= %s AND {_quote(PARTITION_KEY)} < %s'
+    cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {_quote(default)} WHERE {in_year})', [start, end])
+    if not cursor.fetchone()[0]:
+        cursor.execute(f'CREATE TABLE {_quote(name)} PARTITION OF {_quote(table)} FOR VALUES FROM (%s) TO (%s)',
+                       [start, end])
+        return True
+
+    cursor.execute(f'ALTER TABLE {_quote(table)} DETACH PARTITION {_quote(default)}')
+    cursor.execute(f'CREATE TABLE {_quote(name)} PARTITION OF {_quote(table)} FOR VALUES FROM (%s) TO (%s)',
+                   [start, end])
+    cursor.execute(f'INSERT INTO {_quote(name)} OVERRIDING SYSTEM VALUE SELECT * FROM {_quote(default)} WHERE {in_year}',
+                   [start, end])
+    cursor.execute(f'DELETE FROM {_quote(default)} WHERE {in_year}', [start, end])
+    cursor.execute(f'ALTER TABLE {_quote(table)} ATTACH PARTITION {_quote(default)} DEFAULT')
+    return True
+
+
+def archive_year_partition(cursor, table, year):
+    """
+    Detaches the partition of a year and moves it to the ARCHIVE_SCHEMA schema. Its rows are
+    kept but no longer returned by the application's queries.
+    Returns:
+        bool: Whether the partition was archived.
+    """
+    name = partition_name(table, year)
+    if name not in dict(list_partitions(cursor, table)):
+        return False
+    cursor.execute(f'CREATE SCHEMA IF NOT EXISTS {_quote(ARCHIVE_SCHEMA)}')
+    cursor.execute(f'ALTER TABLE {_quote(table)} DETACH PARTITION {_quote(name)}')
+    cursor.execute(f'ALTER TABLE {_quote(name)} SET SCHEMA {_quote(ARCHIVE_SCHEMA)}')
+    return True
+
+
+def restore_year_partition(cursor, table, year):
+    """
+    Attaches back an archived partition.
+    Returns:
+        bool: Whether the partition was restored.
+    """
+    name = partition_name(table, year)
+    cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [f'{_quote(ARCHIVE_SCHEMA)}.{_quote(name)}'])
+    if not cursor.fetchone()[0]:
+        return False
+    start, end = year_bounds(year)
+    cursor.execute(f'ALTER TABLE {_quote(ARCHIVE_SCHEMA)}.{_quote(name)} SET SCHEMA public')
+    cursor.execute(f'ALTER TABLE {_quote(table)} ATTACH PARTITION {_quote(name)} FOR VALUES FROM (%s) TO (%s)',
+                   [start, end])
+    return True
@@ -0,0 +1,86 @@
+from django.conf import settings
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .models import Appointment, StudentAppointment, EmployeeAppointment, VisitorAppointment
+from controller.crud import get_stats_key, add_daily_stats, invalidate_dashboard_cache
+from controller.events import publish_appointment_event
+
+'''
+    Keeps the DailyAppointmentStats rollup in sync with the appointment tables.
+
+    A new appointment adds one to its (day, infirmary, nurse, patient type) row, a deleted one
+    removes one, and an edit that changes the day, infirmary or nurse moves it between rows.
+    Bulk operations (bulk_create, queryset update/delete) do not send these signals; run
+    rebuild_daily_stats after them. Signals are sent for the class of the saved instance, so
+    the receivers are connected to Appointment (e.g. deletions cascaded from a patient) and to
+    each per-type proxy.
+
+    The same signals invalidate the cached dashboard counters of the years the appointment
+    belonged to (before and after an edit) and, with DASHBOARD_LIVE_UPDATES, publish the count
+    deltas to the open dashboards (controller/events.py).
+'''
+
+APPOINTMENT_MODELS = (Appointment, StudentAppointment, EmployeeAppointment, VisitorAppointment)
+
+
+def remember_stats_key(sender, instance, **kwargs):
+    # Only edits need the previous key; new appointments have no row yet
+    instance._previous_stats_key = None
+    if instance.pk is None:
+        return
+    previous = Appointment.objects.filter(pk=instance.pk).values('date', 'infirmary', 'nurse', 'patient_type').first()
+    if previous:
+        instance._previous_stats_key = get_stats_key(Appointment(**previous))
+
+
+def update_stats_on_save(sender, instance, created, **kwargs):
+    key = get_stats_key(instance)
+    previous = getattr(instance, '_previous_stats_key', None)
+    if created or previous is None:
+        add_daily_stats(key, 1)
+    elif previous != key:
+        add_daily_stats(previous, -1)
+        add_daily_stats(key, 1)
+
+
+def update_stats_on_delete(sender, instance, **kwargs):
+    add_daily_stats(get_stats_key(instance), -1)
+
+
+def invalidate_dashboard_on_save(sender, instance, **kwargs):
+    years = {get_stats_key(instance)['day'].year}
+    previous = getattr(instance, '_previous_stats_key', None)
+    if previous:
+        years.add(previous['day'].year)
+    invalidate_dashboard_cache(years)
+
+
+def invalidate_dashboard_on_delete(sender, instance, **kwargs):
+    invalidate_dashboard_cache({get_stats_key(instance)['day'].year})
+
+
+def publish_event_on_save(sender, instance, created, **kwargs):
+    if not settings.DASHBOARD_LIVE_UPDATES:
+        return
+    key = get_stats_key(instance)
+    previous = getattr(instance, '_previous_stats_key', None)
+    if created or previous is None:
+        publish_appointment_event(key, 1)
+    elif previous != key:
+        publish_appointment_event(previous, -1)
+        publish_appointment_event(key, 1)
+
+
+def publish_event_on_delete(sender, instance, **kwargs):
+    if settings.DASHBOARD_LIVE_UPDATES:
+        publish_appointment_event(get_stats_key(instance), -1)
+
+
+for model in APPOINTMENT_MODELS:
+    receiver(pre_save, sender=model, dispatch_uid=f'{model.__name__}_stats_pre_save')(remember_stats_key)
+    receiver(post_save, sender=model, dispatch_uid=f'{model.__name__}_stats_post_save')(update_stats_on_save)
+    receiver(post_delete, sender=model, dispatch_uid=f'{model.__name__}_stats_post_delete')(update_stats_on_delete)
+    receiver(post_save, sender=model, dispatch_uid=f'{model.__name__}_dashboard_post_save')(invalidate_dashboard_on_save)
+    receiver(post_delete, sender=model, dispatch_uid=f'{model.__name__}_dashboard_post_delete')(invalidate_dashboard_on_delete)
+    receiver(post_save, sender=model, dispatch_uid=f'{model.__name__}_events_post_save')(publish_event_on_save)
+    receiver(post_delete, sender=model, dispatch_uid=f'{model.__name__}_events_post_delete')(publish_event_on_delete)
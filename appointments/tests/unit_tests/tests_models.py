@@ -1,3 +1,6 @@
+from datetime import datetime
+from django.db import IntegrityError, transaction
+from django.utils import timezone
 from django.test import TestCase
 from ...models import *
 
@@ -171,4 +174,34 @@ class TestVisitorAppointmentModel(TestCase):
         self.assertEqual(appointment.nurse.name, 'Nurse Joy')
 
 
-############################################################################################################
\ No newline at end of file
+############################################################################################################
+
+class TestUnifiedAppointmentModel(TestCase):
+
+    def setUp(self):
+        self.student = Student.objects.create(id='S1', name='John Doe', age=16, gender='Male', registry='S1')
+        self.employee = Employee.objects.create(id='E1', name='Mary Smith', age=40, gender='Female', registry='E1')
+        self.date = timezone.make_aware(datetime(2026, 8, 15, 10, 0))
+        common = {'infirmary': 'Infantil', 'nurse': 'Nurse Joy', 'date': self.date, 'reason': 'Headache', 'treatment': 'Rest'}
+        self.student_appointment = StudentAppointment.objects.create(student=self.student, current_class='Math', **common)
+        self.employee_appointment = EmployeeAppointment.objects.create(employee=self.employee, **common)
+
+    def test_proxies_set_and_filter_the_patient_type(self):
+        self.assertEqual(self.student_appointment.patient_type, 'student')
+        self.assertEqual(list(StudentAppointment.objects.all()), [self.student_appointment])
+        self.assertEqual(list(EmployeeAppointment.objects.values_list('id', flat=True)), [self.employee_appointment.id])
+        self.assertFalse(VisitorAppointment.objects.exists())
+        self.assertEqual(Appointment.objects.count(), 2)
+
+    def test_ids_are_shared_by_every_patient_type(self):
+        self.assertNotEqual(self.student_appointment.id, self.employee_appointment.id)
+        self.assertEqual(Appointment.objects.get(pk=self.employee_appointment.pk).patient, self.employee)
+
+    def test_patient_must_match_the_type(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Appointment.objects.create(patient_type='visitor', student=self.student, infirmary='Infantil',
+                                       nurse='Nurse Joy', date=self.date, reason='-', treatment='-')
+
+    def test_deleting_the_patient_deletes_its_appointments(self):
+        self.student.delete()
+        self.assertEqual(list(Appointment.objects.values_list('patient_type', flat=True)), ['employee'])
@@ -4,13 +4,14 @@ from django.shortcuts import render
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
+from django.forms.models import model_to_dict
+from django.db import IntegrityError
 from django.utils import timezone
 from .models import *
 from patients.views import (search_student, search_employee, 
-                            search_visitor, manage_visitor_data)
+                            search_visitor)
 
-from controller.crud import (create_objects, create_info, 
-                             get_info_by_patient, update_info )
+from controller.crud import record_appointment, record_appointments_batch, BATCH_APPOINTMENT_LIMIT
 
 
 
@@ -195,11 +196,10 @@ def student_record(request):
     The function performs the following steps:
     1. Reads and parses the JSON data from the request body.
     2. Extracts relevant fields from the JSON data.
-    3. Checks if student information exists and updates it if necessary.
-    4. Creates new student information if it does not exist.
-    5. Constructs a dictionary for the student appointment data.
-    6. Creates a new student appointment record.
-    7. Returns a JSON response indicating the result of the operation.
+    3. Constructs a dictionary for the student appointment data.
+    4. Records the appointment and creates or updates the student information (allergies
+       and notes) in a single transaction (controller.crud.record_appointment).
+    5. Returns a JSON response indicating the result of the operation.
     If the request method is not POST, it returns a JSON response with a 405 status code indicating that the method is not allowed.
     """
     logger.info('Iniciando student_record')
@@ -222,26 +222,7 @@ def student_record(request):
             revaluation = data.get('revaluation')
             contact_parents = data.get('contact_parents')
 
-            data_info_list = [
-                student_id,
-                allergies,
-                patient_notes
-            ]
-
-            info = get_info_by_patient(StudentInfo, student_id, 'student')
-            logger.debug('Info: %s', info)
-            if info:
-                if allergies != info.allergies or patient_notes != info.patient_notes:
-                    update_info(StudentInfo, student_id, 'student', allergies, patient_notes)
-                    logger.info('Dados do aluno atualizados com sucesso')
-                else:
-                    logger.info('Nenhuma atualização necessária para as informações do aluno')
-            else:
-                create_info(StudentInfo, student_id, 'student', allergies, patient_notes)
-                logger.info('Novas informações do aluno criadas')
-
             data_dict = {
-                'student_id': student_id,
                 'infirmary': infirmary,
                 'nurse': nurse,
                 'current_class': current_class,
@@ -253,16 +234,17 @@ def student_record(request):
                 'contact_parents': contact_parents
             }
 
-            data_list = [data_dict]
-
-            response = create_objects(StudentAppointment, data_list)
+            appointment = record_appointment('student', student_id, data_dict, allergies, patient_notes)
             logger.info('Registro de atendimento do aluno criado com sucesso')
 
-            return response
+            return JsonResponse({'status': 'success', 'data': [model_to_dict(appointment)]}, status=201)
 
         except json.JSONDecodeError:
             logger.error('Failed to decode JSON', exc_info=True)
             return JsonResponse({'error': 'Falha ao decodificar JSON'}, status=400)
+        except IntegrityError as e:
+            logger.error('Invalid appointment data: %s', e, exc_info=True)
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
         except Exception as e:
             logger.error('An error occurred: %s', e, exc_info=True)
             return JsonResponse({'error': str(e)}, status=500)
@@ -276,8 +258,8 @@ def employee_record(request):
     """
     Handles the employee record creation and update based on the incoming POST request.
     This function processes a POST request containing employee information in JSON format.
-    It extracts the relevant fields from the JSON, checks if the employee information needs
-    to be updated or created, and then creates a record in the EmployeeAppointment table.
+    It extracts the relevant fields from the JSON and records the appointment, creating or
+    updating the employee information in the same transaction (controller.crud.record_appointment).
     Args:
         request (HttpRequest): The HTTP request object containing the JSON payload.
     Returns:
@@ -304,26 +286,7 @@ def employee_record(request):
             notes = data.get('notes')
             revaluation = data.get('revaluation')
 
-            data_info_list = [
-                employee_id,
-                allergies,
-                patient_notes
-            ]
-
-            info = get_info_by_patient(EmployeeInfo, employee_id, 'employee')
-            logger.debug('Info: %s', info)
-            if info:
-                if allergies != info.allergies or patient_notes != info.patient_notes:
-                    update_info(EmployeeInfo, employee_id, 'employee', allergies, patient_notes)
-                    logger.info('Dados do colaborador atualizados com sucesso')
-                else:
-                    logger.info('Nenhuma atualização necessária para as informações do colaborador')
-            else:
-                create_info(EmployeeInfo, employee_id, 'employee', allergies, patient_notes)
-                logger.info('Novas informações do colaborador criadas')
-
             data_dict = {
-                'employee_id': employee_id,
                 'infirmary': infirmary,
                 'nurse': nurse,
                 'date': date,
@@ -333,16 +296,17 @@ def employee_record(request):
                 'revaluation': revaluation,
             }
 
-            data_list = [data_dict]
-
-            response = create_objects(EmployeeAppointment, data_list)
+            appointment = record_appointment('employee', employee_id, data_dict, allergies, patient_notes)
             logger.info('Registro de atendimento do colaborador criado com sucesso')
 
-            return response
+            return JsonResponse({'status': 'success', 'data': [model_to_dict(appointment)]}, status=201)
 
         except json.JSONDecodeError:
             logger.error('Failed to decode JSON', exc_info=True)
             return JsonResponse({'error': 'Falha ao decodificar JSON'}, status=400)
+        except IntegrityError as e:
+            logger.error('Invalid appointment data: %s', e, exc_info=True)
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
         except Exception as e:
             logger.error('An error occurred: %s', e, exc_info=True)
             return JsonResponse({'error': str(e)}, status=500)
@@ -351,48 +315,13 @@ def employee_record(request):
     return JsonResponse({'error': 'Método não permitido'}, status=405)
 
 
-@csrf_exempt
-def register_visitor_appointment(visitor, appointment_data):
-    """
-    Registers a visitor appointment by adding the visitor object to the appointment data
-    and creating a new appointment record.
-    Args:
-        visitor (object): The visitor instance to be added to the appointment.
-        appointment_data (dict): A dictionary containing the appointment details.
-    Returns:
-        JsonResponse: A JSON response indicating the success or failure of the operation.
-                    - On success: {'status': 'success', 'message': 'Atendimento salvo com sucesso!'}, status=201
-                    - On failure: {'status': 'error', 'message': 'Erro ao criar o atendimento'}, status=500
-                    - On exception: {'status': 'error', 'message': str(e)}, status=500
-    Raises:
-        Exception: If an error occurs during the appointment registration process.
-    """
-   
-    logger.info('Iniciando register_visitor_appointment')
-    try:
-        appointment_data['visitor'] = visitor
-
-        appointment_response = create_objects(VisitorAppointment, [appointment_data])
-
-        if appointment_response.status_code != 201:
-            logger.error(f"Error creating appointment: {appointment_response.content}")
-            return JsonResponse({'status': 'error', 'message': 'Erro ao criar o atendimento'}, status=500)
-
-        logger.info('Atendimento do visitante criado com sucesso')
-        return JsonResponse({'status': 'success', 'message': 'Atendimento salvo com sucesso!'}, status=201)
-
-    except Exception as e:
-        logger.error(f'Error registering appointment: {e}', exc_info=True)
-        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
-
-
-
 @csrf_exempt
 def visitor_record(request):
     """
     Handles the visitor record creation process.
     This view function processes a POST request containing visitor and appointment data in JSON format.
-    It extracts the visitor information, manages the visitor data, and registers the visitor's appointment.
+    It extracts the visitor information and registers the visitor's appointment, creating the visitor
+    or updating its allergies and notes in the same transaction (controller.crud.record_appointment).
     Args:
         request (HttpRequest): The HTTP request object containing the visitor and appointment data in JSON format.
     Returns:
@@ -415,18 +344,11 @@ def visitor_record(request):
                 'age': data.get('visitor_age'),
                 'email': data.get('visitor_email'),
                 'gender': data.get('visitor_gender'),
-                'allergies': data.get('allergies'),
                 'relationship': data.get('visitor_relationship'),
-                'patient_notes': data.get('patient_notes'),
             }
 
             logger.debug('Visitor Data Extracted: %s', visitor_data)
 
-            visitor = manage_visitor_data(visitor_data)
-            if not visitor:
-                logger.error('Erro ao gerenciar os dados do visitante')
-                return JsonResponse({'status': 'error', 'message': 'Erro ao gerenciar os dados do visitante'}, status=500)
-
             appointment_data = {
                 'infirmary': data.get('infirmary'),
                 'nurse': data.get('nurse'),
@@ -438,14 +360,68 @@ def visitor_record(request):
             }
 
             logger.info('Iniciando registro do atendimento do visitante')
-            return register_visitor_appointment(visitor, appointment_data)
+            record_appointment('visitor', visitor_data, appointment_data,
+                               data.get('allergies'), data.get('patient_notes'))
+
+            logger.info('Atendimento do visitante criado com sucesso')
+            return JsonResponse({'status': 'success', 'message': 'Atendimento salvo com sucesso!'}, status=201)
 
         except json.JSONDecodeError:
             logger.error('Failed to decode JSON', exc_info=True)
             return JsonResponse({'error': 'Falha ao decodificar JSON'}, status=400)
+        except IntegrityError as e:
+            logger.error('Invalid appointment data: %s', e, exc_info=True)
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
         except Exception as e:
-            logger.error(f'An error occurred: {e}', exc_info=True)
+            logger.error('An error occurred: %s', e, exc_info=True)
             return JsonResponse({'error': str(e)}, status=500)
 
     logger.error('Method not allowed')
-    return JsonResponse({'error': 'Método não permitido'}, status=405)
\ No newline at end of file
+    return JsonResponse({'error': 'Método não permitido'}, status=405)
+
+
+@login_required
+def appointment_batch(request):
+    """
+    Records a batch of student, employee and visitor appointments sent by a client that queued
+    them while offline. The items are saved in one transaction; each carries a client-generated
+    idempotency key, so a batch resent after a failure does not create duplicates. Requires a
+    logged-in user and the CSRF token (X-CSRFToken header), like the other session-based pages.
+    Args:
+        request (HttpRequest): The HTTP request object, with a JSON array of items in the body
+                               (see controller.crud.parse_batch_item).
+    Returns:
+        JsonResponse: A JSON response with one result per item ('created', 'duplicate' or 'error').
+            - 400: If the body is not a JSON array or exceeds BATCH_APPOINTMENT_LIMIT items.
+            - 409: If a concurrent request recorded one of the keys first; nothing is saved and
+                   the batch can be resent.
+    """
+    logger.info('Iniciando appointment_batch')
+    if request.method != 'POST':
+        logger.error('Method not allowed')
+        return JsonResponse({'error': 'Método não permitido'}, status=405)
+
+    try:
+        items = json.loads(request.body)
+    except json.JSONDecodeError:
+        logger.error('Failed to decode JSON', exc_info=True)
+        return JsonResponse({'error': 'Falha ao decodificar JSON'}, status=400)
+    if not isinstance(items, list):
+        return JsonResponse({'status': 'error', 'message': 'O corpo deve ser uma lista de atendimentos'}, status=400)
+    if len(items) > BATCH_APPOINTMENT_LIMIT:
+        return JsonResponse(
+            {'status': 'error', 'message': f'Máximo de {BATCH_APPOINTMENT_LIMIT} atendimentos por lote'}, status=400,
+        )
+
+    try:
+        results = record_appointments_batch(items)
+    except IntegrityError as e:
+        logger.warning('Concurrent batch submission: %s', e)
+        return JsonResponse({'status': 'error', 'message': 'Lote enviado em duplicidade, tente novamente'},
+                            status=409)
+    except Exception as e:
+        logger.error('An error occurred: %s', e, exc_info=True)
+        return JsonResponse({'error': str(e)}, status=500)
+
+    logger.info('Lote de atendimentos processado')
+    return JsonResponse({'status': 'success', 'results': results})
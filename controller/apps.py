@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ControllerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'controller'
+
+    def ready(self):
+        # Connect the Prometheus metrics to the request instrumentation
+        from . import metrics  # noqa: F401
@@ -1,13 +1,33 @@
+import base64
+import binascii
+import json
 import logging
+import re
+import unicodedata
+import uuid
 from django.shortcuts import get_object_or_404
 from django.http import JsonResponse, Http404
 from django.core.exceptions import ValidationError
+from django.core.validators import ProhibitNullCharactersValidator
 from django.forms.models import model_to_dict
 from django.utils import timezone
-from datetime import datetime
-from django.db.models import Count, Q
-from collections import defaultdict
-from appointments.models import StudentAppointment, EmployeeAppointment, VisitorAppointment
+from django.utils.dateparse import parse_datetime
+from django.conf import settings
+from django.core.cache import cache
+from datetime import date, datetime, time, timedelta
+from dataclasses import dataclass, field
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, Sum, Q, F, Value, Case, When, CharField, BooleanField, FloatField, ExpressionWrapper
+from django.db.models.functions import Cast, Coalesce, ExtractYear, TruncDate
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from collections import Counter, defaultdict
+from appointments.models import (
+    Appointment, StudentAppointment, EmployeeAppointment, VisitorAppointment, DailyAppointmentStats, PATIENT_TYPES,
+    AppointmentSubmission,
+)
+from patients.models import Student, Employee, Visitor, StudentInfo, EmployeeInfo
+from controller.events import publish_appointment_event
+from controller.metrics import record_cache_lookup
 
 logger = logging.getLogger('controller.crud')
 
@@ -31,22 +51,21 @@ def create_objects(model, data_list):
     """
     logger.info("Iniciando create_objects")
     try:
-        logger.debug(f"Creating objects in model: {model}")
-        logger.debug(f"Data received: {data_list}")
+        logger.debug("Creating objects in model: %s", model)
+        logger.debug("Data received: %s", data_list)
         objects = []
         for data in data_list:
             obj = model.objects.create(**data)
-            obj.save()
             objects.append(model_to_dict(obj))
-            logger.debug(f"Created object: {obj}")
+            logger.debug("Created object: %s", obj)
         logger.info("Dados enviados para a interface do usuário.")
         return JsonResponse({'status': 'success', 'data': objects}, status=201)
     except ValidationError as e:
-        logger.error(f"Validation Error: {e.message_dict}")
+        logger.error("Validation Error: %s", e.message_dict)
         logger.info("Dados enviados para a interface do usuário.")
         return JsonResponse({'status': 'error', 'message': e.message_dict}, status=400)
     except Exception as e:
-        logger.error(f"Exception: {e}")
+        logger.error("Exception: %s", e)
         logger.info("Dados enviados para a interface do usuário.")
         return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
 
@@ -70,41 +89,41 @@ def get_object(model, name=None, registry=None, email=None, related_fields=None)
         - Error: Logs when neither name nor registry is provided.
     """
     logger.info("Iniciando get_object")
-    logger.info(f"Starting get_object function for model: {model.__name__}.")
+    logger.info("Starting get_object function for model: %s.", model.__name__)
     query = model.objects.all()
     
     if related_fields:
         if isinstance(related_fields, list):
-            logger.debug(f"Selecting related fields: {related_fields}.")
+            logger.debug("Selecting related fields: %s.", related_fields)
             query = query.select_related(*related_fields)
         else:
-            logger.debug(f"Selecting related field: {related_fields}.")
+            logger.debug("Selecting related field: %s.", related_fields)
             query = query.select_related(related_fields)
     
     if email:
-        logger.debug(f"Filtering object with email: {email}.")
+        logger.debug("Filtering object with email: %s.", email)
         try:
             obj = query.get(email=email)
-            logger.info(f"Object found with email: {email}.")
+            logger.info("Object found with email: %s.", email)
             logger.info("Dados enviados para a interface do usuário.")
             return [obj]
         except model.DoesNotExist:
-            logger.warning(f"No records found with email: {email}")
+            logger.warning("No records found with email: %s", email)
             return None
 
     if name:
-        logger.debug(f"Filtering objects with name containing: {name}.")
-        objs = query.filter(name__icontains=name)
-        if not objs.exists():
+        logger.debug("Filtering objects with name containing: %s.", name)
+        objs = list(query.filter(name__icontains=name))
+        if not objs:
             logger.warning("No records found with the provided name.")
             raise Http404('No records found.')
-        logger.info(f"{len(objs)} objects found with the name containing: {name}.")
+        logger.info("%s objects found with the name containing: %s.", len(objs), name)
         logger.info("Dados enviados para a interface do usuário.")
-        return list(objs)  
+        return objs
     elif registry:
-        logger.debug(f"Filtering object with registry: {registry}.")
+        logger.debug("Filtering object with registry: %s.", registry)
         obj = get_object_or_404(query, registry=registry)
-        logger.info(f"Object found with registry: {registry}.")
+        logger.info("Object found with registry: %s.", registry)
         logger.info("Dados enviados para a interface do usuário.")
         return [obj]  
     else:
@@ -156,27 +175,27 @@ def update_object(model, registry, data):
         - Logs an error if there is a validation error during the update.
     """
     logger.info("Iniciando update_object")
-    logger.info(f"Starting update_object function for model: {model.__name__}, registry: {registry}.")
+    logger.info("Starting update_object function for model: %s, registry: %s.", model.__name__, registry)
     
     try:
         obj = get_object_or_404(model, registry=registry)
-        logger.debug(f"Object found with registry: {registry}. Updating with data: {data}.")
+        logger.debug("Object found with registry: %s. Updating with data: %s.", registry, data)
         
         for key, value in data.items():
             setattr(obj, key, value)
         
         obj.save()
-        logger.info(f"Object with registry {registry} updated successfully.")
+        logger.info("Object with registry %s updated successfully.", registry)
         logger.info("Dados enviados para a interface do usuário.")
         return JsonResponse({'status': 'success', 'data': model_to_dict(obj)})
     
     except Http404:
-        logger.warning(f"Object with registry {registry} not found.")
+        logger.warning("Object with registry %s not found.", registry)
         logger.info("Dados enviados para a interface do usuário.")
         return JsonResponse({'status': 'error', 'message': 'Object not found'}, status=404)
     
     except ValidationError as e:
-        logger.error(f"Validation error while updating object with registry {registry}: {e.message_dict}")
+        logger.error("Validation error while updating object with registry %s: %s", registry, e.message_dict)
         logger.info("Dados enviados para a interface do usuário.")
         return JsonResponse({'status': 'error', 'message': e.message_dict}, status=400)
 
@@ -199,27 +218,131 @@ def delete_object(model, registry):
         - Logs an error if any other exception occurs during the delete operation.
     """
     logger.info("Iniciando delete_object")
-    logger.info(f"Starting delete_object function for model: {model.__name__}, registry: {registry}.")
+    logger.info("Starting delete_object function for model: %s, registry: %s.", model.__name__, registry)
     
     try:
         obj = get_object_or_404(model, registry=registry)
-        logger.debug(f"Object found with registry: {registry}. Deleting object.")
+        logger.debug("Object found with registry: %s. Deleting object.", registry)
         
         obj.delete()
-        logger.info(f"Object with registry {registry} deleted successfully.")
+        logger.info("Object with registry %s deleted successfully.", registry)
         logger.info("Dados enviados para a interface do usuário.")
         return JsonResponse({'status': 'success', 'message': 'Deleted successfully'})    
     
     except Http404:
-        logger.warning(f"Object with registry {registry} not found.")
+        logger.warning("Object with registry %s not found.", registry)
         logger.info("Dados enviados para a interface do usuário.")
         return JsonResponse({'status': 'error', 'message': 'Object not found'}, status=404)
     
     except Exception as e:
-        logger.error(f"Error occurred while deleting object with registry {registry}: {str(e)}")
+        logger.error("Error occurred while deleting object with registry %s: %s", registry, str(e))
         logger.info("Dados enviados para a interface do usuário.")
         return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
 
+########### Patient name search ###########
+
+AUTOCOMPLETE_LIMIT = 20
+
+def normalize_name(name):
+    """
+    Normalizes a name the same way as the search_name column of the patient models:
+    lowercase and without accents ("João" -> "joao").
+    Args:
+        name (str): The name to normalize.
+    Returns:
+        str: The normalized name.
+    """
+    decomposed = unicodedata.normalize('NFKD', name.strip().lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+def search_by_name(model, name, related_fields=None, limit=AUTOCOMPLETE_LIMIT):
+    """
+    Searches patients by name for the autocomplete, accent and case insensitive.
+    The term is matched against the trigram-indexed search_name column, either as a substring or
+    by trigram word similarity (tolerating typos). Names starting with the term come first, then
+    the most similar ones. The results are fetched in a single query, capped at limit rows.
+    Args:
+        model (Model): The patient model (Student, Employee or Visitor).
+        name (str): The term typed by the user.
+        related_fields (list or str, optional): The related fields to select in the query.
+        limit (int, optional): The maximum number of results. Defaults to AUTOCOMPLETE_LIMIT.
+    Returns:
+        list: The matching model instances, best matches first.
+    """
+    logger.info("Iniciando search_by_name")
+    term = normalize_name(name)
+    if not term:
+        logger.warning("Empty search term.")
+        return []
+
+    query = model.objects.all()
+    if related_fields:
+        if isinstance(related_fields, list):
+            query = query.select_related(*related_fields)
+        else:
+            query = query.select_related(related_fields)
+
+    results = list(
+        query.filter(Q(search_name__contains=term) | Q(search_name__trigram_word_similar=term))
+        .annotate(
+            prefix_match=ExpressionWrapper(Q(search_name__startswith=term), output_field=BooleanField()),
+            similarity=TrigramWordSimilarity(term, 'search_name'),
+        )
+        .order_by('-prefix_match', '-similarity', 'name')[:limit]
+    )
+    logger.info("%s objects found for the name: %s.", len(results), name)
+    logger.info("Dados enviados para a interface do usuário.")
+    return results
+
+PATIENT_SEARCH_FIELDS = ('patient_type', 'patient_id', 'patient_name', 'patient_key', 'patient_detail',
+                         'prefix_match', 'similarity')
+
+def search_all_patients(name, limit=AUTOCOMPLETE_LIMIT):
+    """
+    Searches students, employees and visitors by name in a single UNION ALL query.
+    Each branch uses the same matching and ranking as search_by_name and is capped at limit rows
+    on its own trigram index; the union is then merged by relevance and capped again.
+    Args:
+        name (str): The term typed by the user.
+        limit (int, optional): The maximum number of results. Defaults to AUTOCOMPLETE_LIMIT.
+    Returns:
+        list: Dictionaries with the patient_type ('student', 'employee' or 'visitor'), patient_id,
+              patient_name, patient_key (registry, or email for visitors), patient_detail (class
+              group, department or relationship), prefix_match and similarity, best matches first.
+    """
+    logger.info("Iniciando search_all_patients")
+    term = normalize_name(name)
+    if not term:
+        logger.warning("Empty search term.")
+        return []
+
+    branches = [
+        (Student, 'student', F('registry'), F('class_group__name')),
+        (Employee, 'employee', F('registry'), F('department__name')),
+        (Visitor, 'visitor', F('email'), F('relationship')),
+    ]
+    queries = [
+        model.objects
+        .filter(Q(search_name__contains=term) | Q(search_name__trigram_word_similar=term))
+        .annotate(
+            patient_type=Value(patient_type, output_field=CharField()),
+            patient_id=Cast('id', CharField()),
+            patient_name=F('name'),
+            patient_key=Cast(key, CharField()),
+            patient_detail=Cast(detail, CharField()),
+            prefix_match=ExpressionWrapper(Q(search_name__startswith=term), output_field=BooleanField()),
+            similarity=TrigramWordSimilarity(term, 'search_name'),
+        )
+        .values(*PATIENT_SEARCH_FIELDS)
+        .order_by('-prefix_match', '-similarity', 'name')[:limit]
+        for model, patient_type, key, detail in branches
+    ]
+    union = queries[0].union(*queries[1:], all=True)
+    results = list(union.order_by('-prefix_match', '-similarity', 'patient_name')[:limit])
+    logger.info("%s patients found for the name: %s.", len(results), name)
+    logger.info("Dados enviados para a interface do usuário.")
+    return results
+
 ########### Info tables ###########
 
 def get_info_by_patient(info_model, foreign_key_value, foreign_key_field):
@@ -235,17 +358,17 @@ def get_info_by_patient(info_model, foreign_key_value, foreign_key_field):
         info_model.DoesNotExist: If no instance is found matching the foreign key field and value.
     """
     logger.info("Iniciando get_info_by_patient")
-    logger.info(f"Starting get_info_by_patient function for model: {info_model.__name__}.")
-    logger.debug(f"Looking up {info_model.__name__} with {foreign_key_field} = {foreign_key_value}.")
+    logger.info("Starting get_info_by_patient function for model: %s.", info_model.__name__)
+    logger.debug("Looking up %s with %s = %s.", info_model.__name__, foreign_key_field, foreign_key_value)
     
     try:
         result = info_model.objects.get(**{foreign_key_field: foreign_key_value})
-        logger.info(f"Information found for {foreign_key_field} = {foreign_key_value}.")
+        logger.info("Information found for %s = %s.", foreign_key_field, foreign_key_value)
         logger.info("Dados enviados para a interface do usuário.")
         return result
         
     except info_model.DoesNotExist:
-        logger.warning(f"No information found for {foreign_key_field} = {foreign_key_value}.")
+        logger.warning("No information found for %s = %s.", foreign_key_field, foreign_key_value)
         return None
 
 def update_info(info_model, foreign_key_value, foreign_key_field, allergies=None, patient_notes=None):
@@ -261,21 +384,21 @@ def update_info(info_model, foreign_key_value, foreign_key_field, allergies=None
         Model: The updated or newly created model instance.
     """
     logger.info("Iniciando update_info")
-    logger.info(f"Starting update_info function for model: {info_model.__name__}.")
-    logger.debug(f"Updating information for {foreign_key_field} = {foreign_key_value}. Allergies: {allergies}, Notes: {patient_notes}")
+    logger.info("Starting update_info function for model: %s.", info_model.__name__)
+    logger.debug("Updating information for %s = %s. Allergies: %s, Notes: %s", foreign_key_field, foreign_key_value, allergies, patient_notes)
     
     info = get_info_by_patient(info_model, foreign_key_value, foreign_key_field)
     
     if info:
-        logger.info(f"Information found for {foreign_key_field} = {foreign_key_value}. Updating record.")
+        logger.info("Information found for %s = %s. Updating record.", foreign_key_field, foreign_key_value)
         info.allergies = allergies
         info.patient_notes = patient_notes
         info.save()
-        logger.info(f"Information updated for {foreign_key_field} = {foreign_key_value}.")
+        logger.info("Information updated for %s = %s.", foreign_key_field, foreign_key_value)
         logger.info("Dados enviados para a interface do usuário.")
         return info
     else:
-        logger.warning(f"No information found for {foreign_key_field} = {foreign_key_value}. Creating new record.")
+        logger.warning("No information found for %s = %s. Creating new record.", foreign_key_field, foreign_key_value)
         return create_info(info_model, foreign_key_value, foreign_key_field, allergies, patient_notes)
 
 def create_info(info_model, foreign_key_value, foreign_key_field, allergies=None, patient_notes=None):
@@ -293,8 +416,8 @@ def create_info(info_model, foreign_key_value, foreign_key_field, allergies=None
         Logs the start and successful completion of the information creation process.
     """
     logger.info("Iniciando create_info")
-    logger.info(f"Starting create_info function for model: {info_model.__name__}.")
-    logger.debug(f"Creating information for {foreign_key_field} = {foreign_key_value}. Allergies: {allergies}, Notes: {patient_notes}")
+    logger.info("Starting create_info function for model: %s.", info_model.__name__)
+    logger.debug("Creating information for %s = %s. Allergies: %s, Notes: %s", foreign_key_field, foreign_key_value, allergies, patient_notes)
     
     info = info_model.objects.create(**{
         foreign_key_field: foreign_key_value,
@@ -302,7 +425,7 @@ def create_info(info_model, foreign_key_value, foreign_key_field, allergies=None
         'patient_notes': patient_notes
     })
     
-    logger.info(f"Information created successfully for {foreign_key_field} = {foreign_key_value}.")
+    logger.info("Information created successfully for %s = %s.", foreign_key_field, foreign_key_value)
     logger.info("Dados enviados para a interface do usuário.")
     return info
 
@@ -328,7 +451,7 @@ def update_visitor_info(visitor_model, visitor_email, allergies=None, patient_no
     if visitor and len(visitor) > 0:
         # Acessar o primeiro visitante da lista
         visitor_obj = visitor[0]
-        logger.debug(f"Updating visitor: allergies={allergies}, patient_notes={patient_notes}")
+        logger.debug("Updating visitor: allergies=%s, patient_notes=%s", allergies, patient_notes)
 
         # Atualizar os campos diretamente no objeto
         visitor_obj.allergies = allergies
@@ -337,17 +460,362 @@ def update_visitor_info(visitor_model, visitor_email, allergies=None, patient_no
         # Salvar as alterações no banco de dados
         visitor_obj.save()
 
-        logger.info(f"Information updated for visitor with email: {visitor_email}.")
+        logger.info("Information updated for visitor with email: %s.", visitor_email)
         logger.info("Dados enviados para a interface do usuário.")
         return JsonResponse({'status': 'success', 'data': model_to_dict(visitor_obj)})
     
     else:
-        logger.warning(f"No visitor found with email: {visitor_email}.")
+        logger.warning("No visitor found with email: %s.", visitor_email)
         logger.info("Dados enviados para a interface do usuário.")
         return JsonResponse({'status': 'error', 'message': 'Visitor not found'}, status=404)
     
+########### Appointment recording ###########
+
+# Info table and patient field of each patient type; visitors keep their info on the visitor row
+PATIENT_INFO_MODELS = {
+    'student': (StudentInfo, 'student'),
+    'employee': (EmployeeInfo, 'employee'),
+}
+
+APPOINTMENT_PROXIES = {
+    'student': StudentAppointment,
+    'employee': EmployeeAppointment,
+    'visitor': VisitorAppointment,
+}
+
+def upsert_patient_info(info_model, foreign_key_field, foreign_key_value, allergies=None, patient_notes=None):
+    """
+    Creates or updates the info row of a student or employee in a single statement
+    (INSERT ... ON CONFLICT DO UPDATE). An existing row is only rewritten when the allergies
+    or the notes changed.
+    Args:
+        info_model (Model): StudentInfo or EmployeeInfo.
+        foreign_key_field (str): The name of the patient field of the info model.
+        foreign_key_value (Any): The id of the patient.
+        allergies (str, optional): The patient's allergies. Defaults to None.
+        patient_notes (str, optional): The patient's notes. Defaults to None.
+    Returns:
+        bool: Whether the row was created or updated.
+    """
+    logger.info("Iniciando upsert_patient_info")
+    qn = connection.ops.quote_name
+    table = qn(info_model._meta.db_table)
+    column = qn(info_model._meta.get_field(foreign_key_field).column)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} AS info ({column}, allergies, patient_notes) VALUES (%s, %s, %s)
+            ON CONFLICT ({column}) DO UPDATE
+                SET allergies = EXCLUDED.allergies, patient_notes = EXCLUDED.patient_notes
+                WHERE (info.allergies, info.patient_notes) IS DISTINCT FROM (EXCLUDED.allergies, EXCLUDED.patient_notes)
+            """,
+            [foreign_key_value, allergies, patient_notes],
+        )
+        changed = cursor.rowcount > 0
+    logger.debug("%s for %s = %s changed: %s", info_model.__name__, foreign_key_field, foreign_key_value, changed)
+    return changed
+
+def upsert_visitor(visitor_data, allergies=None, patient_notes=None):
+    """
+    Creates a visitor, identified by the email, or updates the allergies and notes of an
+    existing one when they changed, in a single statement.
+    Args:
+        visitor_data (dict): The visitor's name, age, gender, email and relationship.
+        allergies (str, optional): The visitor's allergies. Defaults to None.
+        patient_notes (str, optional): The visitor's notes. Defaults to None.
+    Returns:
+        int: The id of the visitor.
+    """
+    logger.info("Iniciando upsert_visitor")
+    now = timezone.now()
+    with connection.cursor() as cursor:
+        # The UPDATE of ON CONFLICT returns nothing when the row did not change: the visitor
+        # is then read from the table
+        cursor.execute(
+            """
+            WITH upserted AS (
+                INSERT INTO patients_visitor AS visitor (
+                    name, age, gender, email, relationship, allergies, patient_notes, created_at, updated_at
+                )
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (email) DO UPDATE
+                    SET allergies = EXCLUDED.allergies, patient_notes = EXCLUDED.patient_notes,
+                        updated_at = EXCLUDED.updated_at
+                    WHERE (visitor.allergies, visitor.patient_notes)
+                          IS DISTINCT FROM (EXCLUDED.allergies, EXCLUDED.patient_notes)
+                RETURNING id
+            )
+            SELECT id FROM upserted
+            UNION ALL
+            SELECT id FROM patients_visitor WHERE email = %s
+            LIMIT 1
+            """,
+            [visitor_data.get('name'), visitor_data.get('age'), visitor_data.get('gender'), visitor_data.get('email'),
+             visitor_data.get('relationship'), allergies, patient_notes, now, now, visitor_data.get('email')],
+        )
+        row = cursor.fetchone()
+        if row is None:
+            # Inserted by a concurrent transaction after this statement started
+            cursor.execute("SELECT id FROM patients_visitor WHERE email = %s", [visitor_data.get('email')])
+            row = cursor.fetchone()
+    return row[0]
+
+def record_appointment(patient_type, patient, appointment_data, allergies=None, patient_notes=None):
+    """
+    Records an appointment together with the patient's allergies and notes, in one transaction:
+    either both are saved or neither is.
+    The transaction runs the info upsert (upsert_patient_info or upsert_visitor), the
+    appointment insert and the DailyAppointmentStats update of appointments.signals.
+    Args:
+        patient_type (str): 'student', 'employee' or 'visitor'.
+        patient (Any): The id of the student or employee. For visitors, the visitor data
+                       (name, age, gender, email, relationship); a new visitor is created.
+        appointment_data (dict): The appointment fields (infirmary, nurse, date, reason, ...).
+        allergies (str, optional): The patient's allergies. Defaults to None.
+        patient_notes (str, optional): The patient's notes. Defaults to None.
+    Returns:
+        Appointment: The created appointment, an instance of the patient type's proxy model.
+    Raises:
+        ValueError: If the patient type is unknown.
+    """
+    logger.info("Iniciando record_appointment")
+    if patient_type not in APPOINTMENT_PROXIES:
+        raise ValueError(f"Tipo de paciente inválido: {patient_type}")
+
+    with transaction.atomic():
+        if patient_type == 'visitor':
+            patient_id = upsert_visitor(patient, allergies, patient_notes)
+        else:
+            info_model, foreign_key_field = PATIENT_INFO_MODELS[patient_type]
+            upsert_patient_info(info_model, foreign_key_field, patient, allergies, patient_notes)
+            patient_id = patient
+        appointment = APPOINTMENT_PROXIES[patient_type](**{f'{patient_type}_id': patient_id}, **appointment_data)
+        appointment.save(force_insert=True)
+
+    logger.info("Atendimento %s registrado (%s %s)", appointment.pk, patient_type, patient_id)
+    return appointment
+
+########### Batch appointment submission ###########
+
+# Appointments accepted in one batch request
+BATCH_APPOINTMENT_LIMIT = 200
+
+BATCH_REQUIRED_FIELDS = ('infirmary', 'nurse', 'reason', 'treatment')
+
+# Patient id field of the batch items, as posted by the single-record forms
+BATCH_PATIENT_FIELDS = {
+    'student': 'student_id',
+    'employee': 'employee_id',
+}
+
+# Visitor fields of the batch items and the Visitor fields they fill
+BATCH_VISITOR_FIELDS = {
+    'visitor_name': 'name',
+    'visitor_age': 'age',
+    'visitor_email': 'email',
+    'visitor_gender': 'gender',
+    'visitor_relationship': 'relationship',
+}
+
+@dataclass
+class BatchItem:
+    index: int
+    key: uuid.UUID
+    patient_type: str
+    patient: object
+    fields: dict
+    info: dict
+
+def clean_batch_fields(model, values):
+    """
+    Converts and validates batch values with the fields of a model (type, max_length, choices,
+    validators), so that a malformed item is rejected before it reaches the database.
+    Args:
+        model (Model): The model whose fields the values fill.
+        values (dict): Field name to value.
+    Returns:
+        dict: The cleaned values.
+    Raises:
+        ValueError: If a value is invalid, naming the field.
+    """
+    cleaned = {}
+    for name, value in values.items():
+        model_field = model._meta.get_field(name)
+        try:
+            if isinstance(value, str):
+                ProhibitNullCharactersValidator()(value)
+            cleaned[name] = model_field.clean(value, None)
+        except ValidationError as e:
+            raise ValueError(f"Campo inválido ({name}): {' '.join(e.messages)}")
+    return cleaned
+
+def parse_batch_item(index, item):
+    """
+    Validates an item of an appointment batch.
+    Args:
+        index (int): The position of the item in the batch.
+        item (dict): The item: an idempotency key ('key'), a patient type ('patient_type') and the
+                     fields posted by the student, employee or visitor record form. 'date' is
+                     optional (ISO 8601, when the record was saved offline) and defaults to now.
+    Returns:
+        BatchItem: The parsed item, its values converted to the types of the model fields.
+    Raises:
+        ValueError: If the item is invalid, with a message for the user.
+    """
+    if not isinstance(item, dict):
+        raise ValueError("Item inválido")
+    try:
+        key = uuid.UUID(str(item.get('key')))
+    except ValueError:
+        raise ValueError("Chave de idempotência inválida")
+
+    patient_type = item.get('patient_type')
+    if patient_type not in APPOINTMENT_PROXIES:
+        raise ValueError(f"Tipo de paciente inválido: {patient_type}")
+    if patient_type == 'visitor':
+        patient = {field: item.get(name) for name, field in BATCH_VISITOR_FIELDS.items()}
+        missing = [name for name, field in BATCH_VISITOR_FIELDS.items() if patient[field] in (None, '')]
+    else:
+        patient = item.get(BATCH_PATIENT_FIELDS[patient_type])
+        missing = [BATCH_PATIENT_FIELDS[patient_type]] if patient in (None, '') else []
+    missing += [field for field in BATCH_REQUIRED_FIELDS if item.get(field) in (None, '')]
+    if missing:
+        raise ValueError(f"Campos obrigatórios ausentes: {', '.join(missing)}")
+
+    if item.get('date'):
+        date = parse_datetime(str(item['date']))
+        if date is None:
+            raise ValueError("Data inválida")
+        if timezone.is_naive(date):
+            date = timezone.make_aware(date)
+    else:
+        date = timezone.now()
+
+    fields = {
+        'infirmary': item['infirmary'],
+        'nurse': item['nurse'],
+        'date': date,
+        'reason': item['reason'],
+        'treatment': item['treatment'],
+        'notes': item.get('notes'),
+        'revaluation': bool(item.get('revaluation')),
+    }
+    if patient_type == 'student':
+        fields['current_class'] = item.get('current_class') or ''
+        fields['contact_parents'] = bool(item.get('contact_parents'))
+    fields = clean_batch_fields(Appointment, fields)
+    if patient_type == 'visitor':
+        patient = clean_batch_fields(Visitor, patient)
+    else:
+        # The ids are CharFields: a JSON number 123 is the patient '123'
+        patient_model = Student if patient_type == 'student' else Employee
+        patient = clean_batch_fields(patient_model, {'id': patient})['id']
+    info_model = Visitor if patient_type == 'visitor' else PATIENT_INFO_MODELS[patient_type][0]
+    info = clean_batch_fields(info_model, {name: item[name] for name in ('allergies', 'patient_notes') if name in item})
+    return BatchItem(index, key, patient_type, patient, fields, info)
+
+def record_appointments_batch(items):
+    """
+    Records a batch of student, employee and visitor appointments in one transaction, for
+    clients that queue records while offline and send them when the connection returns.
+    Each item carries a client-generated idempotency key: an item whose key was already
+    recorded is not created again, so a batch can be resent safely. The appointments are
+    inserted with bulk_create, which sends no signals: the DailyAppointmentStats rollup, the
+    dashboard cache and the live dashboard events are updated here, once per stats key.
+    Args:
+        items (list): The batch items (see parse_batch_item).
+    Returns:
+        list: One result per item, in order: {'key', 'status', 'id'} with status 'created' or
+              'duplicate' (the appointment recorded earlier), or {'key', 'status': 'error', 'message'}.
+    Raises:
+        IntegrityError: If a concurrent request recorded one of the keys first (nothing is saved).
+    """
+    logger.info("Iniciando record_appointments_batch")
+    results = [None] * len(items)
+    parsed = []
+    for index, item in enumerate(items):
+        try:
+            parsed.append(parse_batch_item(index, item))
+        except ValueError as e:
+            key = item.get('key') if isinstance(item, dict) else None
+            results[index] = {'key': key, 'status': 'error', 'message': str(e)}
+
+    with transaction.atomic():
+        recorded = dict(AppointmentSubmission.objects.filter(
+            key__in={item.key for item in parsed},
+        ).values_list('key', 'appointment_id'))
+        known_patients = {
+            patient_type: set(model.objects.filter(
+                pk__in={item.patient for item in parsed if item.patient_type == patient_type},
+            ).values_list('pk', flat=True))
+            for patient_type, model in (('student', Student), ('employee', Employee))
+            if any(item.patient_type == patient_type for item in parsed)
+        }
+
+        # Appointments to create and the batch position of each key's first item
+        pending = {}
+        first = {}
+        for item in parsed:
+            if item.key in recorded or item.key in pending:
+                continue
+            if item.patient_type != 'visitor' and item.patient not in known_patients[item.patient_type]:
+                results[item.index] = {'key': str(item.key), 'status': 'error', 'message': "Paciente não encontrado"}
+                continue
+            if item.patient_type == 'visitor':
+                patient_id = upsert_visitor(item.patient, item.info.get('allergies'), item.info.get('patient_notes'))
+            else:
+                patient_id = item.patient
+                if item.info:
+                    info_model, foreign_key_field = PATIENT_INFO_MODELS[item.patient_type]
+                    upsert_patient_info(info_model, foreign_key_field, patient_id,
+                                        item.info.get('allergies'), item.info.get('patient_notes'))
+            pending[item.key] = Appointment(
+                patient_type=item.patient_type, **{f'{item.patient_type}_id': patient_id}, **item.fields,
+            )
+            first[item.key] = item.index
+
+        appointments = Appointment.objects.bulk_create(pending.values())
+        AppointmentSubmission.objects.bulk_create([
+            AppointmentSubmission(key=key, appointment_id=appointment.pk) for key, appointment in pending.items()
+        ])
+
+        counts = Counter(tuple(get_stats_key(appointment).items()) for appointment in appointments)
+        for key, count in counts.items():
+            add_daily_stats(dict(key), count)
+            if settings.DASHBOARD_LIVE_UPDATES:
+                publish_appointment_event(dict(key), count)
+        if counts:
+            invalidate_dashboard_cache({dict(key)['day'].year for key in counts})
+
+    for item in parsed:
+        if results[item.index] is not None:
+            continue
+        if item.key in recorded:
+            results[item.index] = {'key': str(item.key), 'status': 'duplicate', 'id': recorded[item.key]}
+        else:
+            status = 'created' if first[item.key] == item.index else 'duplicate'
+            results[item.index] = {'key': str(item.key), 'status': status, 'id': pending[item.key].pk}
+
+    logger.info("Lote de atendimentos: %s criados de %s itens", len(appointments), len(items))
+    return results
+
 ########### Appointment search ###########
 
+def local_day_range(day):
+    """
+    Returns the filter of the appointments of a local day as a half-open range on the date column.
+    Unlike date__date, which compares (date AT TIME ZONE ...)::date, the range can be answered by
+    the (infirmary, date) and BRIN date indexes.
+    Args:
+        day (date): The local day.
+    Returns:
+        Q: date >= day 00:00 AND date < next day 00:00, in the current time zone.
+    """
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+    return Q(date__gte=start, date__lt=end)
+
+
 def get_appointment(model, identifier_field, patient_id=None, appointment_date=None):
     """
     Retrieve appointments based on dynamic filters for patient ID and appointment date.
@@ -367,7 +835,7 @@ def get_appointment(model, identifier_field, patient_id=None, appointment_date=N
         - Info on the number of records found.
     """
     logger.info("Iniciando get_appointment")
-    logger.info(f"Starting get_appointment function for model: {model.__name__}.")
+    logger.info("Starting get_appointment function for model: %s.", model.__name__)
 
     if patient_id is None and appointment_date is None:
         logger.warning("No search parameters provided.")
@@ -380,187 +848,311 @@ def get_appointment(model, identifier_field, patient_id=None, appointment_date=N
     if patient_id:
         filter_kwargs = {identifier_field: patient_id}  # Usamos o identificador dinâmico
         query = query.filter(**filter_kwargs)
-        logger.debug(f"Filtering appointments by {identifier_field} = {patient_id}.")
+        logger.debug("Filtering appointments by %s = %s.", identifier_field, patient_id)
 
-    # Filtro por appointment_date
+    # Filtro por appointment_date (intervalo do dia, para usar os índices de data)
     if appointment_date:
-        query = query.filter(appointment_date=appointment_date)
-        logger.debug(f"Filtering appointments by appointment_date = {appointment_date}.")
+        query = query.filter(local_day_range(appointment_date))
+        logger.debug("Filtering appointments by appointment_date = %s.", appointment_date)
 
     # Verifica se há resultados
     if not query.exists():
-        logger.warning(f"No appointments found for the given criteria: {identifier_field} = {patient_id}, appointment_date = {appointment_date}.")
+        logger.warning("No appointments found for the given criteria: %s = %s, appointment_date = %s.", identifier_field, patient_id, appointment_date)
         return []
 
     # Converte os resultados em dicionários
     results = list(query.values())
-    logger.info(f"Appointments found: {len(results)} record(s) found.")
+    logger.info("Appointments found: %s record(s) found.", len(results))
     logger.info("Dados enviados para a interface do usuário.")
     return results
 
 ########### Index Module ###########
 
-def get_nurse_appointments_current_year():
+@dataclass(frozen=True)
+class NurseCount:
+    nurse: str
+    count: int
+
+@dataclass(frozen=True)
+class DashboardStats:
+    """
+    The counters of the index page, for the current year and today (local time).
+    Attributes:
+        total_year (int): Appointments of the current year.
+        total_today (int): Appointments of today.
+        infirmary_year (int): Appointments of the current year in the selected infirmary.
+        infirmary_today (int): Appointments of today in the selected infirmary.
+        infirmary_counts (dict): Appointments of the current year per infirmary.
+        nurse_appointments (list): NurseCount of the current year, most appointments first.
     """
-    Retrieves the count of appointments for each nurse for the current year.
-    This function filters appointments from three different models (StudentAppointment, 
-    EmployeeAppointment, and VisitorAppointment) based on the current year. It then 
-    combines these appointments into a single list and counts the number of appointments 
-    for each nurse. The result is returned as a list of dictionaries, where each 
-    dictionary contains a nurse and their corresponding appointment count.
+    total_year: int = 0
+    total_today: int = 0
+    infirmary_year: int = 0
+    infirmary_today: int = 0
+    infirmary_counts: dict = field(default_factory=dict)
+    nurse_appointments: list = field(default_factory=list)
+
+def get_dashboard_stats(infirmary=None, now=None):
+    """
+    Returns the counters of the index page, cached per year, day and selected infirmary.
+    The cache entries of a year are invalidated by the appointment signals (see
+    invalidate_dashboard_cache), so a repeated page load does not query the database.
+    Args:
+        infirmary (str, optional): The selected infirmary (case-insensitive). Without it, the
+                                   infirmary counters are 0.
+        now (datetime, optional): The reference time. Defaults to the current time.
     Returns:
-        list: A list of dictionaries, each containing a 'nurse' and their 'count' of 
-              appointments for the current year.
+        DashboardStats: The counters of the index page.
     """
-    logger.info("Iniciando get_nurse_appointments_current_year")
-    # Get the current year
-    current_year = timezone.now().year
-
-    # Filter appointments for the current year for each model
-    student_appointments = StudentAppointment.objects.filter(date__year=current_year)
-    employee_appointments = EmployeeAppointment.objects.filter(date__year=current_year)
-    visitor_appointments = VisitorAppointment.objects.filter(date__year=current_year)
+    logger.info("Iniciando get_dashboard_stats")
+    today = timezone.localtime(now).date()
+    selected = infirmary.strip().lower() if infirmary else ''
+    key = f'dashboard:stats:{get_dashboard_cache_version(today.year)}:{today.isoformat()}:{selected}'
+
+    stats = cache.get(key)
+    record_cache_lookup('dashboard_stats', stats is not None)
+    if stats is None:
+        stats = compute_dashboard_stats(infirmary, today)
+        cache.set(key, stats, settings.DASHBOARD_CACHE_TIMEOUT)
+    else:
+        logger.debug("Dashboard stats from cache: %s", key)
+    logger.info("Dados enviados para a interface do usuário.")
+    return stats
 
-    # Combine the querysets into a list
-    all_appointments = list(student_appointments) + list(employee_appointments) + list(visitor_appointments)
+def compute_dashboard_stats(infirmary, today):
+    """
+    Computes every counter of the index page in a single SQL statement.
+    The counters are summed from the DailyAppointmentStats rollup (one row per day, infirmary,
+    nurse and patient type), grouped by nurse and infirmary, with today's rows counted by a
+    conditional aggregate (SUM ... FILTER). The appointment tables are not scanned.
+    Args:
+        infirmary (str): The selected infirmary (case-insensitive). Without it, the infirmary
+                         counters are 0.
+        today (date): The reference day (local time).
+    Returns:
+        DashboardStats: The counters of the index page.
+    """
+    rows = (
+        DailyAppointmentStats.objects
+        .filter(day__gte=date(today.year, 1, 1), day__lte=date(today.year, 12, 31))
+        .values('nurse', 'infirmary')
+        .annotate(
+            year_count=Sum('count', default=0),
+            today_count=Sum('count', filter=Q(day=today), default=0),
+        )
+        .order_by()
+    )
 
-    # Dictionary to store the count per nurse
+    selected = infirmary.strip().lower() if infirmary else None
+    totals = defaultdict(int)
+    infirmary_counts = defaultdict(int)
     nurse_counts = defaultdict(int)
+    for row in rows:
+        totals['year'] += row['year_count']
+        totals['today'] += row['today_count']
+        infirmary_counts[row['infirmary']] += row['year_count']
+        nurse_counts[row['nurse']] += row['year_count']
+        if selected is not None and row['infirmary'].strip().lower() == selected:
+            totals['infirmary_year'] += row['year_count']
+            totals['infirmary_today'] += row['today_count']
 
-    # Iterate over all appointments and count per nurse
-    for appointment in all_appointments:
-        nurse = appointment.nurse
-        nurse_counts[nurse] += 1
+    if not infirmary:
+        logger.warning("Infirmary is None or empty.")
 
-    # Convert the dictionary into a list of dictionaries for the template
-    nurse_appointments = [{'nurse': nurse, 'count': count} for nurse, count in nurse_counts.items()]
+    stats = DashboardStats(
+        total_year=totals['year'],
+        total_today=totals['today'],
+        infirmary_year=totals['infirmary_year'],
+        infirmary_today=totals['infirmary_today'],
+        infirmary_counts=dict(infirmary_counts),
+        nurse_appointments=[
+            NurseCount(nurse, count)
+            for nurse, count in sorted(nurse_counts.items(), key=lambda item: (-item[1], item[0]))
+        ],
+    )
+    logger.debug("Dashboard stats: %s", stats)
+    return stats
 
+def get_infirmary_totals(now=None):
+    """
+    Retrieves the number of appointments of the current year per infirmary, summed from the
+    DailyAppointmentStats rollup (at most one row per day, infirmary, nurse and patient type).
+    Cached with the dashboard counters of the year (see invalidate_dashboard_cache).
+    Args:
+        now (datetime, optional): The reference time. Defaults to the current time.
+    Returns:
+        dict: The number of appointments per infirmary.
+    """
+    logger.info("Iniciando get_infirmary_totals")
+    year = timezone.localtime(now).year
+    key = f'{INFIRMARY_TOTALS_CACHE_KEY}:{get_dashboard_cache_version(year)}'
+    totals = cache.get(key)
+    record_cache_lookup('infirmary_totals', totals is not None)
+    if totals is None:
+        rows = (DailyAppointmentStats.objects
+                .filter(day__gte=date(year, 1, 1), day__lt=date(year + 1, 1, 1))
+                .values('infirmary').annotate(total=Sum('count')).order_by())
+        totals = {row['infirmary']: row['total'] for row in rows}
+        cache.set(key, totals, settings.DASHBOARD_CACHE_TIMEOUT)
     logger.info("Dados enviados para a interface do usuário.")
-    return nurse_appointments
+    return totals
+
+########### Dashboard cache ###########
+
+INFIRMARY_TOTALS_CACHE_KEY = 'dashboard:infirmary_totals'
 
-def get_total_appointments_current_year():
+def get_dashboard_cache_version(year):
     """
-    Calculate the total number of appointments for students, employees, and visitors for the current year.
-    This function retrieves the current year using the timezone module and then queries the database
-    to count the number of appointments for students, employees, and visitors that occurred within
-    the current year. It sums these counts to get the total number of appointments.
+    Returns the current cache version of the dashboard counters of a year.
+    The version is a random token stored without expiration: replacing it makes every cached
+    entry of the year unreachable, and a version lost to cache eviction is simply a new one.
+    Args:
+        year (int): The year of the counters.
     Returns:
-        int: The total number of appointments for the current year.
+        str: The version token.
+    """
+    return cache.get_or_set(f'dashboard:version:{year}', lambda: uuid.uuid4().hex, None)
+
+def invalidate_dashboard_cache(years):
     """
-    logger.info("Iniciando get_total_appointments_current_year")
-    current_year = timezone.now().year
+    Invalidates the cached dashboard counters and infirmary totals of the given years.
+    The invalidation is repeated when the current transaction commits, so a page load that
+    cached the counters before the commit does not keep the old values.
+    Args:
+        years (iterable): The years whose counters changed.
+    """
+    years = set(years)
 
-    total_students = StudentAppointment.objects.filter(date__year=current_year).count()
-    total_employees = EmployeeAppointment.objects.filter(date__year=current_year).count()
-    total_visitors = VisitorAppointment.objects.filter(date__year=current_year).count()
+    def invalidate():
+        cache.set_many({f'dashboard:version:{year}': uuid.uuid4().hex for year in years}, None)
 
-    total_appointments = total_students + total_employees + total_visitors
+    logger.debug("Invalidating dashboard cache for years: %s", sorted(years))
+    invalidate()
+    transaction.on_commit(invalidate)
 
-    logger.info("Dados enviados para a interface do usuário.")
-    return total_appointments
+########### Daily statistics ###########
 
-def get_total_appointments_today():
+def get_stats_key(appointment):
     """
-    Retrieves the total number of appointments for students, employees, and visitors scheduled for today.
-    This function queries the StudentAppointment, EmployeeAppointment, and VisitorAppointment models
-    to count the number of appointments for the current date and returns the sum of these counts.
+    Returns the DailyAppointmentStats key of an appointment: its local day, infirmary, nurse and patient type.
+    Args:
+        appointment (Appointment): An appointment, or one of its per-type proxies.
     Returns:
-        int: The total number of appointments for today.
+        dict: The key fields.
     """
-    logger.info("Iniciando get_total_appointments_today")
-    today = timezone.now().date()
+    return {
+        'day': timezone.localdate(appointment.date),
+        'infirmary': appointment.infirmary,
+        'nurse': appointment.nurse,
+        'patient_type': appointment.patient_type,
+    }
+
+def add_daily_stats(key, delta):
+    """
+    Adds delta appointments to a DailyAppointmentStats row, creating it when needed.
+    The increment is done in the database (count = count + delta), so concurrent requests do not
+    lose updates; a concurrent insert of the same key is retried as an update.
+    Args:
+        key (dict): The key fields, as returned by get_stats_key.
+        delta (int): The number of appointments to add (negative to remove).
+    """
+    stats = DailyAppointmentStats.objects.filter(**key)
+    if delta < 0:
+        stats.filter(count__gte=-delta).update(count=F('count') + delta)
+        return
+    if stats.update(count=F('count') + delta):
+        return
+    try:
+        with transaction.atomic():
+            DailyAppointmentStats.objects.create(count=delta, **key)
+    except IntegrityError:
+        stats.update(count=F('count') + delta)
 
-    total_students = StudentAppointment.objects.filter(date__date=today).count()
-    total_employees = EmployeeAppointment.objects.filter(date__date=today).count()
-    total_visitors = VisitorAppointment.objects.filter(date__date=today).count()
+def rebuild_daily_stats(since=None):
+    """
+    Recomputes the DailyAppointmentStats rollup from the appointment tables.
+    Args:
+        since (date, optional): Only the days from this date on are recomputed. Defaults to all days.
+    Returns:
+        int: The number of rollup rows written.
+    """
+    logger.info("Iniciando rebuild_daily_stats")
+    rows = []
+    with transaction.atomic():
+        stats = DailyAppointmentStats.objects.all()
+        if since:
+            stats = stats.filter(day__gte=since)
+        years = {day.year for day in stats.dates('day', 'year')}
+        stats.delete()
+
+        appointments = Appointment.objects.all()
+        if since:
+            appointments = appointments.filter(date__gte=timezone.make_aware(datetime.combine(since, time.min)))
+        grouped = (
+            appointments.annotate(day=TruncDate('date'))
+            .values('day', 'infirmary', 'nurse', 'patient_type')
+            .annotate(count=Count('id'))
+            .order_by()
+        )
+        rows.extend(DailyAppointmentStats(**row) for row in grouped)
+
+        DailyAppointmentStats.objects.bulk_create(rows, batch_size=1000)
+        invalidate_dashboard_cache(years | {row.day.year for row in rows})
+    logger.info("%s daily statistics rows rebuilt.", len(rows))
+    return len(rows)
 
-    total_appointments = total_students + total_employees + total_visitors
+########### Reports Module ###########
 
-    logger.info("Dados enviados para a interface do usuário.")
-    return total_appointments
+SEARCH_CONFIG = 'portuguese_unaccent'
 
-def get_total_appointments_infirmary_current_year(infirmary):
+def build_search_query(search_term):
     """
-    Calculate the total number of appointments in a given infirmary for the current year.
-    This function sums up the number of student, employee, and visitor appointments
-    for the specified infirmary in the current year. If the infirmary is None or empty,
-    it returns 0 and logs a warning.
+    Builds a prefix full-text query for the appointment search documents.
+    Every word of the search term must match the beginning of a word of the document, after
+    Portuguese stemming and accent removal (see the portuguese_unaccent configuration).
     Args:
-        infirmary (str): The name of the infirmary to calculate appointments for.
+        search_term (str): The search term typed by the user.
     Returns:
-        int: The total number of appointments in the specified infirmary for the current year.
+        SearchQuery or None: The query, or None if the term has no searchable word.
     """
-    logger.info("Iniciando get_total_appointments_infirmary_current_year")
-    if not infirmary:
-        logger.warning("Infirmary is None or empty.")
-        return 0  # Retornar 0 se infirmary é None ou vazio
-
-    current_year = timezone.now().year
-    infirmary_normalized = infirmary.strip()
-
-    total_students = StudentAppointment.objects.filter(
-        date__year=current_year,
-        infirmary__iexact=infirmary_normalized
-    ).count()
-    total_employees = EmployeeAppointment.objects.filter(
-        date__year=current_year,
-        infirmary__iexact=infirmary_normalized
-    ).count()
-    total_visitors = VisitorAppointment.objects.filter(
-        date__year=current_year,
-        infirmary__iexact=infirmary_normalized
-    ).count()
-
-    total_appointments = total_students + total_employees + total_visitors
-
-    logger.debug(f"Total appointments for infirmary '{infirmary}': {total_appointments}")
-    logger.info("Dados enviados para a interface do usuário.")
-    return total_appointments
+    words = re.findall(r'[^\W_]+', search_term)
+    if not words:
+        return None
+    return SearchQuery(' & '.join(f'{word}:*' for word in words), config=SEARCH_CONFIG, search_type='raw')
 
-def get_total_appointments_infirmary_today(infirmary):
+def build_search_filters(search_term):
     """
-    Calculate the total number of appointments in a given infirmary for today.
-    This function retrieves the total number of student, employee, and visitor appointments
-    scheduled for the current day in the specified infirmary. If the infirmary is None or empty,
-    it returns 0 and logs a warning.
+    Builds the search_term filter and the relevance expression shared by the report functions.
+    The term is matched against the indexed search document of each appointment (patient name,
+    class group/department/relationship, reason, treatment, notes, infirmary and nurse), or
+    against the appointment date when it is written as dd/mm/yyyy.
     Args:
-        infirmary (str): The name of the infirmary to check for appointments.
+        search_term (str): An optional search term.
     Returns:
-        int: The total number of appointments for the given infirmary today.
-    Raises:
-        None
-    Example:
-        total_appointments = get_total_appointments_infirmary_today("Main Infirmary")
-        print(total_appointments)
+        tuple: A (filters, rank) pair. filters is a Q object, or None when there is no search term;
+               rank is the relevance expression to annotate (0 when there is no search term).
     """
-    logger.info("Iniciando get_total_appointments_infirmary_today")
-    if not infirmary:
-        logger.warning("Infirmary is None or empty.")
-        return 0  # Retornar 0 se infirmary é None ou vazio
-
-    today = timezone.now().date()
-    infirmary_normalized = infirmary.strip()
-
-    total_students = StudentAppointment.objects.filter(
-        date__date=today,
-        infirmary__iexact=infirmary_normalized
-    ).count()
-    total_employees = EmployeeAppointment.objects.filter(
-        date__date=today,
-        infirmary__iexact=infirmary_normalized
-    ).count()
-    total_visitors = VisitorAppointment.objects.filter(
-        date__date=today,
-        infirmary__iexact=infirmary_normalized
-    ).count()
-
-    total_appointments = total_students + total_employees + total_visitors
-
-    logger.debug(f"Total appointments for infirmary '{infirmary}': {total_appointments}")
-    logger.info("Dados enviados para a interface do usuário.")
-    return total_appointments
+    if not search_term:
+        return None, Value(0.0, output_field=FloatField())
+
+    search_query = build_search_query(search_term)
+    if search_query is not None:
+        search_filters = Q(search_document=search_query)
+        # ts_rank returns real; as double precision the value survives a round trip through a
+        # report cursor and compares equal to itself
+        rank = Cast(SearchRank(F('search_document'), search_query), FloatField())
+    else:
+        search_filters = Q(pk__in=[])
+        rank = Value(0.0, output_field=FloatField())
 
-########### Reports Module ###########
+    # Tentar buscar por data se o termo corresponder a uma data
+    try:
+        search_date = datetime.strptime(search_term, '%d/%m/%Y').date()
+        search_filters |= local_day_range(search_date)
+    except ValueError:
+        pass  # Não é uma data, ignorar
+
+    return search_filters, rank
 
 def get_student_appointments(date_begin, date_end, infirmaries, search_term):
     """
@@ -571,10 +1163,11 @@ def get_student_appointments(date_begin, date_end, infirmaries, search_term):
         infirmaries (list): A list of infirmary identifiers to filter appointments.
         search_term (str): An optional search term to filter appointments by student details, reason, treatment, notes, infirmary, nurse, or date.
     Returns:
-        QuerySet: A Django QuerySet of StudentAppointment objects that match the specified filters.
+        QuerySet: A Django QuerySet of StudentAppointment objects that match the specified filters, annotated
+                  with the search relevance ('rank') and ordered by it when a search term is given.
     """
     logger.info("Iniciando get_student_appointments")
-    logger.info(f"Obtendo atendimentos de estudantes de {date_begin} a {date_end} nas enfermarias: {infirmaries} com termo de busca: {search_term}")
+    logger.info("Obtendo atendimentos de estudantes de %s a %s nas enfermarias: %s com termo de busca: %s", date_begin, date_end, infirmaries, search_term)
 
     # Filtros básicos
     filters = Q(
@@ -582,31 +1175,13 @@ def get_student_appointments(date_begin, date_end, infirmaries, search_term):
         infirmary__in=infirmaries,
     )
 
-    if search_term:
-        search_filters = Q(
-            student__name__icontains=search_term) | \
-            Q(current_class__icontains=search_term) | \
-            Q(student__class_group__name__icontains=search_term) | \
-            Q(student__age__icontains=search_term) | \
-            Q(student__gender__icontains=search_term) | \
-            Q(reason__icontains=search_term) | \
-            Q(treatment__icontains=search_term) | \
-            Q(notes__icontains=search_term) | \
-            Q(revaluation__icontains=search_term) | \
-            Q(contact_parents__icontains=search_term) | \
-            Q(infirmary__icontains=search_term) | \
-            Q(nurse__icontains=search_term)
-        
-        # Tentar buscar por data se o termo corresponder a uma data
-        try:
-            search_date = datetime.strptime(search_term, '%d/%m/%Y').date()
-            search_filters |= Q(date__date=search_date)
-        except ValueError:
-            pass  # Não é uma data, ignorar
-
+    search_filters, rank = build_search_filters(search_term)
+    if search_filters is not None:
         filters &= search_filters
 
-    result = StudentAppointment.objects.filter(filters).select_related('student__class_group')
+    result = StudentAppointment.objects.filter(filters).select_related('student__class_group').annotate(rank=rank)
+    if search_filters is not None:
+        result = result.order_by('-rank', '-date')
     logger.info("Dados enviados para a interface do usuário.")
     return result
 
@@ -619,38 +1194,24 @@ def get_employee_appointments(date_begin, date_end, infirmaries, search_term):
         infirmaries (list): A list of infirmary identifiers to filter the appointments.
         search_term (str): An optional search term to filter the appointments by employee details, reason, treatment, notes, or date.
     Returns:
-        QuerySet: A Django QuerySet containing the filtered employee appointments with related employee department data.
+        QuerySet: A Django QuerySet containing the filtered employee appointments with related employee department data,
+                  annotated with the search relevance ('rank') and ordered by it when a search term is given.
     """
     logger.info("Iniciando get_employee_appointments")
-    logger.info(f"Obtendo atendimentos de funcionários de {date_begin} a {date_end} nas enfermarias: {infirmaries} com termo de busca: {search_term}")
+    logger.info("Obtendo atendimentos de funcionários de %s a %s nas enfermarias: %s com termo de busca: %s", date_begin, date_end, infirmaries, search_term)
 
     filters = Q(
         date__range=[date_begin, date_end],
         infirmary__in=infirmaries,
     )
 
-    if search_term:
-        search_filters = Q(
-            employee__name__icontains=search_term) | \
-            Q(employee__department__name__icontains=search_term) | \
-            Q(employee__age__icontains=search_term) | \
-            Q(employee__gender__icontains=search_term) | \
-            Q(reason__icontains=search_term) | \
-            Q(treatment__icontains=search_term) | \
-            Q(notes__icontains=search_term) | \
-            Q(revaluation__icontains=search_term) | \
-            Q(infirmary__icontains=search_term) | \
-            Q(nurse__icontains=search_term)
-        
-        try:
-            search_date = datetime.strptime(search_term, '%d/%m/%Y').date()
-            search_filters |= Q(date__date=search_date)
-        except ValueError:
-            pass
-
+    search_filters, rank = build_search_filters(search_term)
+    if search_filters is not None:
         filters &= search_filters
 
-    result = EmployeeAppointment.objects.filter(filters).select_related('employee__department')
+    result = EmployeeAppointment.objects.filter(filters).select_related('employee__department').annotate(rank=rank)
+    if search_filters is not None:
+        result = result.order_by('-rank', '-date')
     logger.info("Dados enviados para a interface do usuário.")
     return result
 
@@ -663,46 +1224,319 @@ def get_visitor_appointments(date_begin, date_end, infirmaries, search_term):
         infirmaries (list): A list of infirmary identifiers to filter appointments.
         search_term (str): An optional search term to filter appointments by visitor details, reason, treatment, notes, infirmary, nurse, or date.
     Returns:
-        QuerySet: A Django QuerySet of VisitorAppointment objects that match the specified filters.
+        QuerySet: A Django QuerySet of VisitorAppointment objects that match the specified filters, annotated
+                  with the search relevance ('rank') and ordered by it when a search term is given.
     """
     logger.info("Iniciando get_visitor_appointments")
-    logger.info(f"Obtendo atendimentos de visitantes de {date_begin} a {date_end} nas enfermarias: {infirmaries} com termo de busca: {search_term}")
+    logger.info("Obtendo atendimentos de visitantes de %s a %s nas enfermarias: %s com termo de busca: %s", date_begin, date_end, infirmaries, search_term)
 
     filters = Q(
         date__range=[date_begin, date_end],
         infirmary__in=infirmaries,
     )
 
-    if search_term:
-        search_filters = Q(
-            visitor__name__icontains=search_term) | \
-            Q(visitor__relationship__icontains=search_term) | \
-            Q(visitor__age__icontains=search_term) | \
-            Q(visitor__gender__icontains=search_term) | \
-            Q(reason__icontains=search_term) | \
-            Q(treatment__icontains=search_term) | \
-            Q(notes__icontains=search_term) | \
-            Q(revaluation__icontains=search_term) | \
-            Q(infirmary__icontains=search_term) | \
-            Q(nurse__icontains=search_term)
-        
-        try:
-            search_date = datetime.strptime(search_term, '%d/%m/%Y').date()
-            search_filters |= Q(date__date=search_date)
-        except ValueError:
-            pass
+    search_filters, rank = build_search_filters(search_term)
+    if search_filters is not None:
+        filters &= search_filters
 
+    result = VisitorAppointment.objects.filter(filters).select_related('visitor').annotate(rank=rank)
+    if search_filters is not None:
+        result = result.order_by('-rank', '-date')
+    logger.info("Dados enviados para a interface do usuário.")
+    return result
+
+def get_appointments(date_begin, date_end, infirmaries, search_term):
+    """
+    Retrieves the appointments of every patient type within a date range and infirmaries, optionally filtered by a search term.
+    Same filters as get_student_appointments, get_employee_appointments and get_visitor_appointments,
+    answered by a single query on the unified appointment table.
+    Args:
+        date_begin (datetime.date): The start date of the range to filter appointments.
+        date_end (datetime.date): The end date of the range to filter appointments.
+        infirmaries (list): A list of infirmary identifiers to filter appointments.
+        search_term (str): An optional search term to filter appointments by patient details, reason, treatment, notes, infirmary, nurse, or date.
+    Returns:
+        QuerySet: A Django QuerySet of Appointment objects annotated with the search relevance ('rank').
+    """
+    logger.info("Iniciando get_appointments")
+    filters = Q(
+        date__range=[date_begin, date_end],
+        infirmary__in=infirmaries,
+    )
+
+    search_filters, rank = build_search_filters(search_term)
+    if search_filters is not None:
         filters &= search_filters
 
-    result = VisitorAppointment.objects.filter(filters).select_related('visitor')
+    result = Appointment.objects.filter(filters).annotate(rank=rank)
+    logger.info("Dados enviados para a interface do usuário.")
+    return result
+
+REPORT_FIELDS = (
+    'id', 'date', 'reason', 'treatment', 'notes', 'infirmary', 'nurse', 'revaluation',
+    'type', 'name', 'additional_info_label', 'additional_info', 'age', 'gender',
+    'class_at_visit', 'parents_contacted', 'rank',
+)
+
+REPORT_ORDERING = ('-date', '-type', '-id')
+
+# With a search term, the most relevant appointments first
+REPORT_SEARCH_ORDERING = ('-rank',) + REPORT_ORDERING
+
+REPORT_PATIENT_TYPES = ('Estudante', 'Funcionário', 'Visitante')
+
+REPORT_ADDITIONAL_INFO_LABELS = {'student': 'Turma', 'employee': 'Departamento', 'visitor': 'Relacionamento'}
+
+REPORT_PAGE_SIZE = 100
+
+
+def _report_row(row):
+    """
+    Converts a row of the report query (see get_report_queryset) into the dictionary consumed by the report templates.
+    Args:
+        row (dict): A row returned by the report queryset.
+    Returns:
+        dict: The row with the 'current_class' and 'contact_parents' keys expected by the templates.
+    """
+    class_at_visit = row.pop('class_at_visit')
+    parents_contacted = row.pop('parents_contacted')
+    row['current_class'] = class_at_visit or ''
+    row['contact_parents'] = parents_contacted if parents_contacted is not None else ''
+    return row
+
+def encode_report_cursor(row, ranked=False):
+    """
+    Encodes the (date, type, id) position of a report row as an opaque, URL-safe cursor token.
+    Args:
+        row (dict): A row of the report query.
+        ranked (bool, optional): Whether the report is ordered by relevance first (a search term
+                                 was given); the position is then (rank, date, type, id).
+    Returns:
+        str: The cursor token.
+    """
+    position = [row['date'].isoformat(), row['type'], row['id']]
+    if ranked:
+        position.insert(0, row['rank'])
+    payload = json.dumps(position)
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_report_cursor(token):
+    """
+    Decodes a cursor token created by encode_report_cursor.
+    Args:
+        token (str): The cursor token.
+    Returns:
+        tuple: The (date, type, id) or (rank, date, type, id) position encoded in the token.
+    Raises:
+        ValueError: If the token is malformed.
+    """
+    try:
+        position = json.loads(base64.urlsafe_b64decode(token.encode()))
+        rank = position.pop(0) if isinstance(position, list) and len(position) == 4 else None
+        date, patient_type, pk = position
+        date = datetime.fromisoformat(date)
+    except (TypeError, ValueError, AttributeError, binascii.Error) as e:
+        raise ValueError(f'Invalid cursor: {token}') from e
+    if patient_type not in REPORT_PATIENT_TYPES or not isinstance(pk, int):
+        raise ValueError(f'Invalid cursor: {token}')
+    if rank is None:
+        return date, patient_type, pk
+    if isinstance(rank, bool) or not isinstance(rank, (int, float)):
+        raise ValueError(f'Invalid cursor: {token}')
+    return float(rank), date, patient_type, pk
+
+def by_patient_type(values, output_field, default=None):
+    """
+    Builds a CASE expression on the patient type of an appointment.
+    Args:
+        values (dict): The value (or expression) of each patient type.
+        output_field (Field): The type of the expression.
+        default (optional): The value for the patient types missing from values.
+    Returns:
+        Case: The expression.
+    """
+    return Case(
+        *[
+            When(patient_type=patient_type, then=value if hasattr(value, 'resolve_expression') else Value(value))
+            for patient_type, value in values.items()
+        ],
+        default=default, output_field=output_field,
+    )
+
+def _seek_filter(cursor, direction):
+    """
+    Builds the keyset condition (date, type, id) < cursor (or > cursor) of the report query, or
+    (rank, date, type, id) when the cursor carries the search relevance. Without a rank the
+    condition starts with the date, so the planner can resolve it with the date indexes.
+    Args:
+        cursor (tuple): The position decoded from the cursor token.
+        direction (str): 'next' for rows after the cursor in report order, 'previous' for rows before it.
+    Returns:
+        Q: The filter to apply to the annotated report query.
+    """
+    fields = ('rank', 'date', 'type', 'id') if len(cursor) == 4 else ('date', 'type', 'id')
+    lookup = 'lt' if direction == 'next' else 'gt'
+    condition = Q()
+    equal = {}
+    for field, value in zip(fields, cursor):
+        condition |= Q(**equal, **{f'{field}__{lookup}': value})
+        equal[field] = value
+    return condition
+
+def get_report_queryset(date_begin, date_end, infirmaries, search_term, cursor=None, direction='next'):
+    """
+    Builds the report query over the appointments of students, employees and visitors.
+    The appointments come from the unified table (see get_appointments), joined to the patient
+    of each type, so ordering, counting and LIMIT/OFFSET are all resolved by one query.
+    Args:
+        date_begin (datetime): The start date for filtering appointments.
+        date_end (datetime): The end date for filtering appointments.
+        infirmaries (list): A list of infirmaries to filter the appointments.
+        search_term (str): A search term to filter the appointments.
+        cursor (tuple, optional): A (date, type, id) position, or (rank, date, type, id) with a search
+                                  term; only rows after (or before) it are returned.
+        direction (str, optional): 'next' or 'previous', relative to the cursor. Defaults to 'next'.
+    Returns:
+        QuerySet: A values() QuerySet with the REPORT_FIELDS columns, ordered by date in descending order,
+                  or by relevance and then date with a search term (reversed when seeking the previous
+                  rows of a cursor).
+    """
+    logger.info("Iniciando get_report_queryset")
+    text_field = CharField()
+
+    result = get_appointments(date_begin, date_end, infirmaries, search_term).annotate(
+        type=by_patient_type(dict(PATIENT_TYPES), text_field),
+        name=Coalesce('student__name', 'employee__name', 'visitor__name'),
+        additional_info_label=by_patient_type(REPORT_ADDITIONAL_INFO_LABELS, text_field),
+        additional_info=Coalesce(
+            'student__class_group__name', 'employee__department__name', 'visitor__relationship', Value(''),
+            output_field=text_field,
+        ),
+        age=Coalesce('student__age', 'employee__age', 'visitor__age'),
+        gender=Coalesce('student__gender', 'employee__gender', 'visitor__gender'),
+        class_at_visit=F('current_class'),
+        parents_contacted=by_patient_type({'student': F('contact_parents')}, BooleanField()),
+    )
+    if cursor:
+        result = result.filter(_seek_filter(cursor, direction))
+
+    ordering = REPORT_SEARCH_ORDERING if search_term else REPORT_ORDERING
+    if cursor and direction == 'previous':
+        ordering = [field.lstrip('-') for field in ordering]
+
+    result = result.values(*REPORT_FIELDS).order_by(*ordering)
     logger.info("Dados enviados para a interface do usuário.")
     return result
 
+
+class ReportAppointments:
+    """
+    Lazy sequence over the report query, which reads the unified appointment table (see
+    get_report_queryset), meant to be handed to Paginator. Paginator only calls count() and
+    slices the sequence, so each page issues one COUNT and one LIMIT/OFFSET query instead of
+    loading every appointment of the period.
+    """
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+
+    def count(self):
+        return self.queryset.count()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [_report_row(row) for row in self.queryset[index]]
+        return _report_row(self.queryset[index])
+
+    def __iter__(self):
+        return (_report_row(row) for row in self.queryset.iterator())
+
+    def iterator(self, chunk_size):
+        """
+        Iterates over every row through a server-side cursor, fetching chunk_size rows at a time.
+        """
+        return (_report_row(row) for row in self.queryset.iterator(chunk_size=chunk_size))
+
+def get_report_appointments(date_begin, date_end, infirmaries, search_term):
+    """
+    Retrieve the appointments of the reports module as a lazy, database-paginated sequence.
+    Args:
+        date_begin (datetime): The start date for filtering appointments.
+        date_end (datetime): The end date for filtering appointments.
+        infirmaries (list): A list of infirmaries to filter the appointments.
+        search_term (str): A search term to filter the appointments.
+    Returns:
+        ReportAppointments: A sequence of appointment dictionaries (see get_all_appointments) that
+                            only fetches the rows of the requested slice.
+    """
+    logger.info("Iniciando get_report_appointments")
+    queryset = get_report_queryset(date_begin, date_end, infirmaries, search_term)
+    logger.info("Dados enviados para a interface do usuário.")
+    return ReportAppointments(queryset)
+
+def get_report_keyset_page(date_begin, date_end, infirmaries, search_term, cursor=None, direction='next',
+                           page_size=REPORT_PAGE_SIZE, with_count=False):
+    """
+    Retrieve one page of the reports module using keyset (seek) pagination.
+    Instead of OFFSET, the page starts right after (or before) the (date, type, id) position encoded
+    in the cursor token, so any page costs the same as the first one; with a search term the rows
+    are ordered by relevance first and the position also holds the rank. The total count is only
+    computed when requested.
+    Args:
+        date_begin (datetime): The start date for filtering appointments.
+        date_end (datetime): The end date for filtering appointments.
+        infirmaries (list): A list of infirmaries to filter the appointments.
+        search_term (str): A search term to filter the appointments.
+        cursor (str, optional): A cursor token returned by a previous page. Defaults to the first page.
+        direction (str, optional): 'next' or 'previous', relative to the cursor. Defaults to 'next'.
+        page_size (int, optional): The number of rows per page. Defaults to REPORT_PAGE_SIZE.
+        with_count (bool, optional): Whether to compute the total number of rows. Defaults to False.
+    Returns:
+        dict: A dictionary with the following keys:
+            - results (list): The appointment dictionaries of the page (see get_all_appointments).
+            - next_cursor (str or None): The token of the next page, if any.
+            - previous_cursor (str or None): The token of the previous page, if any.
+            - count (int or None): The total number of rows, when with_count is True.
+    Raises:
+        ValueError: If the cursor token or the direction is invalid.
+    """
+    logger.info("Iniciando get_report_keyset_page")
+    if direction not in ('next', 'previous'):
+        raise ValueError(f'Invalid direction: {direction}')
+
+    position = decode_report_cursor(cursor) if cursor else None
+    ranked = bool(search_term)
+    # The cursor carries the rank only when the report is searched
+    if position and (len(position) == 4) != ranked:
+        raise ValueError(f'Invalid cursor: {cursor}')
+    queryset = get_report_queryset(date_begin, date_end, infirmaries, search_term, position, direction)
+    rows = list(queryset[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    if position and direction == 'previous':
+        rows.reverse()
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, position is not None
+
+    page = {
+        'next_cursor': encode_report_cursor(rows[-1], ranked) if rows and has_next else None,
+        'previous_cursor': encode_report_cursor(rows[0], ranked) if rows and has_previous else None,
+        'results': [_report_row(row) for row in rows],
+        'count': None,
+    }
+    if with_count:
+        page['count'] = get_report_queryset(date_begin, date_end, infirmaries, search_term).count()
+
+    logger.info("Dados enviados para a interface do usuário.")
+    return page
+
 def get_all_appointments(date_begin, date_end, infirmaries, search_term):
     """
     Retrieve all appointments within a specified date range, infirmaries, and search term.
     This function consolidates appointments for students, employees, and visitors into a single list,
-    each with relevant details, and sorts them by date in descending order.
+    each with relevant details, sorted by date in descending order by the database.
     Args:
         date_begin (datetime): The start date for filtering appointments.
         date_end (datetime): The end date for filtering appointments.
@@ -710,6 +1544,7 @@ def get_all_appointments(date_begin, date_end, infirmaries, search_term):
         search_term (str): A search term to filter the appointments.
     Returns:
         list: A list of dictionaries, each representing an appointment with the following keys:
+            - id (int): The id of the appointment in its own table.
             - type (str): The type of the person (Estudante, Funcionário, Visitante).
             - name (str): The name of the person.
             - additional_info_label (str): The label for additional information (e.g., Turma, Departamento, Relacionamento).
@@ -723,119 +1558,56 @@ def get_all_appointments(date_begin, date_end, infirmaries, search_term):
             - infirmary (str): The infirmary where the appointment took place.
             - nurse (str): The nurse who attended the appointment.
             - current_class (str): The current class of the student (empty for employees and visitors).
+            - revaluation (bool): Whether the patient must be re-evaluated.
+            - contact_parents (bool): Whether the parents were contacted (empty for employees and visitors).
+            - rank (float): The relevance of the appointment for the search term (0 without a search term).
     """
     logger.info("Iniciando get_all_appointments")
-    student_appointments = get_student_appointments(date_begin, date_end, infirmaries, search_term)
-    employee_appointments = get_employee_appointments(date_begin, date_end, infirmaries, search_term)
-    visitor_appointments = get_visitor_appointments(date_begin, date_end, infirmaries, search_term)
-
-    # Unificar os atendimentos em uma lista única
-    all_appointments = []
-
-    for appointment in student_appointments:
-        all_appointments.append({
-            'type': 'Estudante',
-            'name': appointment.student.name,
-            'additional_info_label': 'Turma',
-            'additional_info': appointment.student.class_group.name if appointment.student.class_group else '',
-            'age': appointment.student.age,
-            'gender': appointment.student.gender,
-            'date': appointment.date,
-            'reason': appointment.reason,
-            'treatment': appointment.treatment,
-            'notes': appointment.notes,
-            'infirmary': appointment.infirmary,
-            'nurse': appointment.nurse,
-            'current_class': appointment.current_class,
-            'revaluation': appointment.revaluation, 
-            'contact_parents' : appointment.contact_parents,
-        })
-
-    for appointment in employee_appointments:
-        all_appointments.append({
-            'type': 'Funcionário',
-            'name': appointment.employee.name,
-            'additional_info_label': 'Departamento',
-            'additional_info': appointment.employee.department.name if appointment.employee.department else '',
-            'age': appointment.employee.age,
-            'gender': appointment.employee.gender,
-            'date': appointment.date,
-            'reason': appointment.reason,
-            'treatment': appointment.treatment,
-            'notes': appointment.notes,
-            'infirmary': appointment.infirmary,
-            'nurse': appointment.nurse,
-            'current_class': '', 
-            'revaluation': appointment.revaluation, 
-            'contact_parents' : '', 
-        })
-
-    for appointment in visitor_appointments:
-        all_appointments.append({
-            'type': 'Visitante',
-            'name': appointment.visitor.name,
-            'additional_info_label': 'Relacionamento',
-            'additional_info': appointment.visitor.relationship,
-            'age': appointment.visitor.age,
-            'gender': appointment.visitor.gender,
-            'date': appointment.date,
-            'reason': appointment.reason,
-            'treatment': appointment.treatment,
-            'notes': appointment.notes,
-            'infirmary': appointment.infirmary,
-            'nurse': appointment.nurse,
-            'current_class': '', 
-            'revaluation': appointment.revaluation, 
-            'contact_parents' : '',
-        })
-
-    all_appointments.sort(key=lambda x: x['date'], reverse=True)
-    logger.debug(f"All appointments: {all_appointments}")
+    all_appointments = list(get_report_appointments(date_begin, date_end, infirmaries, search_term))
     logger.info("Dados enviados para a interface do usuário.")
     return all_appointments
 
-########### Charts Module ###########
+########### Analytics export ###########
 
-def get_chart_data(request):
+ANALYTICS_FIELDS = (
+    'year', 'infirmary', 'patient_label', 'id', 'date', 'nurse', 'reason', 'treatment', 'notes',
+    'revaluation', 'parents_contacted', 'class_at_visit', 'patient_id', 'patient_name', 'age', 'gender',
+    'class_group', 'segment', 'department', 'relationship',
+)
+
+def get_analytics_queryset(since=None):
     """
-    Aggregates appointment counts by infirmary and prepares data for a chart.
-    This function aggregates the counts of appointments from three different models:
-    StudentAppointment, EmployeeAppointment, and VisitorAppointment. It then prepares
-    the data for a chart by categorizing the counts into predefined infirmary labels.
+    Builds the unified appointment dataset of the analytics export: one row per appointment of
+    students, employees and visitors, with the class group or department of the patient.
+    The rows are ordered by (year, infirmary), the partitions of the export, so each partition
+    is read in one contiguous run.
     Args:
-        request: The HTTP request object.
+        since (date, optional): Only the appointments from this date on. Defaults to all of them.
     Returns:
-        JsonResponse: A JSON response containing the labels and aggregated data for the chart.
+        QuerySet: A values() query on the unified appointment table, returning dictionaries with
+                  the ANALYTICS_FIELDS keys.
     """
-    logger.info("Iniciando get_chart_data")
-    # Agregar as contagens por enfermaria
-    labels = ["Infantil", "Fundamental", "Ensino Médio", "Externo"]
-    infirmary_counts = {label: 0 for label in labels}
-
-    # Agregar contagens do StudentAppointment
-    student_counts = StudentAppointment.objects.values('infirmary').annotate(count=Count('id'))
-    for item in student_counts:
-        infirmary = item['infirmary']
-        if infirmary in infirmary_counts:
-            infirmary_counts[infirmary] += item['count']
-
-    # Agregar contagens do EmployeeAppointment
-    employee_counts = EmployeeAppointment.objects.values('infirmary').annotate(count=Count('id'))
-    for item in employee_counts:
-        infirmary = item['infirmary']
-        if infirmary in infirmary_counts:
-            infirmary_counts[infirmary] += item['count']
-
-    # Agregar contagens do VisitorAppointment
-    visitor_counts = VisitorAppointment.objects.values('infirmary').annotate(count=Count('id'))
-    for item in visitor_counts:
-        infirmary = item['infirmary']
-        if infirmary in infirmary_counts:
-            infirmary_counts[infirmary] += item['count']
-
-    # Preparar os dados para o gráfico
-    data = [infirmary_counts[label] for label in labels]
-
+    logger.info("Iniciando get_analytics_queryset")
+    text_field = CharField()
+
+    queryset = Appointment.objects.order_by()
+    if since:
+        queryset = queryset.filter(date__gte=timezone.make_aware(datetime.combine(since, time.min)))
+
+    result = queryset.annotate(
+        year=ExtractYear('date'),
+        # The labels of the report: Estudante, Funcionário, Visitante
+        patient_label=by_patient_type(dict(PATIENT_TYPES), text_field),
+        patient_id=Coalesce('student_id', 'employee_id', Cast('visitor_id', output_field=text_field)),
+        patient_name=Coalesce('student__name', 'employee__name', 'visitor__name'),
+        age=Coalesce('student__age', 'employee__age', 'visitor__age'),
+        gender=Coalesce('student__gender', 'employee__gender', 'visitor__gender'),
+        class_group=F('student__class_group__name'),
+        segment=F('student__class_group__segment'),
+        department=F('employee__department__name'),
+        relationship=F('visitor__relationship'),
+        parents_contacted=by_patient_type({'student': F('contact_parents')}, BooleanField()),
+        class_at_visit=by_patient_type({'student': F('current_class')}, text_field),
+    ).values(*ANALYTICS_FIELDS).order_by('year', 'infirmary', 'date', 'patient_type', 'id')
     logger.info("Dados enviados para a interface do usuário.")
-    # Retornar os dados em formato JSON
-    return JsonResponse({'labels': labels, 'data': data})
+    return result
@@ -0,0 +1,186 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+import psycopg2
+from django.db import connection, connections
+
+logger = logging.getLogger('controller.events')
+
+'''
+    Live dashboard events (Server-Sent Events at /dashboard/events/).
+
+    The appointment signals publish a count delta with PostgreSQL NOTIFY, which is delivered
+    only when the transaction commits, to every worker process. Each ASGI process keeps a single
+    LISTEN connection in a background thread and fans the deltas out to the asyncio queues of
+    its connected browsers, so open dashboards cost one database connection per process, not one
+    per nurse.
+'''
+
+CHANNEL = 'dashboard_events'
+
+# Seconds between keep-alive comments on an idle stream (proxies close silent connections)
+KEEPALIVE_SECONDS = 15
+
+# Seconds the browser waits before reconnecting a dropped stream
+RETRY_MILLISECONDS = 5000
+
+# Deltas buffered per browser; a browser that falls further behind is asked to reload
+QUEUE_SIZE = 100
+
+# Sentinel queued for a browser whose queue overflowed
+RESYNC = object()
+
+
+def publish_appointment_event(key, delta):
+    """
+    Publishes a count delta of the dashboard for an appointment.
+    Args:
+        key (dict): The DailyAppointmentStats key of the appointment (see crud.get_stats_key).
+        delta (int): 1 for a new appointment, -1 for a removed one.
+    """
+    payload = json.dumps({
+        'day': key['day'].isoformat(),
+        'infirmary': key['infirmary'],
+        'nurse': key['nurse'],
+        'patient_type': key['patient_type'],
+        'delta': delta,
+    }, ensure_ascii=False)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_notify(%s, %s)", [CHANNEL, payload])
+
+
+def format_event(event, data):
+    """
+    Formats one Server-Sent Events message.
+    Args:
+        event (str): The event name.
+        data (dict): The event data, sent as JSON.
+    Returns:
+        str: The message, terminated by a blank line.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class EventBroker:
+    """
+    Receives the dashboard notifications of PostgreSQL and forwards them to the subscribers.
+    The LISTEN connection is opened by a daemon thread on the first subscription and reopened
+    after a failure; notifications are handed to each subscriber's event loop thread-safely.
+    """
+
+    def __init__(self, channel=CHANNEL, alias='default', poll_seconds=5):
+        self.channel = channel
+        self.alias = alias
+        self.poll_seconds = poll_seconds
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._thread = None
+        self._stop = threading.Event()
+
+    def subscribe(self):
+        """
+        Registers a subscriber on the running event loop.
+        Returns:
+            asyncio.Queue: The queue that receives the notifications (dicts) of the subscriber.
+        """
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[queue] = asyncio.get_running_loop()
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._listen, name='dashboard-events', daemon=True)
+                self._thread.start()
+        return queue
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._subscribers.pop(queue, None)
+
+    def stop(self):
+        """
+        Stops the listener thread.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def dispatch(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers.items())
+        for queue, loop in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._put, queue, event)
+            except RuntimeError:
+                # Loop closed without unsubscribing
+                self.unsubscribe(queue)
+
+    @staticmethod
+    def _put(queue, event):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(RESYNC)
+
+    def _connect(self):
+        params = connections[self.alias].get_connection_params()
+        listener = psycopg2.connect(**params)
+        listener.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with listener.cursor() as cursor:
+            cursor.execute(f'LISTEN "{self.channel}"')
+        return listener
+
+    def _listen(self):
+        logger.info("Iniciando o listener de eventos do dashboard")
+        listener = None
+        while not self._stop.is_set():
+            try:
+                if listener is None:
+                    listener = self._connect()
+                if select.select([listener], [], [], self.poll_seconds) == ([], [], []):
+                    continue
+                listener.poll()
+                while listener.notifies:
+                    notify = listener.notifies.pop(0)
+                    try:
+                        self.dispatch(json.loads(notify.payload))
+                    except ValueError:
+                        logger.error("Invalid dashboard event: %s", notify.payload)
+            except psycopg2.Error as e:
+                logger.error("Dashboard events listener failed: %s", e)
+                if listener is not None:
+                    listener.close()
+                    listener = None
+                self._stop.wait(self.poll_seconds)
+        if listener is not None:
+            listener.close()
+        logger.info("Listener de eventos do dashboard encerrado")
+
+
+broker = EventBroker()
+
+
+async def stream_events(queue, keepalive=KEEPALIVE_SECONDS):
+    """
+    Yields the Server-Sent Events messages of a subscriber until the client disconnects.
+    Args:
+        queue (asyncio.Queue): The subscriber queue, as returned by EventBroker.subscribe.
+        keepalive (float): Seconds between keep-alive comments when there are no events.
+    Yields:
+        str: The messages of the stream.
+    """
+    yield f"retry: {RETRY_MILLISECONDS}\n\n"
+    while True:
+        try:
+            event = await asyncio.wait_for(queue.get(), keepalive)
+        except asyncio.TimeoutError:
+            yield ": keepalive\n\n"
+            continue
+        if event is RESYNC:
+            yield format_event('resync', {})
+        else:
+            yield format_event('appointment', event)
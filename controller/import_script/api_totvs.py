@@ -1,38 +1,94 @@
 # controller/import_scripts/api_totvs.py
 
 import requests
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+from .streaming import iter_json_array, CHUNK_SIZE
 import os
 from dotenv import load_dotenv
 
 # Carregar variáveis de ambiente
 load_dotenv()
 
-# Obter a raiz da URL a partir da variável de ambiente
+# Obter a raiz da URL a partir da variável de ambiente (verificada por require_api_url, só quando
+# a API é usada: a importação por arquivo e os testes não precisam dela)
 base_url = os.getenv('API_URL')
 
-# Verificar se a variável de ambiente foi definida
-if not base_url:
-    raise ValueError("A variável de ambiente 'API_URL' não está definida.")
-
 # Definir os endpoints concatenando a base_url com os caminhos específicos
 endpoint_departments = f"{base_url}/api/framework/v1/consultaSQLServer/RealizaConsulta/APP.ENF1/1/S"
 endpoint_employees = f"{base_url}/api/framework/v1/consultaSQLServer/RealizaConsulta/APP.ENF2/1/S"
 endpoint_students = f"{base_url}/api/framework/v1/consultaSQLServer/RealizaConsulta/APP.ENF3/1/S"
 endpoint_class = f"{base_url}/api/framework/v1/consultaSQLServer/RealizaConsulta/APP.ENF4/1/S"
 
-# Cabeçalhos 
+# Cabeçalhos
 headers = {
-    "Content-Type": "application/json",    
+    "Content-Type": "application/json",
 }
 
 # Credenciais da API
 api_login = os.getenv('API_LOGIN')
-api_password = os.getenv('API_PASSWORD')    
+api_password = os.getenv('API_PASSWORD')
+
+# Timeouts (conexão, leitura) em segundos; as consultas de alunos e colaboradores são as mais lentas
+timeout = (
+    float(os.getenv('API_CONNECT_TIMEOUT', '5')),
+    float(os.getenv('API_READ_TIMEOUT', '120')),
+)
+
+# Novas tentativas com espera exponencial (backoff_factor * 2 ** tentativa) para falhas transitórias
+API_RETRIES = int(os.getenv('API_RETRIES', '3'))
+API_BACKOFF_FACTOR = float(os.getenv('API_BACKOFF_FACTOR', '1'))
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+# Uma conexão por consulta buscada em paralelo
+POOL_SIZE = 4
+
+
+def require_api_url():
+    """
+    Verifica se a variável de ambiente API_URL foi definida.
+    Raises:
+        ValueError: Se API_URL não estiver definida.
+    """
+    if not base_url:
+        raise ValueError("A variável de ambiente 'API_URL' não está definida.")
+
 
-def get_data(endpoint):
+def create_session(retries=API_RETRIES, backoff_factor=API_BACKOFF_FACTOR, pool_size=POOL_SIZE):
+    """
+    Cria uma sessão com pool de conexões, autenticação e novas tentativas automáticas.
+    Args:
+        retries (int): Quantidade máxima de novas tentativas por requisição.
+        backoff_factor (float): Fator da espera exponencial entre as tentativas.
+        pool_size (int): Quantidade de conexões mantidas abertas por host.
+    Returns:
+        requests.Session: A sessão configurada.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS,
+        allowed_methods=frozenset(['GET']),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update(headers)
+    session.auth = HTTPBasicAuth(api_login, api_password)
+    return session
+
+
+# Sessão compartilhada: reaproveita as conexões entre as consultas
+session = create_session()
+
+
+def get_data(endpoint, session=session):
     try:
-        response = requests.get(endpoint, headers=headers, auth=HTTPBasicAuth(api_login, api_password))
+        response = session.get(endpoint, timeout=timeout)
         response.raise_for_status()
         data = response.json()
         return data
@@ -44,6 +100,42 @@ def get_data(endpoint):
         print(f"Timeout: {errt}")
     except requests.exceptions.RequestException as err:
         print(f"Erro: {err}")
+    except ValueError as errv:
+        print(f"Resposta inválida de {endpoint}: {errv}")
     return None
 
 
+def get_all_data(endpoints, session=session):
+    """
+    Busca as consultas em paralelo, usando as conexões da sessão compartilhada.
+    A ordem do resultado é a mesma dos endpoints, então quem grava os dados continua
+    respeitando as dependências (departamentos e turmas antes das pessoas).
+    Args:
+        endpoints (list): As URLs das consultas.
+        session (requests.Session): A sessão usada nas requisições.
+    Returns:
+        list: Os dados de cada consulta, ou None para as que falharam.
+    """
+    if not endpoints:
+        return []
+    with ThreadPoolExecutor(max_workers=len(endpoints)) as executor:
+        return list(executor.map(lambda endpoint: get_data(endpoint, session=session), endpoints))
+
+
+def stream_data(endpoint, session=session, chunk_size=CHUNK_SIZE):
+    """
+    Busca uma consulta e devolve os registros à medida que a resposta é recebida, sem carregar
+    o payload inteiro em memória como response.json().
+    Args:
+        endpoint (str): A URL da consulta.
+        session (requests.Session): A sessão usada na requisição.
+        chunk_size (int): O tamanho dos blocos lidos da resposta.
+    Yields:
+        dict: Cada registro do array retornado pela API.
+    Raises:
+        requests.exceptions.RequestException: Se a requisição falhar.
+        JSONStreamError: Se a resposta não for um array JSON válido.
+    """
+    with session.get(endpoint, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+        yield from iter_json_array(response.iter_content(chunk_size))
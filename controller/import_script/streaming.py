@@ -0,0 +1,159 @@
+# controller/import_script/streaming.py
+
+import codecs
+import json
+import queue
+import threading
+
+# Tamanho dos blocos lidos da resposta HTTP ou do arquivo
+CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\r\n'
+
+
+class JSONStreamError(ValueError):
+    """
+    O documento lido por iter_json_array não é um array JSON válido em UTF-8.
+    """
+
+
+def iter_json_array(chunks):
+    """
+    Lê um array JSON de forma incremental, devolvendo um elemento por vez.
+    Só o bloco atual e o elemento em construção ficam em memória, não o array inteiro.
+    Args:
+        chunks (iterable): Blocos de bytes (ou texto) do documento JSON.
+    Yields:
+        object: Cada elemento do array, na ordem do documento.
+    Raises:
+        JSONStreamError: Se o documento não for um array JSON válido.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    chunks = iter(chunks)
+    buffer = ''
+    position = 0
+    eof = False
+    # start -> first -> (value -> separator)* -> end
+    state = 'start'
+
+    def fill():
+        nonlocal buffer, position, eof
+        chunk = next(chunks, None)
+        try:
+            if chunk is None:
+                eof = True
+                text = decoder.decode(b'', True)
+            else:
+                text = chunk if isinstance(chunk, str) else decoder.decode(chunk)
+        except UnicodeDecodeError as e:
+            raise JSONStreamError(f"Documento JSON inválido: {e}") from e
+        buffer = buffer[position:] + text
+        position = 0
+
+    while True:
+        while position < len(buffer) and buffer[position] in _WHITESPACE:
+            position += 1
+        if position >= len(buffer):
+            if eof:
+                break
+            fill()
+            continue
+
+        char = buffer[position]
+        if state == 'start':
+            if char != '[':
+                raise JSONStreamError("O documento JSON não é um array.")
+            position += 1
+            state = 'first'
+        elif state == 'first' and char == ']':
+            position += 1
+            state = 'end'
+        elif state in ('first', 'value'):
+            try:
+                element, end = _decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as e:
+                if eof:
+                    raise JSONStreamError(f"Documento JSON inválido: {e}") from e
+                fill()
+                continue
+            # Um número no fim do bloco pode continuar no próximo
+            if end == len(buffer) and not eof and not isinstance(element, (dict, list, str)):
+                fill()
+                continue
+            position = end
+            state = 'separator'
+            yield element
+        elif state == 'separator':
+            if char == ',':
+                state = 'value'
+            elif char == ']':
+                state = 'end'
+            else:
+                raise JSONStreamError(f"Separador inesperado no array JSON: {char!r}")
+            position += 1
+        else:
+            raise JSONStreamError("Conteúdo inesperado após o fim do array JSON.")
+
+    if state != 'end':
+        raise JSONStreamError("Documento JSON incompleto: o array não foi fechado.")
+
+
+def iter_json_file(path, chunk_size=CHUNK_SIZE):
+    """
+    Lê um arquivo com um array JSON de forma incremental.
+    Args:
+        path (str): O caminho do arquivo.
+        chunk_size (int): O tamanho dos blocos lidos.
+    Yields:
+        object: Cada elemento do array.
+    """
+    with open(path, 'rb') as file:
+        yield from iter_json_array(iter(lambda: file.read(chunk_size), b''))
+
+
+def iter_in_background(iterable, max_items):
+    """
+    Consome o iterável em uma thread, guardando no máximo max_items elementos à frente do consumidor.
+    Assim o download e a leitura do JSON continuam enquanto os lotes anteriores são gravados, sem
+    que a memória cresça com o tamanho do payload. Erros da thread são relançados no consumidor.
+    Args:
+        iterable (iterable): O iterável a consumir (por exemplo, o stream de uma consulta).
+        max_items (int): A quantidade máxima de elementos em espera.
+    Yields:
+        object: Os elementos do iterável, na mesma ordem.
+    """
+    items = queue.Queue(maxsize=max(1, max_items))
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+            put((done, None))
+        except BaseException as e:
+            put((done, e))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is done:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
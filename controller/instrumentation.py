@@ -0,0 +1,138 @@
+import logging
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from django.conf import settings
+from django.db import connections
+from django.dispatch import Signal
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+logger = logging.getLogger('controller.instrumentation')
+
+'''
+    Per-request instrumentation.
+
+    RequestTimingMiddleware measures each request: the total time, the number and time of the
+    database queries (an execute wrapper on the thread's connections) and the template render
+    time (TimedDjangoTemplates, the template backend in settings.TEMPLATES). The numbers are
+    sent back in a Server-Timing header, tagged with the URL name of the view, e.g.
+
+        Server-Timing: total;dur=41.2;desc="student_record", db;dur=12.5;desc="4 queries", tpl;dur=20.3
+
+    and broadcast with the request_measured signal for the metrics collectors. With
+    SLOW_REQUEST_MS, requests slower than that are logged with their SQL.
+
+    Streaming responses are measured up to the start of the stream: the rows read while
+    streaming are not counted.
+'''
+
+# Sent after every request with metrics=RequestMetrics
+request_measured = Signal()
+
+# SQL statements kept per request for the slow-request log
+SLOW_REQUEST_MAX_QUERIES = 100
+
+_current_metrics = ContextVar('request_metrics', default=None)
+
+
+@dataclass
+class RequestMetrics:
+    """
+    The measurements of a request, in milliseconds. Also the execute wrapper that counts the
+    request's queries (and keeps their SQL when capture_sql is set).
+    """
+    method: str
+    capture_sql: bool = False
+    url_name: str = 'unresolved'
+    status_code: int = 0
+    total_ms: float = 0.0
+    db_ms: float = 0.0
+    queries: int = 0
+    template_ms: float = 0.0
+    sql: list = field(default_factory=list)
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            self.queries += 1
+            self.db_ms += duration
+            if self.capture_sql and len(self.sql) < SLOW_REQUEST_MAX_QUERIES:
+                self.sql.append((duration, sql, params))
+
+    def server_timing(self):
+        return (f'total;dur={self.total_ms:.1f};desc="{self.url_name}", '
+                f'db;dur={self.db_ms:.1f};desc="{self.queries} queries", '
+                f'tpl;dur={self.template_ms:.1f}')
+
+
+class RequestTimingMiddleware:
+    """
+    Measures each request (see the module docstring). Goes first in MIDDLEWARE, so the
+    queries of the session and authentication middlewares are counted too.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        slow_request_ms = settings.SLOW_REQUEST_MS
+        metrics = RequestMetrics(method=request.method, capture_sql=slow_request_ms is not None)
+        token = _current_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            metrics.total_ms = (time.perf_counter() - start) * 1000
+            _current_metrics.reset(token)
+
+        if request.resolver_match and request.resolver_match.url_name:
+            metrics.url_name = request.resolver_match.url_name
+        metrics.status_code = response.status_code
+        response['Server-Timing'] = metrics.server_timing()
+        request_measured.send(sender=self.__class__, metrics=metrics)
+
+        if slow_request_ms is not None and metrics.total_ms >= slow_request_ms:
+            logger.warning(
+                "Requisição lenta: %s %s (%s) %s em %.1f ms, %s consultas em %.1f ms, templates em %.1f ms%s",
+                request.method, request.path, metrics.url_name, metrics.status_code, metrics.total_ms,
+                metrics.queries, metrics.db_ms, metrics.template_ms,
+                ''.join(f'\n  [{duration:.1f} ms] {sql} {params}' for duration, sql, params in metrics.sql),
+            )
+        return response
+
+
+class TimedTemplate(Template):
+
+    def render(self, context=None, request=None):
+        metrics = _current_metrics.get()
+        if metrics is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_ms += (time.perf_counter() - start) * 1000
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    The Django template backend, adding the render time of each template to the current
+    request's RequestMetrics.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
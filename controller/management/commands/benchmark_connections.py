@@ -0,0 +1,130 @@
+# controller/management/commands/benchmark_connections.py
+
+import io
+import statistics
+import sys
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_started, request_finished
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+
+class Command(BaseCommand):
+    help = ('Mede a latência por requisição com e sem reutilização de conexões com o banco de dados '
+            '(CONN_MAX_AGE), no mesmo processo e contra o mesmo servidor PostgreSQL.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Quantidade de requisições medidas em cada modo. Padrão: 200.',
+        )
+        parser.add_argument(
+            '--url',
+            help='Caminho de uma página a requisitar pela aplicação WSGI (ex.: /get_chart_data/). Por padrão, '
+                 'cada requisição apenas executa --query entre os sinais de início e fim de requisição.',
+        )
+        parser.add_argument(
+            '--query', default='SELECT 1',
+            help='Consulta executada em cada requisição quando --url não é informado. Padrão: SELECT 1.',
+        )
+        parser.add_argument(
+            '--max-age', type=int, default=None,
+            help='CONN_MAX_AGE do modo com reutilização. Padrão: o configurado (DB_CONN_MAX_AGE), ou 60 se for 0.',
+        )
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError("--requests deve ser maior que zero.")
+        if connection.in_atomic_block:
+            raise CommandError("O benchmark não pode rodar dentro de uma transação.")
+
+        max_age = options['max_age']
+        if max_age is None:
+            max_age = settings.DATABASES['default'].get('CONN_MAX_AGE') or 60
+
+        if options['url']:
+            # The WSGI handler itself, not the test client: the test client keeps the connection
+            # open between requests, whatever CONN_MAX_AGE says
+            handler = WSGIHandler()
+            host = next((host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*'), 'localhost')
+            path, _, query_string = options['url'].partition('?')
+
+            def do_request():
+                status = []
+                environ = {
+                    'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query_string, 'SCRIPT_NAME': '',
+                    'SERVER_NAME': host, 'SERVER_PORT': '80', 'HTTP_HOST': host, 'wsgi.url_scheme': 'http',
+                    'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+                }
+                response = handler(environ, lambda code, headers, *args: status.append(code))
+                try:
+                    b''.join(response)
+                finally:
+                    response.close()
+                if int(status[0].split()[0]) >= 400:
+                    raise CommandError(f"{options['url']} respondeu {status[0]}.")
+        else:
+            def do_request():
+                # Same cycle as a request handler: close_old_connections runs on both signals
+                request_started.send(sender=self.__class__)
+                try:
+                    with connection.cursor() as cursor:
+                        cursor.execute(options['query'])
+                        cursor.fetchall()
+                finally:
+                    request_finished.send(sender=self.__class__)
+
+        original = (connection.settings_dict['CONN_MAX_AGE'], connection.settings_dict['CONN_HEALTH_CHECKS'])
+        results = []
+        try:
+            for label, mode_max_age in (('sem reutilização (CONN_MAX_AGE=0)', 0),
+                                        (f'com reutilização (CONN_MAX_AGE={max_age})', max_age)):
+                results.append((label, *self.measure(do_request, mode_max_age, options['requests'])))
+        finally:
+            connection.close()
+            connection.settings_dict['CONN_MAX_AGE'], connection.settings_dict['CONN_HEALTH_CHECKS'] = original
+
+        self.stdout.write(f"{options['requests']} requisições por modo, "
+                          f"verificação de saúde {'ativada' if original[1] else 'desativada'}:")
+        for label, timings, connections in results:
+            self.stdout.write(
+                f"  {label}: média {statistics.mean(timings):.2f} ms, "
+                f"mediana {statistics.median(timings):.2f} ms, p95 {percentile(timings, 95):.2f} ms, "
+                f"{connections} conexões abertas"
+            )
+        baseline, reused = statistics.mean(results[0][1]), statistics.mean(results[1][1])
+        self.stdout.write(f"Ganho médio por requisição: {baseline - reused:.2f} ms.")
+
+    def measure(self, do_request, max_age, requests):
+        """
+        Runs the requests with the given CONN_MAX_AGE.
+        Returns:
+            tuple: The latency of each request in milliseconds and the number of connections opened.
+        """
+        connection.close()
+        connection.settings_dict['CONN_MAX_AGE'] = max_age
+        opened = []
+
+        def count(sender, connection, **kwargs):
+            opened.append(connection.alias)
+
+        # Warm-up (imports, URL resolution, first connection)
+        do_request()
+        connection_created.connect(count)
+        try:
+            timings = []
+            for _ in range(requests):
+                start = time.perf_counter()
+                do_request()
+                timings.append((time.perf_counter() - start) * 1000)
+        finally:
+            connection_created.disconnect(count)
+        return timings, len(opened)
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(percent / 100 * (len(ordered) - 1)))]
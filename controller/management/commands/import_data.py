@@ -1,48 +1,280 @@
 # controller/management/commands/import_data.py
 
-from django.core.management.base import BaseCommand
+import hashlib
+import json
+import time
+from collections import Counter
+from itertools import islice
+from pathlib import Path
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 from patients.models import *
 from controller.import_script.api_totvs import (
-    get_data,
+    get_all_data,
+    require_api_url,
+    stream_data,
     endpoint_departments,
     endpoint_employees,
     endpoint_students,
     endpoint_class
 )
-from django.utils import timezone
-from datetime import datetime
+from controller.import_script.streaming import JSONStreamError, iter_json_file, iter_in_background
+from controller.metrics import record_import
+
+# Quantidade de registros gravados por comando INSERT ... ON CONFLICT
+IMPORT_BATCH_SIZE = 1000
+
+# Entidades aceitas por --entity (e reconhecidas pelo nome do arquivo em --from-file)
+ENTITIES = {
+    'departments': 'import_departments',
+    'class_groups': 'import_class_groups',
+    'students': 'import_students',
+    'employees': 'import_employees',
+}
+
+
+def content_hash(values):
+    """
+    Calcula o hash dos valores importados de um registro, guardado em import_hash.
+    Args:
+        values (dict): Os campos do registro como serão gravados.
+    Returns:
+        str: O hash SHA-256 em hexadecimal.
+    """
+    payload = json.dumps(values, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def iter_batches(items, size):
+    """
+    Agrupa um iterável em listas de até size elementos, sem carregá-lo inteiro em memória.
+    """
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
 
 class Command(BaseCommand):
     help = 'Importa dados da API externa e atualiza o banco de dados.'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help=f'Quantidade de registros gravados por comando (padrão: {IMPORT_BATCH_SIZE}).',
+        )
+        parser.add_argument(
+            '--from-file',
+            help='Importa um arquivo JSON local (um array de registros) em vez de consultar a API.',
+        )
+        parser.add_argument(
+            '--entity',
+            choices=sorted(ENTITIES),
+            help='Entidade do arquivo de --from-file; por padrão, o nome do arquivo (ex.: students.json).',
+        )
+
     def handle(self, *args, **options):
-        # Obter dados de departamentos
-        dados_departamentos = get_data(endpoint_departments)
+        self.batch_size = max(1, options.get('batch_size') or IMPORT_BATCH_SIZE)
+
+        if options.get('from_file'):
+            path = Path(options['from_file'])
+            entity = options.get('entity') or path.stem
+            if entity not in ENTITIES:
+                raise CommandError(f"Entidade desconhecida para {path.name}. Use --entity ({', '.join(sorted(ENTITIES))}).")
+            if not path.is_file():
+                raise CommandError(f"Arquivo não encontrado: {path}")
+            self.import_stream(getattr(self, ENTITIES[entity]), iter_json_file(path), path.name)
+            return
+
+        try:
+            require_api_url()
+        except ValueError as e:
+            raise CommandError(f"{e} Defina API_URL ou use --from-file.")
+
+        # Departamentos e turmas são pequenos: buscar os dois em paralelo e gravar antes das pessoas
+        dados_departamentos, dados_turmas = get_all_data([endpoint_departments, endpoint_class])
+
+        # Importar departamentos
         if dados_departamentos:
-            
+
             self.import_departments(dados_departamentos)
 
-        # Obter dados de turmas
-        dados_turmas = get_data(endpoint_class)
+        # Importar turmas
         if dados_turmas:
-            
+
             self.import_class_groups(dados_turmas)
 
-        # Obter dados de alunos
-        dados_alunos = get_data(endpoint_students)
-        if dados_alunos:
-            
-            self.import_students(dados_alunos)
+        # Alunos e colaboradores são lidos em stream: cada lote é gravado enquanto o download continua
+        self.import_stream(self.import_students, stream_data(endpoint_students), endpoint_students)
+        self.import_stream(self.import_employees, stream_data(endpoint_employees), endpoint_employees)
+
+    def import_stream(self, import_method, items, source):
+        """
+        Importa os registros de um stream (resposta da API ou arquivo) em lotes de batch_size.
+        A leitura acontece em uma thread com no máximo dois lotes à frente da gravação, então a
+        memória usada não depende do tamanho do payload.
+        Args:
+            import_method (callable): O método de importação da entidade.
+            items (iterable): Os registros da entidade.
+            source (str): A origem dos registros, usada nas mensagens.
+        Raises:
+            CommandError: Se a leitura falhar; os lotes já gravados são mantidos.
+        """
+        try:
+            return import_method(iter_in_background(items, 2 * getattr(self, 'batch_size', IMPORT_BATCH_SIZE)))
+        except (requests.exceptions.RequestException, JSONStreamError, OSError) as e:
+            raise CommandError(f"Erro ao ler {source}: {e}. Os lotes já gravados foram mantidos.") from e
+
+    def bulk_upsert(self, model, objects, update_fields, label):
+        """
+        Grava os objetos com INSERT ... ON CONFLICT (id) DO UPDATE, em lotes de batch_size.
+        Se um lote falhar, ele é gravado registro a registro para isolar os registros inválidos.
+        Args:
+            model (Model): O model dos objetos.
+            objects (list): Os objetos a gravar, com ids únicos.
+            update_fields (list): Os campos atualizados quando o id já existe.
+            label (str): O nome da entidade usado nas mensagens.
+        Returns:
+            set: Os ids dos objetos que não puderam ser gravados.
+        """
+        batch_size = getattr(self, 'batch_size', IMPORT_BATCH_SIZE)
+        options = {'update_conflicts': True, 'unique_fields': ['id'], 'update_fields': update_fields}
+        failed = set()
+
+        for start in range(0, len(objects), batch_size):
+            chunk = objects[start:start + batch_size]
+            try:
+                with transaction.atomic():
+                    model.objects.bulk_create(chunk, **options)
+            except Exception as e:
+                self.stderr.write(f"Erro ao gravar lote de {label}: {e}. Gravando registro a registro.")
+                for obj in chunk:
+                    try:
+                        with transaction.atomic():
+                            model.objects.bulk_create([obj], **options)
+                    except Exception as e:
+                        failed.add(obj.pk)
+                        self.stderr.write(f"Erro ao atualizar/criar {label} com id {obj.pk}: {e}")
+        return failed
+
+    def sync(self, model, rows, existing_hashes, label):
+        """
+        Grava apenas os registros novos ou alterados desde a última importação.
+        Cada registro é comparado pelo hash do seu conteúdo com o import_hash gravado, então uma
+        sincronização sem alterações na origem não escreve nada (nem atualiza updated_at).
+        Args:
+            model (Model): O model dos registros.
+            rows (dict): Id -> campos do registro como serão gravados.
+            existing_hashes (dict): Id -> import_hash dos registros já existentes; atualizado com
+                                    os registros gravados.
+            label (str): O nome da entidade usado nas mensagens de erro.
+        Returns:
+            tuple: As quantidades (Counter) de registros criados, atualizados, inalterados e com
+                   erro, e o conjunto de ids com erro.
+        """
+        objects = []
+        counts = Counter()
+        for pk, values in rows.items():
+            digest = content_hash(values)
+            if existing_hashes.get(pk) == digest:
+                counts['unchanged'] += 1
+                continue
+            objects.append(model(id=pk, import_hash=digest, **values))
 
-        # Obter dados de colaboradores
-        dados_colaboradores = get_data(endpoint_employees)
-        if dados_colaboradores:
-            
-            self.import_employees(dados_colaboradores)
+        update_fields = [*next(iter(rows.values()), {}), 'import_hash']
+        if any(field.name == 'updated_at' for field in model._meta.fields):
+            update_fields.append('updated_at')
+        failed = self.bulk_upsert(model, objects, update_fields, label) if objects else set()
+
+        for obj in objects:
+            if obj.pk in failed:
+                continue
+            counts['updated' if obj.pk in existing_hashes else 'created'] += 1
+            existing_hashes[obj.pk] = obj.import_hash
+        counts['failed'] = len(failed)
+        return counts, failed
+
+    def import_rows(self, model, items, build_row, existing_hashes, label, plural, info=None):
+        """
+        Importa os registros em lotes: valida e mapeia cada registro com build_row e grava o lote
+        com sync, criando em seguida as informações (StudentInfo/EmployeeInfo) que faltam.
+        Args:
+            model (Model): O model dos registros.
+            items (iterable): Os registros vindos da API ou do arquivo.
+            build_row (callable): Recebe um registro e devolve (id, campos), ou None se for ignorado.
+            existing_hashes (dict): Id -> import_hash dos registros já existentes.
+            label (str): O nome da entidade usado nas mensagens de erro.
+            plural (str): O nome da entidade usado no resumo.
+            info (tuple, optional): (model de informações, campo do paciente) a criar para cada registro.
+        Returns:
+            Counter: As quantidades de registros criados, atualizados, inalterados, com erro e ignorados.
+        """
+        started = time.monotonic()
+        totals = Counter()
+        if info:
+            info_model, patient_field = info
+            existing_info = set(
+                info_model.objects.filter(**{f'{patient_field}__isnull': False})
+                .values_list(f'{patient_field}_id', flat=True)
+            )
+
+        try:
+            for batch in iter_batches(items, getattr(self, 'batch_size', IMPORT_BATCH_SIZE)):
+                rows = {}
+                for item in batch:
+                    row = build_row(item)
+                    if row is None:
+                        totals['skipped'] += 1
+                        continue
+                    # O mesmo id não pode aparecer duas vezes no lote; o último registro prevalece
+                    pk, values = row
+                    rows[pk] = values
+
+                counts, failed = self.sync(model, rows, existing_hashes, label)
+                totals.update(counts)
+
+                if info:
+                    missing = [pk for pk in rows if pk not in failed and pk not in existing_info]
+                    info_model.objects.bulk_create([
+                        info_model(**{f'{patient_field}_id': pk, 'allergies': '', 'patient_notes': ''})
+                        for pk in missing
+                    ])
+                    existing_info.update(missing)
+                    totals['info_created'] += len(missing)
+        except Exception:
+            # A execução interrompida também aparece nas métricas, com os lotes já gravados
+            record_import(model._meta.model_name, time.monotonic() - started, totals, failed=True)
+            raise
+
+        self.stdout.write(
+            f"{plural}: {totals['created']} criados, {totals['updated']} atualizados, "
+            f"{totals['unchanged']} inalterados, {totals['failed']} com erro, {totals['skipped']} ignorados."
+        )
+        if info:
+            self.stdout.write(f"{info_model.__name__}: {totals['info_created']} criados.")
+        record_import(model._meta.model_name, time.monotonic() - started, totals)
+        return totals
+
+    def check_registry(self, registries, patient_id, registry, name, label):
+        """
+        Verifica se a matrícula já pertence a outro id, o que violaria a restrição unique de registry.
+        Args:
+            registries (dict): Matrícula -> id dos registros já existentes ou já aceitos nesta importação.
+        Returns:
+            bool: True se o registro pode ser gravado.
+        """
+        owner = registries.get(registry)
+        if owner is not None and owner != patient_id:
+            self.stderr.write(f"{label} {name}: matrícula {registry} já pertence ao id {owner}. Registro ignorado.")
+            return False
+        registries[registry] = patient_id
+        return True
 
     def import_departments(self, data):
-        
-        for item in data:
+
+        def build_row(item):
             dept_id = item.get('ID')
             name = item.get('NAME')
             director = item.get('DIRECTOR')
@@ -50,33 +282,20 @@ class Command(BaseCommand):
             # Verifica se o nome do departamento está presente
             if not name:
                 self.stderr.write(f"Departamento com id {dept_id} sem nome. Registro ignorado.")
-                continue
+                return None
 
             # Atribui um valor padrão para o diretor se não estiver presente
             if not director:
                 director = 'Diretor Desconhecido'
 
-            try:
-                department, created = Department.objects.update_or_create(
-                    id=dept_id,
-                    defaults={
-                        'name': name,
-                        'director': director,
-                    }
-                )
-                if created:
-                    self.stdout.write(f"Departamento criado: {department.name}")
-                else:
-                    self.stdout.write(f"Departamento atualizado: {department.name}")
-
-                
-            except Exception as e:
-                self.stderr.write(f"Erro ao atualizar/criar Departamento com id {dept_id}: {e}")
+            return str(dept_id), {'name': name, 'director': director}
 
+        existing_hashes = dict(Department.objects.values_list('id', 'import_hash'))
+        return self.import_rows(Department, data, build_row, existing_hashes, 'Departamento', 'Departamentos')
 
     def import_class_groups(self, data):
-      
-        for item in data:
+
+        def build_row(item):
             group_id = item.get('ID')
             name = item.get('NAME')
             segment = item.get('SEGMENT')
@@ -85,7 +304,7 @@ class Command(BaseCommand):
             # Verificação do campo 'name'
             if not name:
                 self.stderr.write(f"Turma com id {group_id} sem nome. Registro ignorado.")
-                continue
+                return None
 
             # Atribuição de valores padrão se necessário
             if not segment:
@@ -93,27 +312,19 @@ class Command(BaseCommand):
             if not director:
                 director = 'Diretor Desconhecido'
 
-            try:
-                class_group, created = ClassGroup.objects.update_or_create(
-                    id=group_id,
-                    defaults={
-                        'name': name,
-                        'segment': segment,
-                        'director': director,
-                    }
-                )
-                if created:
-                    self.stdout.write(f"Turma criada: {class_group.name}")
-                else:
-                    self.stdout.write(f"Turma atualizada: {class_group.name}")
-            except Exception as e:
-                self.stderr.write(f"Erro ao atualizar/criar Turma com id {group_id}: {e}")
-
-
+            return str(group_id), {'name': name, 'segment': segment, 'director': director}
 
+        existing_hashes = dict(ClassGroup.objects.values_list('id', 'import_hash'))
+        return self.import_rows(ClassGroup, data, build_row, existing_hashes, 'Turma', 'Turmas')
 
     def import_students(self, data):
-        for item in data:
+        # Pré-carregar as turmas, as matrículas e os hashes existentes em vez de consultar registro a registro
+        class_group_ids = set(ClassGroup.objects.values_list('id', flat=True))
+        existing = list(Student.objects.values_list('id', 'registry', 'import_hash'))
+        registries = {registry: pk for pk, registry, _ in existing}
+        existing_hashes = {pk: digest for pk, _, digest in existing}
+
+        def build_row(item):
             student_id = item.get('ID')
             name = item.get('NAME')
             age = item.get('AGE')
@@ -130,65 +341,50 @@ class Command(BaseCommand):
             # Verificação dos campos obrigatórios
             if not name:
                 self.stderr.write(f"Aluno com id {student_id} sem nome. Registro ignorado.")
-                continue
+                return None
             if not registry:
                 self.stderr.write(f"Aluno {name} sem registro. Registro ignorado.")
-                continue
+                return None
             if not gender:
                 gender = 'Não Informado'
 
-           
-            # Obter o objeto ClassGroup
-            class_group = None
-            if class_group_id:
-                try:
-                    class_group = ClassGroup.objects.get(id=class_group_id)
-                except ClassGroup.DoesNotExist:
-                    self.stderr.write(f"Turma não encontrada para o aluno {name} (ID: {class_group_id})")
-
-            try:
-                student, created = Student.objects.update_or_create(
-                    id=student_id,
-                    defaults={
-                        'name': name,
-                        'age': age if age is not None else 0,
-                        'gender': gender,
-                        'email': email,
-                        'registry': registry,
-                        'class_group': class_group,
-                        'birth_date': birth_date,
-                        'father_name': father_name,
-                        'father_phone': father_phone,
-                        'mother_name': mother_name,
-                        'mother_phone': mother_phone,
-                        'updated_at': timezone.now(),
-                    }
-                )
-                if created:
-                    self.stdout.write(f"Aluno criado: {student.name}")
-                else:
-                    self.stdout.write(f"Aluno atualizado: {student.name}")
-
-                # Criar ou obter o StudentInfo associado
-                student_info, info_created = StudentInfo.objects.get_or_create(
-                    student=student,
-                    defaults={
-                        'allergies': '',
-                        'patient_notes': '',
-                    }
-                )
-                if info_created:
-                    self.stdout.write(f"StudentInfo criado para: {student.name}")
-                else:
-                    self.stdout.write(f"StudentInfo já existia para: {student.name}")
-            except Exception as e:
-                self.stderr.write(f"Erro ao atualizar/criar Aluno com id {student_id}: {e}")
-
-
+            student_id = str(student_id)
+            registry = str(registry)
+            if not self.check_registry(registries, student_id, registry, name, 'Aluno'):
+                return None
+
+            # Obter a turma do conjunto pré-carregado
+            class_group = str(class_group_id) if class_group_id else None
+            if class_group and class_group not in class_group_ids:
+                self.stderr.write(f"Turma não encontrada para o aluno {name} (ID: {class_group_id})")
+                class_group = None
+
+            return student_id, {
+                'name': name,
+                'age': age if age is not None else 0,
+                'gender': gender,
+                'email': email,
+                'registry': registry,
+                'class_group_id': class_group,
+                'birth_date': birth_date,
+                'father_name': father_name,
+                'father_phone': father_phone,
+                'mother_name': mother_name,
+                'mother_phone': mother_phone,
+            }
+
+        # Os StudentInfo que ainda não existem são criados a cada lote
+        return self.import_rows(Student, data, build_row, existing_hashes, 'Aluno', 'Alunos',
+                                info=(StudentInfo, 'student'))
 
     def import_employees(self, data):
-        
-        for item in data:
+        # Pré-carregar os departamentos, as matrículas e os hashes existentes em vez de consultar registro a registro
+        department_ids = set(Department.objects.values_list('id', flat=True))
+        existing = list(Employee.objects.values_list('id', 'registry', 'import_hash'))
+        registries = {registry: pk for pk, registry, _ in existing}
+        existing_hashes = {pk: digest for pk, _, digest in existing}
+
+        def build_row(item):
             employee_id = item.get('ID')
             name = item.get('NAME')
             age = item.get('AGE')
@@ -202,56 +398,35 @@ class Command(BaseCommand):
             # Verificação dos campos obrigatórios
             if not name:
                 self.stderr.write(f"Colaborador com id {employee_id} sem nome. Registro ignorado.")
-                continue
+                return None
             if not registry:
                 self.stderr.write(f"Colaborador {name} sem registro. Registro ignorado.")
-                continue
+                return None
             if not gender:
                 gender = 'Não Informado'
 
-        
-
-            # Obter o objeto Department
-            department = None
-            if department_id:
-                try:
-                    department = Department.objects.get(id=department_id)
-                except Department.DoesNotExist:
-                    self.stderr.write(f"Departamento não encontrado para o colaborador {name} (ID: {department_id})")
-
-            try:
-                employee, created = Employee.objects.update_or_create(
-                    id=employee_id,
-                    defaults={
-                        'name': name,
-                        'age': age if age is not None else 0,
-                        'gender': gender,
-                        'email': email,
-                        'birth_date': birth_date,
-                        'department': department,
-                        'position': position if position else 'Posição Desconhecida',
-                        'registry': registry,
-                        'updated_at': timezone.now(),
-                    }
-                )
-                if created:
-                    self.stdout.write(f"Colaborador criado: {employee.name}")
-                else:
-                    self.stdout.write(f"Colaborador atualizado: {employee.name}")
-
-
-                    # Criar ou obter o EmployeeInfo associado
-                employee_info, info_created = EmployeeInfo.objects.get_or_create(
-                    employee=employee,
-                    defaults={
-                        'allergies': '',
-                        'patient_notes': '',
-                    }
-                )
-                if info_created:
-                    self.stdout.write(f"EmployeeInfo criado para: {employee.name}")
-                else:
-                    self.stdout.write(f"EmployeeInfo já existia para: {employee.name}")
-
-            except Exception as e:
-                self.stderr.write(f"Erro ao atualizar/criar Colaborador com id {employee_id}: {e}")
+            employee_id = str(employee_id)
+            registry = str(registry)
+            if not self.check_registry(registries, employee_id, registry, name, 'Colaborador'):
+                return None
+
+            # Obter o departamento do conjunto pré-carregado
+            department = str(department_id) if department_id else None
+            if department and department not in department_ids:
+                self.stderr.write(f"Departamento não encontrado para o colaborador {name} (ID: {department_id})")
+                department = None
+
+            return employee_id, {
+                'name': name,
+                'age': age if age is not None else 0,
+                'gender': gender,
+                'email': email,
+                'birth_date': birth_date,
+                'department_id': department,
+                'position': position if position else 'Posição Desconhecida',
+                'registry': registry,
+            }
+
+        # Os EmployeeInfo que ainda não existem são criados a cada lote
+        return self.import_rows(Employee, data, build_row, existing_hashes, 'Colaborador', 'Colaboradores',
+                                info=(EmployeeInfo, 'employee'))
@@ -0,0 +1,56 @@
+# controller/management/commands/manage_partitions.py
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from appointments.partitions import (
+    APPOINTMENT_TABLE, ARCHIVE_SCHEMA, archive_year_partition, create_year_partition, list_partitions,
+    partition_name, restore_year_partition,
+)
+
+
+class Command(BaseCommand):
+    help = ('Cria as partições anuais das tabelas de atendimentos para os próximos anos e, opcionalmente, '
+            'arquiva (desanexa) as partições de anos antigos.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ahead', type=int, default=1,
+            help='Quantidade de anos futuros com partição garantida, além do ano atual. Padrão: 1.',
+        )
+        parser.add_argument(
+            '--archive-before', type=int, metavar='ANO',
+            help=f'Desanexa as partições dos anos anteriores a este e as move para o schema "{ARCHIVE_SCHEMA}".',
+        )
+        parser.add_argument(
+            '--restore', type=int, metavar='ANO',
+            help='Anexa novamente a partição arquivada deste ano.',
+        )
+
+    def handle(self, *args, **options):
+        if options['ahead'] < 0:
+            raise CommandError("--ahead não pode ser negativo.")
+        current = timezone.localdate().year
+        if options['archive_before'] and options['archive_before'] > current:
+            raise CommandError("Não é possível arquivar o ano atual nem anos futuros.")
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            table = APPOINTMENT_TABLE
+            for year in range(current, current + options['ahead'] + 1):
+                if create_year_partition(cursor, table, year):
+                    self.stdout.write(f"Partição criada: {partition_name(table, year)}")
+
+            if options['restore']:
+                if restore_year_partition(cursor, table, options['restore']):
+                    self.stdout.write(f"Partição restaurada: {partition_name(table, options['restore'])}")
+                else:
+                    self.stdout.write(f"Nenhuma partição arquivada de {options['restore']} em {table}.")
+
+            if options['archive_before']:
+                for name, _ in list_partitions(cursor, table):
+                    year = name.rsplit('_y', 1)[-1]
+                    if year.isdigit() and int(year) < options['archive_before']:
+                        archive_year_partition(cursor, table, int(year))
+                        self.stdout.write(f"Partição arquivada: {ARCHIVE_SCHEMA}.{name}")
+
+        self.stdout.write("Partições das tabelas de atendimentos atualizadas.")
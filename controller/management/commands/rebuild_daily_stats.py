@@ -0,0 +1,26 @@
+# controller/management/commands/rebuild_daily_stats.py
+
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from controller.crud import rebuild_daily_stats
+
+
+class Command(BaseCommand):
+    help = 'Recalcula a tabela de estatísticas diárias de atendimentos (DailyAppointmentStats).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            help='Recalcula apenas os dias a partir desta data (AAAA-MM-DD). Por padrão, todos os dias.',
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options.get('since'):
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError(f"Data inválida: {options['since']}. Use o formato AAAA-MM-DD.")
+
+        rows = rebuild_daily_stats(since)
+        self.stdout.write(f"Estatísticas diárias recalculadas: {rows} linhas gravadas.")
@@ -0,0 +1,143 @@
+import time
+from django.conf import settings
+from django.db.models import Sum
+from django.dispatch import receiver
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+)
+from prometheus_client.core import CounterMetricFamily
+from appointments.models import DailyAppointmentStats
+from controller.instrumentation import request_measured
+
+'''
+    Prometheus metrics of the application, served in the text format at /metrics/.
+
+    Request latency, query counts and times (from RequestTimingMiddleware), dashboard cache
+    lookups and import_data runs are recorded by each process. With more than one worker, set
+    PROMETHEUS_MULTIPROC_DIR (environment variable, read by prometheus_client when it is
+    imported) to a directory shared by the workers and the import_data runs: each process
+    writes its values to files there and /metrics/ adds them up. The directory must be emptied
+    before the server starts.
+
+    The appointments per infirmary are read from the DailyAppointmentStats rollup at each
+    scrape, so they match the database whatever process recorded them.
+'''
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+REQUEST_LATENCY = Histogram(
+    'enfermaria_request_duration_seconds', 'Tempo de resposta das requisições, por view.',
+    ['view', 'method'],
+)
+REQUESTS = Counter(
+    'enfermaria_requests', 'Requisições atendidas, por view e status.',
+    ['view', 'method', 'status'],
+)
+REQUEST_DB_QUERIES = Histogram(
+    'enfermaria_request_db_queries', 'Consultas ao banco de dados por requisição, por view.',
+    ['view'], buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 200),
+)
+REQUEST_DB_TIME = Counter(
+    'enfermaria_request_db_seconds', 'Tempo gasto em consultas ao banco de dados, por view.',
+    ['view'],
+)
+REQUEST_TEMPLATE_TIME = Counter(
+    'enfermaria_request_template_seconds', 'Tempo gasto renderizando templates, por view.',
+    ['view'],
+)
+CACHE_LOOKUPS = Counter(
+    'enfermaria_cache_lookups', 'Consultas ao cache do painel, por cache e resultado (hit/miss).',
+    ['cache', 'result'],
+)
+IMPORT_DURATION = Histogram(
+    'enfermaria_import_duration_seconds', 'Duração da importação de cada entidade pelo import_data.',
+    ['entity'], buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600),
+)
+IMPORT_ROWS = Counter(
+    'enfermaria_import_rows', 'Registros processados pelo import_data, por entidade e resultado.',
+    ['entity', 'result'],
+)
+IMPORT_FAILURES = Counter(
+    'enfermaria_import_failures', 'Importações do import_data interrompidas por erro, por entidade.',
+    ['entity'],
+)
+IMPORT_LAST_RUN = Gauge(
+    'enfermaria_import_last_run_timestamp_seconds', 'Horário da última importação concluída de cada entidade.',
+    ['entity'], multiprocess_mode='max',
+)
+
+# Results counted by import_data.import_rows
+IMPORT_RESULTS = ('created', 'updated', 'unchanged', 'failed', 'skipped')
+
+
+@receiver(request_measured, dispatch_uid='metrics_request_measured')
+def record_request(sender, metrics, **kwargs):
+    REQUEST_LATENCY.labels(metrics.url_name, metrics.method).observe(metrics.total_ms / 1000)
+    REQUESTS.labels(metrics.url_name, metrics.method, str(metrics.status_code)).inc()
+    REQUEST_DB_QUERIES.labels(metrics.url_name).observe(metrics.queries)
+    REQUEST_DB_TIME.labels(metrics.url_name).inc(metrics.db_ms / 1000)
+    REQUEST_TEMPLATE_TIME.labels(metrics.url_name).inc(metrics.template_ms / 1000)
+
+
+def record_cache_lookup(cache_name, hit):
+    """
+    Counts a lookup of one of the dashboard caches.
+    Args:
+        cache_name (str): The cache, e.g. 'dashboard_stats'.
+        hit (bool): Whether the value was found in the cache.
+    """
+    CACHE_LOOKUPS.labels(cache_name, 'hit' if hit else 'miss').inc()
+
+
+def record_import(entity, seconds, totals, failed=False):
+    """
+    Records an import_data run of an entity.
+    Args:
+        entity (str): The imported entity, e.g. 'student'.
+        seconds (float): The duration of the run.
+        totals (Counter): The number of rows per result (see IMPORT_RESULTS).
+        failed (bool, optional): Whether the run was interrupted by an error. Defaults to False.
+    """
+    IMPORT_DURATION.labels(entity).observe(seconds)
+    for result in IMPORT_RESULTS:
+        IMPORT_ROWS.labels(entity, result).inc(totals.get(result, 0))
+    if failed:
+        IMPORT_FAILURES.labels(entity).inc()
+    else:
+        IMPORT_LAST_RUN.labels(entity).set(time.time())
+
+
+class AppointmentCollector:
+    """
+    The appointments recorded per infirmary and patient type, summed from DailyAppointmentStats
+    when the metrics are collected.
+    """
+
+    def describe(self):
+        return [CounterMetricFamily('enfermaria_appointments', 'Atendimentos registrados, por enfermaria.',
+                                    labels=['infirmary', 'patient_type'])]
+
+    def collect(self):
+        family = self.describe()[0]
+        rows = (DailyAppointmentStats.objects.values('infirmary', 'patient_type')
+                .annotate(total=Sum('count')).order_by('infirmary', 'patient_type'))
+        for row in rows:
+            family.add_metric([row['infirmary'], row['patient_type']], row['total'])
+        yield family
+
+
+APPOINTMENTS_REGISTRY = CollectorRegistry()
+APPOINTMENTS_REGISTRY.register(AppointmentCollector())
+
+
+def render_metrics():
+    """
+    Returns every metric in the Prometheus text format: the values of all the worker processes
+    when PROMETHEUS_MULTIPROC_DIR is set, otherwise those of this process.
+    """
+    if settings.PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry, path=settings.PROMETHEUS_MULTIPROC_DIR)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry) + generate_latest(APPOINTMENTS_REGISTRY)
@@ -0,0 +1,309 @@
+import hashlib
+import logging
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter, namedtuple
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from patients.models import Student, Employee, Visitor, ClassGroup, Department
+from .crud import normalize_name, AUTOCOMPLETE_LIMIT
+
+logger = logging.getLogger('controller.name_index')
+
+'''
+    In-process name index for the patient autocomplete endpoints.
+
+    The roster only changes when import_data runs (or when a visitor is registered), so each
+    worker can keep the normalized names in memory and answer every keystroke without touching
+    the database. The index is enabled by PATIENT_NAME_INDEX_ENABLED, warmed when the WSGI/ASGI
+    application starts and refreshed incrementally from updated_at (import_data bumps it on
+    every changed row), checking at most once every PATIENT_NAME_INDEX_REFRESH_SECONDS. Each
+    check also compares the row count and a checksum of the (id, class group or department)
+    pairs with the table, and rebuilds the index when patients were deleted or moved without
+    touching updated_at. The class group and department names are not part of the patient
+    rows: renaming them does not touch updated_at either, so each check reloads those (small)
+    tables.
+'''
+
+# Minimum share of the term trigrams found in a name to accept a fuzzy match
+# (same default as pg_trgm.word_similarity_threshold).
+SIMILARITY_THRESHOLD = 0.6
+
+_IndexData = namedtuple('_IndexData', ['names', 'results', 'trigrams'])
+
+
+def _row_checksum(pk, related_id):
+    # Same value as the SQL of NameIndex._table_state for one row
+    digest = hashlib.md5(f"{pk}:{related_id if related_id is not None else ''}".encode()).hexdigest()
+    return int(digest[:15], 16)
+
+
+def trigrams(text):
+    """
+    Returns the trigrams of each word of a normalized text, padded like pg_trgm.
+    Args:
+        text (str): A normalized text.
+    Returns:
+        set: The trigrams of the text.
+    """
+    result = set()
+    for word in text.split():
+        padded = f'  {word} '
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+class NameIndex:
+    """
+    Prefix and trigram index over the names of one patient model.
+    Entries are kept in compact parallel arrays sorted by normalized name (prefix lookup by
+    bisection) plus a trigram -> positions map (substring and fuzzy lookup). Rebuilt structures
+    are published with a single assignment, so searches never take the lock.
+    Args:
+        model (Model): The patient model.
+        fields (list): The fields loaded for to_result besides pk and name.
+        to_result (callable): Turns a loaded row into the result dictionary.
+        related (tuple, optional): (foreign key, model) whose name is given to to_result as
+                                   '<foreign key>__name', e.g. ('class_group', ClassGroup).
+    """
+
+    def __init__(self, model, fields, to_result, related=None):
+        self.model = model
+        self.fields = fields
+        self.to_result = to_result
+        self.related = related
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._related_names = {}
+        self._checksum = 0
+        self._data = None
+        self._watermark = None
+        self._checked_at = 0.0
+
+    @property
+    def is_built(self):
+        return self._data is not None
+
+    def build(self):
+        """
+        Loads every row of the model and publishes a new index.
+        """
+        logger.info("Building name index for %s", self.model.__name__)
+        with self._lock:
+            self._rows = {}
+            self._checksum = 0
+            self._watermark = None
+            self._load(self.model.objects.all())
+            self._load_related_names()
+            self._publish()
+            self._checked_at = time.monotonic()
+        logger.info("Name index for %s built with %s entries", self.model.__name__, len(self._rows))
+
+    def refresh(self):
+        """
+        Loads the rows changed since the last build or refresh and republishes the index if needed.
+        The index is rebuilt instead when it has no watermark yet (the table was empty) or when
+        its rows no longer match the table (patients were deleted, or moved to another class
+        group or department without touching updated_at). The related names are reloaded every
+        time.
+        Returns:
+            int: The number of changed rows.
+        """
+        if not self.is_built or self._watermark is None:
+            self.build()
+            return len(self._rows)
+
+        with self._lock:
+            updated_at, pk = self._watermark
+            changed = self._load(self.model.objects.filter(
+                Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, pk__gt=pk),
+            ))
+            renamed = self._load_related_names()
+            stale = self._table_state() != (len(self._rows), self._checksum)
+            if (changed or renamed) and not stale:
+                self._publish()
+            self._checked_at = time.monotonic()
+        if stale:
+            self.build()
+            return len(self._rows)
+        if changed:
+            logger.info("Name index for %s refreshed with %s changed entries", self.model.__name__, changed)
+        return changed
+
+    def search(self, name, limit=AUTOCOMPLETE_LIMIT):
+        """
+        Searches the index like controller.crud.search_by_name: accent and case insensitive,
+        substring or trigram similarity matches, names starting with the term first.
+        Args:
+            name (str): The term typed by the user.
+            limit (int, optional): The maximum number of results. Defaults to AUTOCOMPLETE_LIMIT.
+        Returns:
+            list: The result dictionaries of the matching entries, best matches first.
+        """
+        self._ensure_fresh()
+        term = normalize_name(name)
+        data = self._data
+        if not term or not data.names:
+            return []
+
+        names = data.names
+        term_trigrams = trigrams(term)
+        shared = Counter()
+        for trigram in term_trigrams:
+            shared.update(data.trigrams.get(trigram, ()))
+
+        # Names starting with the term are a contiguous run of the sorted array.
+        candidates = set()
+        position = bisect_left(names, term)
+        while position < len(names) and names[position].startswith(term):
+            candidates.add(position)
+            position += 1
+
+        # A name containing the term contains every trigram inside its words, so the
+        # intersection of those postings holds all the substring matches.
+        inner = {word[i:i + 3] for word in term.split() for i in range(len(word) - 2)}
+        if inner:
+            postings = sorted((data.trigrams.get(trigram, ()) for trigram in inner), key=len)
+            substring = set(postings[0])
+            for positions in postings[1:]:
+                substring.intersection_update(positions)
+            candidates.update(substring)
+
+        # Fuzzy matches, and word prefixes for terms too short to have inner trigrams.
+        candidates.update(
+            position for position, count in shared.items()
+            if count / len(term_trigrams) >= SIMILARITY_THRESHOLD or not inner
+        )
+
+        scored = []
+        for position in candidates:
+            value = names[position]
+            similarity = shared[position] / len(term_trigrams)
+            if term in value or similarity >= SIMILARITY_THRESHOLD:
+                scored.append((not value.startswith(term), -similarity, position))
+
+        # Positions follow the alphabetical order of the names, which breaks the ties.
+        scored.sort()
+        return [data.results[position] for _, _, position in scored[:limit]]
+
+    def _ensure_fresh(self):
+        if not self.is_built:
+            self.build()
+        elif time.monotonic() - self._checked_at >= settings.PATIENT_NAME_INDEX_REFRESH_SECONDS:
+            self.refresh()
+
+    def _load(self, queryset):
+        # Returns the number of rows whose entry changed; the watermark is the last
+        # (updated_at, pk) seen, so a refresh never loads the same row twice.
+        count = 0
+        fields = [*self.fields, f'{self.related[0]}_id'] if self.related else self.fields
+        rows = queryset.values('pk', 'name', 'updated_at', *fields).order_by('updated_at', 'pk')
+        for row in rows.iterator():
+            self._watermark = (row.pop('updated_at'), row['pk'])
+            entry = (normalize_name(row['name'] or ''), row)
+            previous = self._rows.get(row['pk'])
+            if previous != entry:
+                if previous is not None:
+                    self._checksum -= self._entry_checksum(previous[1])
+                self._checksum += self._entry_checksum(row)
+                self._rows[row['pk']] = entry
+                count += 1
+        return count
+
+    def _entry_checksum(self, row):
+        return _row_checksum(row['pk'], row[f'{self.related[0]}_id'] if self.related else None)
+
+    def _table_state(self):
+        # The row count and the sum of _row_checksum over the table, computed by the database
+        qn = connection.ops.quote_name
+        meta = self.model._meta
+        related = f"{qn(meta.get_field(self.related[0]).column)}::text" if self.related else 'NULL'
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT COUNT(*), COALESCE(SUM(
+                    ('x' || LEFT(MD5({qn(meta.pk.column)}::text || ':' || COALESCE({related}, '')), 15))::bit(60)::bigint
+                ), 0)
+                FROM {qn(meta.db_table)}
+                """
+            )
+            count, checksum = cursor.fetchone()
+        return count, int(checksum)
+
+    def _load_related_names(self):
+        # Returns whether any related name changed since the last load
+        if self.related is None:
+            return False
+        names = dict(self.related[1].objects.values_list('pk', 'name'))
+        renamed = names != self._related_names
+        self._related_names = names
+        return renamed
+
+    def _result(self, row):
+        if self.related is not None:
+            field = self.related[0]
+            row = {**row, f'{field}__name': self._related_names.get(row[f'{field}_id'])}
+        return self.to_result(row)
+
+    def _publish(self):
+        entries = sorted(self._rows.values(), key=lambda entry: entry[0])
+        names = [normalized for normalized, _ in entries]
+        results = [self._result(row) for _, row in entries]
+        index = {}
+        for position, normalized in enumerate(names):
+            for trigram in trigrams(normalized):
+                index.setdefault(trigram, array('I')).append(position)
+        self._data = _IndexData(names, results, index)
+
+
+student_name_index = NameIndex(
+    Student,
+    ['registry', 'age'],
+    lambda row: {
+        'name': row['name'],
+        'registry': row['registry'],
+        'age': row['age'],
+        'class_group_name': row['class_group__name'],
+    },
+    related=('class_group', ClassGroup),
+)
+
+employee_name_index = NameIndex(
+    Employee,
+    ['registry'],
+    lambda row: {
+        'id': row['pk'],
+        'name': row['name'],
+        'registry': row['registry'],
+        'department_name': row['department__name'],
+    },
+    related=('department', Department),
+)
+
+visitor_name_index = NameIndex(
+    Visitor,
+    ['age', 'email'],
+    lambda row: {
+        'name': row['name'],
+        'age': row['age'],
+        'email': row['email'],
+    },
+)
+
+
+def warm_name_indexes():
+    """
+    Builds the name indexes of the current worker when PATIENT_NAME_INDEX_ENABLED is set.
+    Called once when the WSGI/ASGI application starts; a failure only logs the error, since the
+    indexes are built again lazily on the first search.
+    """
+    if not settings.PATIENT_NAME_INDEX_ENABLED:
+        return
+    for index in (student_name_index, employee_name_index, visitor_name_index):
+        try:
+            index.build()
+        except Exception as e:
+            logger.error("Error building name index for %s: %s", index.model.__name__, e, exc_info=True)
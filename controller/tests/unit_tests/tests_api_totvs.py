@@ -0,0 +1,138 @@
+import json
+import threading
+import time
+from io import StringIO
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from patients.models import *
+from controller.import_script import api_totvs
+
+
+'''
+    Tests for the TOTVS client against a local stand-in server that serves fixture JSON.
+'''
+
+FIXTURES = {
+    '/APP.ENF1': [{'ID': 'D1', 'NAME': 'HR', 'DIRECTOR': 'Director HR'}],
+    '/APP.ENF2': [{'ID': 'E1', 'NAME': 'Ana Lima', 'AGE': 30, 'GENDER': 'Female', 'REGISTRY': 'E1', 'DEPARTMENT': 'D1'}],
+    '/APP.ENF3': [{'ID': 'S1', 'NAME': 'João Souza', 'AGE': 10, 'GENDER': 'Male', 'REGISTRY': 'S1', 'CLASS_GROUP': 'CG1'}],
+    '/APP.ENF4': [{'ID': 'CG1', 'NAME': 'Class 1', 'SEGMENT': 'Primary', 'DIRECTOR': 'Director 1'}],
+}
+
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FixtureHandler)
+        self.lock = threading.Lock()
+        self.failures = {}
+        self.delay = 0
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, self.headers.get('Authorization')))
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            failing = server.failures.get(self.path, 0)
+            if failing:
+                server.failures[self.path] = failing - 1
+        time.sleep(server.delay)
+        with server.lock:
+            server.active -= 1
+
+        if failing:
+            self.send_response(503)
+            self.end_headers()
+            return
+        if self.path not in FIXTURES:
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = json.dumps(FIXTURES[self.path]).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureServerMixin:
+
+    def setUp(self):
+        super().setUp()
+        self.server = FixtureServer()
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.session = api_totvs.create_session(retries=2, backoff_factor=0)
+        self.addCleanup(self.session.close)
+
+    def endpoint(self, name):
+        return f'{self.server.url}/{name}'
+
+
+class TestApiTotvs(FixtureServerMixin, SimpleTestCase):
+
+    def test_get_data_returns_json(self):
+        data = api_totvs.get_data(self.endpoint('APP.ENF1'), session=self.session)
+        self.assertEqual(data, FIXTURES['/APP.ENF1'])
+        self.assertTrue(self.server.requests[0][1].startswith('Basic '))
+
+    def test_get_data_retries_transient_errors(self):
+        self.server.failures['/APP.ENF4'] = 2
+        data = api_totvs.get_data(self.endpoint('APP.ENF4'), session=self.session)
+        self.assertEqual(data, FIXTURES['/APP.ENF4'])
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_get_data_gives_up_after_retries(self):
+        self.server.failures['/APP.ENF4'] = 5
+        with mock.patch('builtins.print'):
+            self.assertIsNone(api_totvs.get_data(self.endpoint('APP.ENF4'), session=self.session))
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_stream_data_yields_records(self):
+        records = api_totvs.stream_data(self.endpoint('APP.ENF3'), session=self.session, chunk_size=16)
+        self.assertEqual(list(records), FIXTURES['/APP.ENF3'])
+
+    def test_get_all_data_fetches_concurrently_in_order(self):
+        self.server.delay = 0.2
+        names = ['APP.ENF1', 'APP.ENF4', 'APP.ENF3', 'APP.ENF2']
+        data = api_totvs.get_all_data([self.endpoint(name) for name in names], session=self.session)
+        self.assertEqual(data, [FIXTURES[f'/{name}'] for name in names])
+        self.assertGreater(self.server.max_active, 1)
+
+
+class TestImportDataCommand(FixtureServerMixin, TestCase):
+
+    def test_import_data_from_server(self):
+        endpoints = {
+            'endpoint_departments': self.endpoint('APP.ENF1'),
+            'endpoint_employees': self.endpoint('APP.ENF2'),
+            'endpoint_students': self.endpoint('APP.ENF3'),
+            'endpoint_class': self.endpoint('APP.ENF4'),
+        }
+        # The endpoints point at the fixture server, whatever API_URL says (or if it is unset)
+        with mock.patch.multiple('controller.management.commands.import_data', **endpoints), \
+                mock.patch.object(api_totvs, 'base_url', self.server.url):
+            call_command('import_data', stdout=StringIO(), stderr=StringIO())
+
+        self.assertEqual(Student.objects.get(id='S1').class_group_id, 'CG1')
+        self.assertEqual(Employee.objects.get(id='E1').department_id, 'D1')
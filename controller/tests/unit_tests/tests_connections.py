@@ -0,0 +1,34 @@
+import io
+import re
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+
+class TestBenchmarkConnections(TransactionTestCase):
+
+    def run_benchmark(self, **options):
+        out = io.StringIO()
+        call_command('benchmark_connections', requests=5, max_age=30, stdout=out, **options)
+        return out.getvalue()
+
+    def test_reuse_opens_no_connection_per_request(self):
+        original = (connection.settings_dict['CONN_MAX_AGE'], connection.settings_dict['CONN_HEALTH_CHECKS'])
+        output = self.run_benchmark()
+        self.assertRegex(output, r'sem reutilização \(CONN_MAX_AGE=0\): .* 5 conexões abertas')
+        self.assertRegex(output, r'com reutilização \(CONN_MAX_AGE=30\): .* 0 conexões abertas')
+        self.assertTrue(re.search(r'Ganho médio por requisição: -?\d+\.\d+ ms', output))
+        self.assertEqual((connection.settings_dict['CONN_MAX_AGE'], connection.settings_dict['CONN_HEALTH_CHECKS']),
+                         original)
+
+    def test_benchmark_through_the_wsgi_handler(self):
+        output = self.run_benchmark(url='/accounts/login/')
+        self.assertIn('5 conexões abertas', output)
+
+
+class TestBenchmarkConnectionsInTransaction(TestCase):
+
+    def test_refuses_to_run_in_a_transaction(self):
+        with self.assertRaises(CommandError):
+            call_command('benchmark_connections', requests=1, stdout=io.StringIO())
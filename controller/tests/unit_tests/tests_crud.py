@@ -1,9 +1,20 @@
+import os
+import sys
 import json
+import uuid
+import subprocess
+from django.conf import settings
 from django.test import TestCase
+from django.contrib.auth.models import User
 from django.http import JsonResponse, Http404
 from django.forms.models import model_to_dict
 from django.core.exceptions import ValidationError
+from django.utils import timezone
+from django.core.cache import cache
+from django.db import IntegrityError
+from datetime import datetime, timedelta
 from patients.models import *
+from appointments.models import Appointment, DailyAppointmentStats, StudentAppointment, VisitorAppointment
 from controller.crud import *
 
 
@@ -228,4 +239,561 @@ class TestDeleteObject(TestCase):
         response_data = json.loads(response.content)
         self.assertIn('status', response_data)
         self.assertEqual(response_data['status'], 'error')
-        self.assertEqual(response_data['message'], 'Object not found')
\ No newline at end of file
+        self.assertEqual(response_data['message'], 'Object not found')
+
+class TestReportAppointments(TestCase):
+
+    def setUp(self):
+        self.class_group = ClassGroup.objects.create(id='CG1', name='Class 1', segment='Primary', director='Director 1')
+        self.department = Department.objects.create(id='D1', name='TI', director='Director 2')
+        self.student = Student.objects.create(
+            id='S1', name='John Doe', age=15, gender='Male', registry='S123456', class_group=self.class_group,
+        )
+        self.employee = Employee.objects.create(
+            id='E1', name='Mary Smith', age=40, gender='Female', registry='E123456', department=self.department,
+        )
+        self.visitor = Visitor.objects.create(
+            name='Paul Brown', age=35, gender='Male', email='paul@example.com', relationship='Parente',
+        )
+        now = timezone.now()
+        self.date_begin = now - timedelta(days=30)
+        self.date_end = now
+        common = {'nurse': 'Nurse Joy', 'reason': 'Headache', 'treatment': 'Rest'}
+        for days in (1, 4, 7):
+            StudentAppointment.objects.create(
+                student=self.student, infirmary='Infantil', current_class='Math',
+                date=now - timedelta(days=days), contact_parents=True, **common,
+            )
+        EmployeeAppointment.objects.create(
+            employee=self.employee, infirmary='Fundamental', date=now - timedelta(days=2), **common,
+        )
+        VisitorAppointment.objects.create(
+            visitor=self.visitor, infirmary='Infantil', date=now - timedelta(days=3), **common,
+        )
+        VisitorAppointment.objects.create(
+            visitor=self.visitor, infirmary='Infantil', date=now - timedelta(days=60), **common,
+        )
+        self.infirmaries = ['Infantil', 'Fundamental']
+
+    def test_report_is_ordered_by_date_desc(self):
+        result = get_all_appointments(self.date_begin, self.date_end, self.infirmaries, '')
+        self.assertEqual(len(result), 5)
+        self.assertEqual(
+            [row['type'] for row in result],
+            ['Estudante', 'Funcionário', 'Visitante', 'Estudante', 'Estudante'],
+        )
+        dates = [row['date'] for row in result]
+        self.assertEqual(dates, sorted(dates, reverse=True))
+
+    def test_report_columns(self):
+        result = get_all_appointments(self.date_begin, self.date_end, self.infirmaries, '')
+        student_row, employee_row, visitor_row = result[0], result[1], result[2]
+        self.assertEqual(student_row['name'], 'John Doe')
+        self.assertEqual(student_row['additional_info_label'], 'Turma')
+        self.assertEqual(student_row['additional_info'], 'Class 1')
+        self.assertEqual(student_row['current_class'], 'Math')
+        self.assertTrue(student_row['contact_parents'])
+        self.assertEqual(employee_row['additional_info'], 'TI')
+        self.assertEqual(employee_row['age'], 40)
+        self.assertEqual(employee_row['current_class'], '')
+        self.assertEqual(employee_row['contact_parents'], '')
+        self.assertEqual(visitor_row['additional_info_label'], 'Relacionamento')
+        self.assertEqual(visitor_row['additional_info'], 'Parente')
+
+    def test_report_filters_infirmaries_and_search_term(self):
+        result = get_all_appointments(self.date_begin, self.date_end, ['Fundamental'], '')
+        self.assertEqual([row['name'] for row in result], ['Mary Smith'])
+
+        result = get_all_appointments(self.date_begin, self.date_end, self.infirmaries, 'Paul')
+        self.assertEqual([row['type'] for row in result], ['Visitante'])
+
+    def test_report_page_is_a_single_query(self):
+        appointments = get_report_appointments(self.date_begin, self.date_end, self.infirmaries, '')
+        with self.assertNumQueries(1):
+            self.assertEqual(appointments.count(), 5)
+        with self.assertNumQueries(1):
+            page = appointments[1:3]
+        self.assertEqual([row['type'] for row in page], ['Funcionário', 'Visitante'])
+
+    def test_report_reads_the_unified_table(self):
+        queryset = get_report_queryset(self.date_begin, self.date_end, self.infirmaries, '')
+        self.assertNotIn('UNION', str(queryset.query))
+
+    def test_keyset_pages_walk_the_whole_report(self):
+        expected = get_all_appointments(self.date_begin, self.date_end, self.infirmaries, '')
+        seen = []
+        cursor = None
+        while True:
+            page = get_report_keyset_page(
+                self.date_begin, self.date_end, self.infirmaries, '', cursor=cursor, page_size=2,
+            )
+            seen.extend(page['results'])
+            self.assertIsNone(page['count'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual([(row['type'], row['id']) for row in seen], [(row['type'], row['id']) for row in expected])
+
+    def test_keyset_previous_page(self):
+        first = get_report_keyset_page(self.date_begin, self.date_end, self.infirmaries, '', page_size=2)
+        self.assertIsNone(first['previous_cursor'])
+        second = get_report_keyset_page(
+            self.date_begin, self.date_end, self.infirmaries, '', cursor=first['next_cursor'], page_size=2,
+        )
+        back = get_report_keyset_page(
+            self.date_begin, self.date_end, self.infirmaries, '',
+            cursor=second['previous_cursor'], direction='previous', page_size=2,
+        )
+        self.assertEqual([row['id'] for row in back['results']], [row['id'] for row in first['results']])
+        self.assertIsNone(back['previous_cursor'])
+        self.assertEqual(back['next_cursor'], first['next_cursor'])
+
+    def test_keyset_ties_on_date(self):
+        date = timezone.now() - timedelta(days=10)
+        for _ in range(3):
+            StudentAppointment.objects.create(
+                student=self.student, infirmary='Infantil', current_class='Math', date=date,
+                nurse='Nurse Joy', reason='Fever', treatment='Rest',
+            )
+        EmployeeAppointment.objects.create(
+            employee=self.employee, infirmary='Infantil', date=date, nurse='Nurse Joy', reason='Fever', treatment='Rest',
+        )
+        expected = get_all_appointments(self.date_begin, self.date_end, self.infirmaries, '')
+        seen = []
+        cursor = None
+        while True:
+            page = get_report_keyset_page(
+                self.date_begin, self.date_end, self.infirmaries, '', cursor=cursor, page_size=1,
+            )
+            seen.extend(page['results'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(len(seen), 9)
+        self.assertEqual([(row['type'], row['id']) for row in seen], [(row['type'], row['id']) for row in expected])
+
+    def test_keyset_count_on_demand(self):
+        with self.assertNumQueries(1):
+            get_report_keyset_page(self.date_begin, self.date_end, self.infirmaries, '')
+        page = get_report_keyset_page(self.date_begin, self.date_end, self.infirmaries, '', with_count=True)
+        self.assertEqual(page['count'], 5)
+
+    def test_keyset_invalid_cursor(self):
+        with self.assertRaises(ValueError):
+            get_report_keyset_page(self.date_begin, self.date_end, self.infirmaries, '', cursor='invalid')
+
+
+class TestAppointmentSearch(TestCase):
+
+    def setUp(self):
+        self.class_group = ClassGroup.objects.create(id='CG1', name='Turma Ômega', segment='Primary', director='Director 1')
+        self.student = Student.objects.create(
+            id='S1', name='João Araújo', age=15, gender='Male', registry='S123456', class_group=self.class_group,
+        )
+        self.other = Student.objects.create(id='S2', name='Maria Souza', age=14, gender='Female', registry='S654321')
+        now = timezone.now()
+        self.date_begin = now - timedelta(days=30)
+        self.date_end = now
+        self.appointment = StudentAppointment.objects.create(
+            student=self.student, infirmary='Infantil', nurse='Nurse Joy', current_class='Matemática',
+            date=now - timedelta(days=1), reason='Febres altas', treatment='Dipirona', notes='Ligar para a mãe',
+        )
+        StudentAppointment.objects.create(
+            student=self.other, infirmary='Infantil', nurse='Nurse Joy', current_class='História',
+            date=now - timedelta(days=2), reason='Dor de cabeça', treatment='Repouso',
+        )
+
+    def search(self, term):
+        return list(get_student_appointments(self.date_begin, self.date_end, ['Infantil'], term))
+
+    def test_search_is_accent_insensitive(self):
+        self.assertEqual([a.pk for a in self.search('joao araujo')], [self.appointment.pk])
+        self.assertEqual([a.pk for a in self.search('omega')], [self.appointment.pk])
+
+    def test_search_clinical_text_with_stemming_and_prefix(self):
+        self.assertEqual([a.pk for a in self.search('febre')], [self.appointment.pk])
+        self.assertEqual([a.pk for a in self.search('dipi')], [self.appointment.pk])
+        self.assertEqual(len(self.search('Joy')), 2)
+
+    def test_search_by_date(self):
+        term = timezone.localtime(self.appointment.date).strftime('%d/%m/%Y')
+        self.assertIn(self.appointment.pk, [a.pk for a in self.search(term)])
+
+    def test_search_is_ranked(self):
+        results = self.search('maria')
+        self.assertEqual(len(results), 1)
+        self.assertGreater(results[0].rank, 0)
+
+    def test_document_follows_patient_changes(self):
+        self.student.name = 'Pedro Lima'
+        self.student.save()
+        self.assertEqual(self.search('joao'), [])
+        self.assertEqual([a.pk for a in self.search('pedro')], [self.appointment.pk])
+
+        self.class_group.name = 'Turma Sigma'
+        self.class_group.save()
+        self.assertEqual([a.pk for a in self.search('sigma')], [self.appointment.pk])
+
+    def test_report_search_uses_document(self):
+        result = get_all_appointments(self.date_begin, self.date_end, ['Infantil'], 'cabeca')
+        self.assertEqual([row['name'] for row in result], ['Maria Souza'])
+        self.assertGreater(result[0]['rank'], 0)
+
+    def test_report_search_orders_by_relevance(self):
+        older = StudentAppointment.objects.create(
+            student=self.other, infirmary='Infantil', nurse='Nurse Joy', current_class='História',
+            date=timezone.now() - timedelta(days=5), reason='Febre', treatment='Febre', notes='Febre alta, febre',
+        )
+        for days in (6, 6, 7):
+            StudentAppointment.objects.create(
+                student=self.other, infirmary='Infantil', nurse='Nurse Joy', current_class='História',
+                date=timezone.now() - timedelta(days=days, hours=1), reason='Febre', treatment='Repouso',
+            )
+        expected = get_all_appointments(self.date_begin, self.date_end, ['Infantil'], 'febre')
+        self.assertEqual(expected[0]['id'], older.pk)
+        ranks = [row['rank'] for row in expected]
+        self.assertEqual(ranks, sorted(ranks, reverse=True))
+
+        seen = []
+        cursor = None
+        while True:
+            page = get_report_keyset_page(
+                self.date_begin, self.date_end, ['Infantil'], 'febre', cursor=cursor, page_size=1,
+            )
+            seen.extend(page['results'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual([row['id'] for row in seen], [row['id'] for row in expected])
+
+        back = get_report_keyset_page(
+            self.date_begin, self.date_end, ['Infantil'], 'febre', cursor=encode_report_cursor(seen[2], True),
+            direction='previous', page_size=2,
+        )
+        self.assertEqual([row['id'] for row in back['results']], [row['id'] for row in expected[:2]])
+        # A cursor of the unsearched report does not apply to the searched one
+        with self.assertRaises(ValueError):
+            get_report_keyset_page(self.date_begin, self.date_end, ['Infantil'], 'febre',
+                                   cursor=encode_report_cursor(seen[2]))
+
+
+class TestDashboardStats(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.student = Student.objects.create(id='S1', name='John Doe', age=15, gender='Male', registry='S1')
+        self.employee = Employee.objects.create(id='E1', name='Mary Smith', age=40, gender='Female', registry='E1')
+        self.visitor = Visitor.objects.create(
+            name='Paul Brown', age=35, gender='Male', email='paul@example.com', relationship='Parente',
+        )
+        self.now = timezone.make_aware(datetime(2026, 6, 15, 10, 0))
+        common = {'reason': 'Headache', 'treatment': 'Rest'}
+
+        def local(*args):
+            return timezone.make_aware(datetime(*args))
+
+        StudentAppointment.objects.create(student=self.student, infirmary='Infantil', nurse='Ana',
+                                          date=local(2026, 6, 15, 8, 0), current_class='1A', **common)
+        StudentAppointment.objects.create(student=self.student, infirmary='Infantil', nurse='Ana',
+                                          date=local(2026, 1, 1, 0, 0), current_class='1A', **common)
+        StudentAppointment.objects.create(student=self.student, infirmary='Infantil', nurse='Ana',
+                                          date=local(2025, 12, 31, 23, 59), current_class='1A', **common)
+        EmployeeAppointment.objects.create(employee=self.employee, infirmary='Fundamental', nurse='Bia',
+                                           date=local(2026, 6, 15, 23, 30), **common)
+        VisitorAppointment.objects.create(visitor=self.visitor, infirmary='infantil', nurse='Bia',
+                                          date=local(2026, 6, 14, 12, 0), **common)
+        VisitorAppointment.objects.create(visitor=self.visitor, infirmary='Fundamental', nurse='Carla',
+                                          date=local(2026, 6, 16, 0, 0), **common)
+
+    def test_dashboard_stats_in_one_query(self):
+        with self.assertNumQueries(1):
+            stats = get_dashboard_stats(' Infantil ', now=self.now)
+
+        self.assertIsInstance(stats, DashboardStats)
+        self.assertEqual(stats.total_year, 5)
+        self.assertEqual(stats.total_today, 2)
+        self.assertEqual(stats.infirmary_year, 3)
+        self.assertEqual(stats.infirmary_today, 1)
+        self.assertEqual(stats.infirmary_counts, {'Infantil': 2, 'infantil': 1, 'Fundamental': 2})
+        self.assertEqual(stats.nurse_appointments, [NurseCount('Ana', 2), NurseCount('Bia', 2), NurseCount('Carla', 1)])
+
+    def test_dashboard_stats_without_infirmary(self):
+        stats = get_dashboard_stats(None, now=self.now)
+        self.assertEqual((stats.infirmary_year, stats.infirmary_today), (0, 0))
+        self.assertEqual(stats.total_year, 5)
+
+    def test_dashboard_stats_cached_until_appointment_changes(self):
+        get_dashboard_stats('Infantil', now=self.now)
+        with self.assertNumQueries(0):
+            stats = get_dashboard_stats('infantil ', now=self.now)
+        self.assertEqual(stats.infirmary_today, 1)
+
+        appointment = VisitorAppointment.objects.create(
+            visitor=self.visitor, infirmary='Infantil', nurse='Ana', reason='Fever', treatment='Rest',
+            date=timezone.make_aware(datetime(2026, 6, 15, 9, 0)),
+        )
+        self.assertEqual(get_dashboard_stats('Infantil', now=self.now).infirmary_today, 2)
+
+        appointment.delete()
+        self.assertEqual(get_dashboard_stats('Infantil', now=self.now).infirmary_today, 1)
+
+    def test_other_years_keep_their_cache(self):
+        get_dashboard_stats('Infantil', now=self.now)
+        VisitorAppointment.objects.create(
+            visitor=self.visitor, infirmary='Infantil', nurse='Ana', reason='Fever', treatment='Rest',
+            date=timezone.make_aware(datetime(2025, 6, 15, 9, 0)),
+        )
+        with self.assertNumQueries(0):
+            get_dashboard_stats('Infantil', now=self.now)
+
+    def test_infirmary_totals_of_the_year_cached(self):
+        # The appointment of 2025-12-31 is not counted
+        self.assertEqual(get_infirmary_totals(now=self.now), {'Infantil': 2, 'infantil': 1, 'Fundamental': 2})
+        self.assertEqual(get_infirmary_totals(now=self.now.replace(year=2025)), {'Infantil': 1})
+        with self.assertNumQueries(0):
+            get_infirmary_totals(now=self.now)
+        StudentAppointment.objects.filter(infirmary='Infantil').delete()
+        rebuild_daily_stats()
+        self.assertEqual(get_infirmary_totals(now=self.now), {'infantil': 1, 'Fundamental': 2})
+
+    def test_invalidation_reaches_other_processes(self):
+        get_infirmary_totals(now=self.now)
+        subprocess.run(
+            [sys.executable, '-c', 'import django; django.setup(); '
+             'from controller.crud import invalidate_dashboard_cache; invalidate_dashboard_cache([2026])'],
+            cwd=settings.BASE_DIR, env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'setup.settings'}, check=True,
+        )
+        with self.assertNumQueries(1):
+            get_infirmary_totals(now=self.now)
+
+
+class TestDailyAppointmentStats(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.student = Student.objects.create(id='S1', name='John Doe', age=15, gender='Male', registry='S1')
+        self.visitor = Visitor.objects.create(
+            name='Paul Brown', age=35, gender='Male', email='paul@example.com', relationship='Parente',
+        )
+        self.date = timezone.make_aware(datetime(2026, 3, 10, 23, 30))
+        self.common = {'reason': 'Headache', 'treatment': 'Rest', 'date': self.date}
+
+    def stats(self):
+        return sorted(DailyAppointmentStats.objects.filter(count__gt=0).values_list(
+            'day', 'infirmary', 'nurse', 'patient_type', 'count'))
+
+    def test_stats_follow_appointment_changes(self):
+        day = self.date.date()
+        first = StudentAppointment.objects.create(student=self.student, infirmary='Infantil', nurse='Ana',
+                                                  current_class='1A', **self.common)
+        StudentAppointment.objects.create(student=self.student, infirmary='Infantil', nurse='Ana',
+                                          current_class='1A', **self.common)
+        VisitorAppointment.objects.create(visitor=self.visitor, infirmary='Infantil', nurse='Ana', **self.common)
+        self.assertEqual(self.stats(), [
+            (day, 'Infantil', 'Ana', 'student', 2),
+            (day, 'Infantil', 'Ana', 'visitor', 1),
+        ])
+
+        first.nurse = 'Bia'
+        first.save()
+        self.assertEqual(self.stats(), [
+            (day, 'Infantil', 'Ana', 'student', 1),
+            (day, 'Infantil', 'Ana', 'visitor', 1),
+            (day, 'Infantil', 'Bia', 'student', 1),
+        ])
+
+        first.delete()
+        self.assertEqual(self.stats(), [
+            (day, 'Infantil', 'Ana', 'student', 1),
+            (day, 'Infantil', 'Ana', 'visitor', 1),
+        ])
+
+    def test_rebuild_matches_incremental_stats(self):
+        StudentAppointment.objects.create(student=self.student, infirmary='Infantil', nurse='Ana',
+                                          current_class='1A', **self.common)
+        VisitorAppointment.objects.create(visitor=self.visitor, infirmary='Fundamental', nurse='Bia', **self.common)
+        VisitorAppointment.objects.create(visitor=self.visitor, infirmary='Fundamental', nurse='Bia',
+                                          reason='Fever', treatment='Rest', date=self.date - timedelta(days=40))
+        incremental = self.stats()
+
+        DailyAppointmentStats.objects.all().delete()
+        self.assertEqual(rebuild_daily_stats(), 3)
+        self.assertEqual(self.stats(), incremental)
+
+        DailyAppointmentStats.objects.filter(day=self.date.date()).delete()
+        self.assertEqual(rebuild_daily_stats(since=self.date.date()), 2)
+        self.assertEqual(self.stats(), incremental)
+        self.assertEqual(get_infirmary_totals(now=self.date), {'Infantil': 1, 'Fundamental': 2})
+
+
+class TestRecordAppointment(TestCase):
+
+    def setUp(self):
+        self.student = Student.objects.create(id='S1', name='John Doe', age=15, gender='Male', registry='S1')
+        self.appointment = {
+            'infirmary': 'Infantil', 'nurse': 'Ana', 'current_class': '1A', 'date': timezone.now(),
+            'reason': 'Headache', 'treatment': 'Rest', 'notes': None, 'revaluation': False, 'contact_parents': False,
+        }
+        self.visitor = {'name': 'Paul Brown', 'age': 35, 'gender': 'Male', 'email': 'paul@example.com',
+                        'relationship': 'Parente'}
+
+    def test_records_appointment_and_info(self):
+        appointment = record_appointment('student', 'S1', self.appointment, 'Peanuts', 'Asthma')
+        self.assertEqual(appointment.patient_type, 'student')
+        self.assertEqual(StudentAppointment.objects.get().pk, appointment.pk)
+        info = StudentInfo.objects.get(student=self.student)
+        self.assertEqual((info.allergies, info.patient_notes), ('Peanuts', 'Asthma'))
+
+    def test_info_upsert_only_writes_changes(self):
+        self.assertTrue(upsert_patient_info(StudentInfo, 'student', 'S1', 'Peanuts', None))
+        self.assertFalse(upsert_patient_info(StudentInfo, 'student', 'S1', 'Peanuts', None))
+        self.assertTrue(upsert_patient_info(StudentInfo, 'student', 'S1', 'Peanuts', 'Asthma'))
+        self.assertEqual(StudentInfo.objects.filter(student=self.student).count(), 1)
+        self.assertEqual(StudentInfo.objects.get().patient_notes, 'Asthma')
+
+    def test_statement_count(self):
+        record_appointment('student', 'S1', self.appointment, 'Peanuts', None)
+        # Savepoint, info upsert, appointment insert, stats update, release
+        with self.assertNumQueries(5):
+            record_appointment('student', 'S1', self.appointment, 'Peanuts', 'Asthma')
+
+    def test_failed_appointment_rolls_back_info(self):
+        upsert_patient_info(StudentInfo, 'student', 'S1', 'Peanuts', None)
+        with self.assertRaises(IntegrityError):
+            record_appointment('student', 'S1', {**self.appointment, 'nurse': None}, 'Latex', None)
+        self.assertEqual(StudentInfo.objects.get().allergies, 'Peanuts')
+        self.assertFalse(StudentAppointment.objects.exists())
+
+    def test_visitor_is_created_once(self):
+        first = record_appointment('visitor', self.visitor, self.appointment, None, None)
+        second = record_appointment('visitor', {**self.visitor, 'name': 'Other'}, self.appointment, 'Dust', None)
+        self.assertEqual(first.visitor_id, second.visitor_id)
+        visitor = Visitor.objects.get()
+        self.assertEqual((visitor.name, visitor.allergies), ('Paul Brown', 'Dust'))
+        self.assertEqual(record_appointment('visitor', self.visitor, self.appointment, 'Dust', None).visitor_id,
+                         visitor.id)
+        self.assertEqual(VisitorAppointment.objects.count(), 3)
+
+    def test_unknown_patient_type(self):
+        with self.assertRaises(ValueError):
+            record_appointment('teacher', 'T1', self.appointment)
+
+    def test_record_views(self):
+        response = self.client.post('/appointments/student/record/', json.dumps({
+            'student_id': 'S1', 'allergies': 'Peanuts', 'patient_notes': '', 'infirmary': 'Infantil',
+            'nurse': 'Ana', 'current_class': '1A', 'reason': 'Headache', 'treatment': 'Rest', 'notes': '',
+            'revaluation': False, 'contact_parents': True,
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['data'][0]['student'], 'S1')
+
+        response = self.client.post('/appointments/visitor/record/', json.dumps({
+            'visitor_name': 'Paul Brown', 'visitor_age': 35, 'visitor_email': 'paul@example.com',
+            'visitor_gender': 'Male', 'visitor_relationship': 'Parente', 'allergies': '', 'patient_notes': '',
+            'infirmary': 'Infantil', 'nurse': 'Ana', 'reason': 'Fever', 'treatment': 'Rest', 'notes': '',
+            'revaluation': False,
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(VisitorAppointment.objects.get().visitor.email, 'paul@example.com')
+
+        response = self.client.post('/appointments/student/record/', json.dumps({'student_id': 'S9'}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(StudentInfo.objects.filter(student_id='S9').exists())
+
+
+class TestAppointmentBatch(TestCase):
+
+    def setUp(self):
+        Student.objects.create(id='S1', name='John Doe', age=15, gender='Male', registry='S1')
+        Employee.objects.create(id='E1', name='Ana Lima', age=30, gender='Female', registry='E1')
+        self.common = {'infirmary': 'Infantil', 'nurse': 'Ana', 'reason': 'Headache', 'treatment': 'Rest',
+                       'date': '2026-03-10T09:30:00'}
+
+    def item(self, patient_type, **fields):
+        return {'key': str(uuid.uuid4()), 'patient_type': patient_type, **self.common, **fields}
+
+    def test_records_batch_once(self):
+        items = [
+            self.item('student', student_id='S1', current_class='1A', allergies='Peanuts', patient_notes=''),
+            self.item('employee', employee_id='E1'),
+            self.item('visitor', visitor_name='Paul Brown', visitor_age=35, visitor_email='paul@example.com',
+                      visitor_gender='Male', visitor_relationship='Parente'),
+            self.item('student', student_id='S9'),
+            self.item('student', student_id='S1', nurse=''),
+        ]
+        items.append({**items[0]})
+        results = record_appointments_batch(items)
+        self.assertEqual([result['status'] for result in results],
+                         ['created', 'created', 'created', 'error', 'error', 'duplicate'])
+        self.assertEqual(results[5]['id'], results[0]['id'])
+        self.assertEqual(results[3]['message'], 'Paciente não encontrado')
+        self.assertEqual(Appointment.objects.count(), 3)
+        self.assertEqual(StudentInfo.objects.get().allergies, 'Peanuts')
+        self.assertEqual(timezone.localtime(Appointment.objects.get(pk=results[0]['id']).date),
+                         timezone.make_aware(datetime(2026, 3, 10, 9, 30)))
+        self.assertEqual(
+            sorted(DailyAppointmentStats.objects.values_list('patient_type', 'count')),
+            [('employee', 1), ('student', 1), ('visitor', 1)],
+        )
+
+        # Resending the batch creates nothing
+        again = record_appointments_batch(items)
+        self.assertEqual([result['status'] for result in again[:3]], ['duplicate'] * 3)
+        self.assertEqual([result['id'] for result in again[:3]], [result['id'] for result in results[:3]])
+        self.assertEqual(Appointment.objects.count(), 3)
+        self.assertEqual(DailyAppointmentStats.objects.get(patient_type='student').count, 1)
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        items = [self.item('student', student_id='S1', current_class='1A') for _ in range(20)]
+        # Savepoint, keys, patients, appointments, keys insert, the stats row (update, then savepoint,
+        # insert and release for a new day), release
+        with self.assertNumQueries(10):
+            results = record_appointments_batch(items)
+        self.assertEqual({result['status'] for result in results}, {'created'})
+        self.assertEqual(DailyAppointmentStats.objects.get().count, 20)
+
+    def test_invalid_items_are_reported_alone(self):
+        long_nurse = 'N' * 51
+        items = [
+            self.item('visitor', visitor_name='Paul Brown', visitor_age='abc', visitor_email='paul@example.com',
+                      visitor_gender='Male', visitor_relationship='Parente'),
+            self.item('student', student_id='S1', nurse=long_nurse),
+            self.item('visitor', visitor_name='Paul Brown', visitor_age=35, visitor_email='not-an-email',
+                      visitor_gender='Male', visitor_relationship='Parente'),
+            self.item('employee', employee_id='E1', reason='Dor\x00'),
+            self.item('student', student_id='S1'),
+        ]
+        results = record_appointments_batch(items)
+        self.assertEqual([result['status'] for result in results], ['error'] * 4 + ['created'])
+        self.assertIn('(age)', results[0]['message'])
+        self.assertIn('nurse', results[1]['message'])
+        self.assertIn('email', results[2]['message'])
+        self.assertEqual(Appointment.objects.count(), 1)
+
+    def test_numeric_patient_id(self):
+        Student.objects.create(id='123', name='Mary Doe', age=12, gender='Female', registry='123')
+        results = record_appointments_batch([self.item('student', student_id=123)])
+        self.assertEqual(results[0]['status'], 'created')
+        self.assertEqual(Appointment.objects.get().student_id, '123')
+
+    def test_batch_view(self):
+        items = [self.item('student', student_id='S1'), self.item('employee', employee_id='E1')]
+        response = self.client.post('/appointments/batch/', json.dumps(items), content_type='application/json')
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Appointment.objects.exists())
+
+        self.client.force_login(User.objects.create_user(username='nurse', password='secret'))
+        response = self.client.post('/appointments/batch/', json.dumps(items), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response.json()['results']], ['created', 'created'])
+
+        response = self.client.post('/appointments/batch/', json.dumps({'items': items}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/appointments/batch/', json.dumps(items * (BATCH_APPOINTMENT_LIMIT // 2 + 1)),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get('/appointments/batch/').status_code, 405)
@@ -0,0 +1,104 @@
+import asyncio
+from datetime import datetime
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from patients.models import Visitor
+from appointments.models import VisitorAppointment
+from controller.events import EventBroker, RESYNC, QUEUE_SIZE, format_event, stream_events, broker
+
+
+class TestEventStream(SimpleTestCase):
+
+    def test_format_event(self):
+        self.assertEqual(
+            format_event('appointment', {'infirmary': 'Ensino Médio', 'delta': 1}),
+            'event: appointment\ndata: {"infirmary": "Ensino Médio", "delta": 1}\n\n',
+        )
+
+    def test_stream_sends_events_keepalives_and_resync(self):
+        async def read():
+            queue = asyncio.Queue()
+            stream = stream_events(queue, keepalive=0.01)
+            messages = [await anext(stream), await anext(stream)]
+            queue.put_nowait({'delta': 1})
+            queue.put_nowait(RESYNC)
+            messages += [await anext(stream), await anext(stream)]
+            await stream.aclose()
+            return messages
+
+        self.assertEqual(asyncio.run(read()), [
+            'retry: 5000\n\n',
+            ': keepalive\n\n',
+            'event: appointment\ndata: {"delta": 1}\n\n',
+            'event: resync\ndata: {}\n\n',
+        ])
+
+    def test_full_queue_asks_for_resync(self):
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        for i in range(QUEUE_SIZE + 1):
+            EventBroker._put(queue, {'delta': i})
+        self.assertEqual(queue.qsize(), 1)
+        self.assertIs(queue.get_nowait(), RESYNC)
+
+
+@override_settings(DASHBOARD_LIVE_UPDATES=True)
+class TestEventBroker(TransactionTestCase):
+
+    def setUp(self):
+        self.visitor = Visitor.objects.create(
+            name='Paul Brown', age=35, gender='Male', email='paul@example.com', relationship='Parente',
+        )
+        self.broker = EventBroker(poll_seconds=0.1)
+        self.addCleanup(self.broker.stop)
+
+    async def test_committed_appointment_reaches_subscribers(self):
+        def create():
+            return VisitorAppointment.objects.create(
+                visitor=self.visitor, infirmary='Infantil', nurse='Ana', reason='Fever', treatment='Rest',
+                date=timezone.make_aware(datetime(2026, 6, 15, 9, 0)),
+            )
+
+        first, second = self.broker.subscribe(), self.broker.subscribe()
+        # Wait for the LISTEN before publishing
+        await asyncio.sleep(0.5)
+        appointment = await sync_to_async(create)()
+        events = [await asyncio.wait_for(queue.get(), 5) for queue in (first, second)]
+        await sync_to_async(appointment.delete)()
+        events.append(await asyncio.wait_for(first.get(), 5))
+
+        expected = {'day': '2026-06-15', 'infirmary': 'Infantil', 'nurse': 'Ana', 'patient_type': 'visitor'}
+        self.assertEqual(events, [
+            {**expected, 'delta': 1}, {**expected, 'delta': 1}, {**expected, 'delta': -1},
+        ])
+
+
+class TestDashboardEventsView(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='nurse', password='secret')
+
+    def test_disabled_by_default(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/dashboard/events/').status_code, 404)
+
+    @override_settings(DASHBOARD_LIVE_UPDATES=True)
+    def test_requires_login(self):
+        self.assertEqual(self.client.get('/dashboard/events/').status_code, 401)
+
+    @override_settings(DASHBOARD_LIVE_UPDATES=True)
+    async def test_streams_events(self):
+        queue = asyncio.Queue()
+        queue.put_nowait({'delta': 1})
+        with mock.patch.object(broker, 'subscribe', return_value=queue), \
+                mock.patch.object(broker, 'unsubscribe'):
+            await self.async_client.aforce_login(self.user)
+            response = await self.async_client.get('/dashboard/events/')
+            stream = aiter(response.streaming_content)
+            messages = [await anext(stream), await anext(stream)]
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(messages[0], b'retry: 5000\n\n')
+        self.assertEqual(messages[1], b'event: appointment\ndata: {"delta": 1}\n\n')
@@ -0,0 +1,207 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from io import StringIO
+from unittest import mock
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from prometheus_client import REGISTRY
+from patients.models import *
+from controller.management.commands.import_data import Command
+from controller.import_script.streaming import JSONStreamError, iter_json_array, iter_in_background
+
+
+def student_item(i, **kwargs):
+    item = {
+        'ID': f'S{i}',
+        'NAME': f'Aluno {i}',
+        'AGE': 10,
+        'GENDER': 'Female',
+        'REGISTRY': f'R{i}',
+        'CLASS_GROUP': 'CG1',
+    }
+    item.update(kwargs)
+    return item
+
+
+class TestImportData(TestCase):
+
+    def setUp(self):
+        self.stdout = StringIO()
+        self.stderr = StringIO()
+        self.command = Command(stdout=self.stdout, stderr=self.stderr)
+        self.command.batch_size = 20
+        ClassGroup.objects.create(id='CG1', name='Class 1', segment='Primary', director='Director 1')
+
+    def test_import_students_creates_students_and_info_in_batches(self):
+        data = [student_item(i) for i in range(50)]
+        with CaptureQueriesContext(connection) as queries:
+            self.command.import_students(data)
+
+        # 2 prefetches, 3 chunks (each inside a savepoint), 1 info prefetch and 1 info insert
+        self.assertLessEqual(len(queries), 15)
+        self.assertEqual(Student.objects.count(), 50)
+        self.assertEqual(StudentInfo.objects.count(), 50)
+        self.assertEqual(Student.objects.get(id='S7').class_group_id, 'CG1')
+        self.assertIn('Alunos: 50 criados, 0 atualizados, 0 inalterados, 0 com erro, 0 ignorados.', self.stdout.getvalue())
+
+    def test_import_students_updates_existing_rows(self):
+        Student.objects.create(id='S1', name='Nome Antigo', age=9, gender='Male', registry='R1')
+        StudentInfo.objects.create(student_id='S1', allergies='Amendoim')
+
+        self.command.import_students([student_item(1, NAME='Nome Novo', CLASS_GROUP='CG404'), student_item(2)])
+
+        student = Student.objects.get(id='S1')
+        self.assertEqual(student.name, 'Nome Novo')
+        self.assertIsNone(student.class_group_id)
+        self.assertEqual(StudentInfo.objects.get(student_id='S1').allergies, 'Amendoim')
+        self.assertEqual(StudentInfo.objects.count(), 2)
+        self.assertIn('Alunos: 1 criados, 1 atualizados', self.stdout.getvalue())
+        self.assertIn('Turma não encontrada para o aluno Nome Novo', self.stderr.getvalue())
+
+    def test_import_students_only_writes_changed_rows(self):
+        data = [student_item(i) for i in range(10)]
+        self.command.import_students(data)
+        updated_at = dict(Student.objects.values_list('id', 'updated_at'))
+
+        data[3]['NAME'] = 'Aluno Renomeado'
+        with CaptureQueriesContext(connection) as queries:
+            counts = self.command.import_students(data)
+
+        self.assertEqual((counts['created'], counts['updated'], counts['unchanged']), (0, 1, 9))
+        self.assertEqual(sum('INSERT INTO "patients_student"' in query['sql'] for query in queries), 1)
+        self.assertEqual(Student.objects.get(id='S3').name, 'Aluno Renomeado')
+        self.assertNotEqual(Student.objects.get(id='S3').updated_at, updated_at['S3'])
+        self.assertEqual(Student.objects.get(id='S4').updated_at, updated_at['S4'])
+
+        counts = self.command.import_students(data)
+        self.assertEqual(counts['unchanged'], 10)
+
+    def test_import_students_skips_invalid_rows(self):
+        Student.objects.create(id='S1', name='Aluno 1', age=9, gender='Male', registry='R1')
+        data = [
+            student_item(2, NAME=None),
+            student_item(3, REGISTRY=None),
+            student_item(4, REGISTRY='R1'),
+            student_item(5, AGE='idade'),
+            student_item(6),
+        ]
+        self.command.import_students(data)
+
+        self.assertEqual(set(Student.objects.values_list('id', flat=True)), {'S1', 'S6'})
+        self.assertIn('1 criados, 0 atualizados, 0 inalterados, 1 com erro, 3 ignorados.', self.stdout.getvalue())
+        self.assertIn('Erro ao atualizar/criar Aluno com id S5', self.stderr.getvalue())
+
+    def test_import_employees_and_departments(self):
+        self.command.import_departments([{'ID': 'D1', 'NAME': 'HR'}, {'ID': 'D2', 'NAME': None}])
+        self.command.import_employees([
+            {'ID': 'E1', 'NAME': 'Ana', 'AGE': 30, 'GENDER': 'Female', 'REGISTRY': 'E1', 'DEPARTMENT': 'D1'},
+            {'ID': 'E1', 'NAME': 'Ana Lima', 'AGE': 30, 'GENDER': 'Female', 'REGISTRY': 'E1', 'DEPARTMENT': 'D1'},
+        ])
+
+        self.assertEqual(Department.objects.get(id='D1').director, 'Diretor Desconhecido')
+        employee = Employee.objects.get(id='E1')
+        self.assertEqual(employee.name, 'Ana Lima')
+        self.assertEqual(employee.position, 'Posição Desconhecida')
+        self.assertEqual(EmployeeInfo.objects.filter(employee=employee).count(), 1)
+
+
+class TestStreaming(SimpleTestCase):
+
+    def test_iter_json_array_across_chunk_boundaries(self):
+        data = [student_item(i, NAME=f'João "{i}" [x]') for i in range(20)] + [12345, 'texto', [], None]
+        document = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        for size in (1, 7, 64, len(document)):
+            chunks = [document[i:i + size] for i in range(0, len(document), size)]
+            self.assertEqual(list(iter_json_array(chunks)), data)
+
+    def test_iter_json_array_rejects_invalid_documents(self):
+        for document in (b'{"ID": 1}', b'[{"ID": 1}', b'[1 2]', b'[1] 2', b'["\xff"]'):
+            with self.assertRaises(JSONStreamError):
+                list(iter_json_array([document]))
+
+    def test_iter_in_background_keeps_order_and_raises_errors(self):
+        self.assertEqual(list(iter_in_background(range(100), 3)), list(range(100)))
+
+        def failing():
+            yield 1
+            raise ValueError('falha')
+
+        items = iter_in_background(failing(), 3)
+        self.assertEqual(next(items), 1)
+        with self.assertRaises(ValueError):
+            next(items)
+
+
+class TestImportDataWithoutApiUrl(SimpleTestCase):
+
+    def test_command_module_imports_without_api_url(self):
+        # In a fresh interpreter, since this one has already imported the API client
+        env = {name: value for name, value in os.environ.items() if name != 'API_URL'}
+        env.update(DJANGO_SETTINGS_MODULE='setup.settings', SECRET_KEY=os.environ.get('SECRET_KEY', 'x'))
+        script = 'import django; django.setup(); import controller.management.commands.import_data'
+        result = subprocess.run([sys.executable, '-c', script], env=env, cwd=settings.BASE_DIR,
+                                capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+
+class TestImportDataFromFile(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        ClassGroup.objects.create(id='CG1', name='Class 1', segment='Primary', director='Director 1')
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def test_import_students_from_file_in_batches(self):
+        path = self.write('students.json', json.dumps([student_item(i) for i in range(25)]))
+        stdout = StringIO()
+        call_command('import_data', '--from-file', path, '--batch-size', '7', stdout=stdout)
+
+        self.assertEqual(Student.objects.count(), 25)
+        self.assertEqual(StudentInfo.objects.count(), 25)
+        self.assertIn('Alunos: 25 criados', stdout.getvalue())
+
+    def test_import_file_with_entity_option(self):
+        path = self.write('turmas.json', json.dumps([{'ID': 'CG2', 'NAME': 'Class 2'}]))
+        call_command('import_data', '--from-file', path, '--entity', 'class_groups', stdout=StringIO())
+        self.assertEqual(ClassGroup.objects.get(id='CG2').segment, 'Segmento Desconhecido')
+
+        with self.assertRaises(CommandError):
+            call_command('import_data', '--from-file', path, stdout=StringIO())
+
+    def test_truncated_file_keeps_written_batches(self):
+        document = json.dumps([student_item(i) for i in range(10)])
+        path = self.write('students.json', document[:-40])
+        failures = REGISTRY.get_sample_value('enfermaria_import_failures_total', {'entity': 'student'}) or 0
+        with self.assertRaisesMessage(CommandError, 'Erro ao ler students.json'):
+            call_command('import_data', '--from-file', path, '--batch-size', '4', stdout=StringIO())
+
+        self.assertEqual(Student.objects.count(), 8)
+        self.assertEqual(REGISTRY.get_sample_value('enfermaria_import_failures_total', {'entity': 'student'}),
+                         failures + 1)
+
+    def test_errors_of_the_import_code_are_not_hidden(self):
+        path = self.write('students.json', json.dumps([student_item(1)]))
+        with mock.patch.object(Command, 'import_students', side_effect=ValueError('bug')):
+            with self.assertRaisesMessage(ValueError, 'bug'):
+                call_command('import_data', '--from-file', path, stdout=StringIO())
+
+    def test_file_import_does_not_need_api_url(self):
+        path = self.write('students.json', json.dumps([student_item(1)]))
+        with mock.patch('controller.import_script.api_totvs.base_url', None):
+            call_command('import_data', '--from-file', path, stdout=StringIO())
+            with self.assertRaisesMessage(CommandError, 'API_URL'):
+                call_command('import_data', stdout=StringIO())
+        self.assertEqual(Student.objects.count(), 1)
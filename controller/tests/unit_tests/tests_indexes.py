@@ -0,0 +1,142 @@
+import io
+from datetime import date, datetime, timedelta
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from patients.models import Student
+from appointments.models import StudentAppointment
+from appointments.partitions import create_year_partition, list_partitions
+from controller.crud import get_appointment, get_student_appointments, local_day_range
+
+
+'''
+    EXPLAIN-based checks that the hot appointment queries can use the indexes of
+    appointments/migrations/0004_appointment_indexes.py (carried over to the unified table by
+    0006_unified_appointment) and only scan the yearly partitions of
+    appointments/migrations/0005_yearly_partitions.py they need, on a seeded history.
+    Indexes of a partition are named after it, e.g. appointments_appointment_y2023_infirmary_date_idx.
+'''
+
+TABLE = 'appointments_appointment'
+
+INFIRMARIES = ['Infantil', 'Fundamental', 'Ensino Médio', 'Atendimento Externo']
+NURSES = ['Ana', 'Bia', 'Carla', 'Dora', 'Eva']
+
+
+class TestAppointmentIndexes(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = Student.objects.create(id='S1', name='John Doe', age=15, gender='Male', registry='S1')
+        cls.other = Student.objects.create(id='S2', name='Mary Doe', age=12, gender='Female', registry='S2')
+        start = timezone.make_aware(datetime(2022, 1, 1, 7, 0))
+        # Three years of history, inserted in date order like the real table
+        StudentAppointment.objects.bulk_create([
+            StudentAppointment(
+                student=cls.student, infirmary=INFIRMARIES[i % 4], nurse=NURSES[i % 5], current_class='1A',
+                date=start + timedelta(hours=2 * i), reason='Headache', treatment='Rest',
+            )
+            for i in range(15000)
+        ], batch_size=5000)
+        StudentAppointment.objects.create(
+            student=cls.other, infirmary='Infantil', nurse='Ana', current_class='1A',
+            date=timezone.make_aware(datetime(2023, 5, 10, 9, 0)), reason='Fever', treatment='Rest',
+        )
+        with connection.cursor() as cursor:
+            # The history went to the default partition; give each year its own
+            for year in (2022, 2023, 2024, 2025):
+                create_year_partition(cursor, TABLE, year)
+            cursor.execute(f'ANALYZE {TABLE}')
+
+    def test_report_range_uses_infirmary_date_index(self):
+        queryset = get_student_appointments(
+            timezone.make_aware(datetime(2023, 3, 1)), timezone.make_aware(datetime(2023, 3, 8)), ['Infantil'], '',
+        ).order_by('-date')
+        plan = queryset.explain()
+        self.assertIn('y2023_infirmary_date_idx', plan)
+        self.assertNotIn('Seq Scan on appointments_appointment', plan)
+
+    def test_day_lookup_is_sargable(self):
+        queryset = StudentAppointment.objects.filter(local_day_range(date(2023, 5, 10)))
+        self.assertNotIn('AT TIME ZONE', str(queryset.query))
+        self.assertNotIn('Seq Scan on appointments_appointment', queryset.explain())
+        self.assertEqual(queryset.count(), 13)
+
+    def test_date_range_uses_brin_index(self):
+        queryset = StudentAppointment.objects.filter(
+            date__gte=timezone.make_aware(datetime(2023, 1, 1)), date__lt=timezone.make_aware(datetime(2023, 2, 1)),
+        )
+        with connection.cursor() as cursor:
+            # Only the BRIN index covers a date-only range; on a pruned yearly partition a seq scan
+            # is cheaper, so make the planner show it can use the index
+            cursor.execute('SET LOCAL enable_indexscan = off')
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = queryset.explain()
+        self.assertIn('y2023_date_idx', plan)
+        self.assertIn('Bitmap Index Scan', plan)
+
+    def test_nurse_lookup_uses_nurse_index(self):
+        plan = StudentAppointment.objects.filter(nurse='Zoe').explain()
+        self.assertIn('y2023_nurse_idx', plan)
+        self.assertNotIn('Seq Scan on appointments_appointment_y2023', plan)
+
+    def test_get_appointment_by_day(self):
+        rows = get_appointment(StudentAppointment, 'student_id', patient_id='S2', appointment_date=date(2023, 5, 10))
+        self.assertEqual([row['reason'] for row in rows], ['Fever'])
+
+    def test_year_range_prunes_other_partitions(self):
+        plan = StudentAppointment.objects.filter(
+            date__gte=timezone.make_aware(datetime(2023, 1, 1)), date__lt=timezone.make_aware(datetime(2024, 1, 1)),
+        ).explain()
+        self.assertIn('appointments_appointment_y2023', plan)
+        self.assertNotIn('_y2022', plan)
+        self.assertNotIn('_y2024', plan)
+        self.assertNotIn('_y2025', plan)
+        self.assertNotIn('_default', plan)
+
+    def test_history_moved_out_of_default_partition(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM appointments_appointment_default')
+            self.assertEqual(cursor.fetchone()[0], 0)
+            cursor.execute('SELECT count(*) FROM appointments_appointment_y2023')
+            self.assertEqual(cursor.fetchone()[0], 4381)
+        self.assertEqual(StudentAppointment.objects.count(), 15001)
+
+
+class TestManagePartitionsCommand(TestCase):
+
+    def setUp(self):
+        student = Student.objects.create(id='S1', name='John Doe', age=15, gender='Male', registry='S1')
+        self.appointment = StudentAppointment.objects.create(
+            student=student, infirmary='Infantil', nurse='Ana', current_class='1A',
+            date=timezone.make_aware(datetime(2020, 6, 1, 9, 0)), reason='Fever', treatment='Rest',
+        )
+
+    def partitions(self):
+        with connection.cursor() as cursor:
+            return [name for name, _ in list_partitions(cursor, TABLE)]
+
+    def test_creates_next_years(self):
+        year = timezone.localdate().year
+        out = io.StringIO()
+        call_command('manage_partitions', ahead=3, stdout=out)
+        self.assertIn(f'Partição criada: {TABLE}_y{year + 3}', out.getvalue())
+        self.assertIn(f'{TABLE}_y{year + 2}', self.partitions())
+        # Running again is a no-op
+        out = io.StringIO()
+        call_command('manage_partitions', ahead=3, stdout=out)
+        self.assertNotIn('Partição criada', out.getvalue())
+
+    def test_archive_and_restore(self):
+        with connection.cursor() as cursor:
+            create_year_partition(cursor, TABLE, 2020)
+        call_command('manage_partitions', archive_before=2021, stdout=io.StringIO())
+        self.assertNotIn(f'{TABLE}_y2020', self.partitions())
+        self.assertFalse(StudentAppointment.objects.exists())
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM archive.{TABLE}_y2020')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+        call_command('manage_partitions', restore=2020, stdout=io.StringIO())
+        self.assertEqual(list(StudentAppointment.objects.values_list('id', flat=True)), [self.appointment.id])
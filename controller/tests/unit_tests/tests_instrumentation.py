@@ -0,0 +1,65 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from controller.instrumentation import request_measured
+
+
+def parse_server_timing(header):
+    metrics = {}
+    for entry in header.split(', '):
+        name, *params = entry.split(';')
+        metrics[name] = dict(param.split('=', 1) for param in params)
+    return metrics
+
+
+class TestRequestTimingMiddleware(TestCase):
+
+    def setUp(self):
+        # The chart data would come from the dashboard cache
+        cache.clear()
+        self.client.force_login(User.objects.create_user(username='nurse', password='secret'))
+        self.measured = []
+
+        def receiver(sender, metrics, **kwargs):
+            self.measured.append(metrics)
+
+        request_measured.connect(receiver)
+        self.addCleanup(request_measured.disconnect, receiver)
+
+    def test_server_timing_header(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/get_chart_data/')
+        timing = parse_server_timing(response['Server-Timing'])
+        self.assertEqual(timing['total']['desc'], '"chart_data"')
+        self.assertTrue(queries)
+        self.assertEqual(timing['db']['desc'], f'"{len(queries)} queries"')
+        self.assertGreater(float(timing['total']['dur']), float(timing['db']['dur']))
+        self.assertEqual(float(timing['tpl']['dur']), 0)
+
+        metrics = self.measured[-1]
+        self.assertEqual((metrics.url_name, metrics.status_code, metrics.queries),
+                         ('chart_data', 200, len(queries)))
+        self.assertEqual(metrics.sql, [])
+
+    def test_template_time(self):
+        response = self.client.get('/reports/search_reports/')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(float(parse_server_timing(response['Server-Timing'])['tpl']['dur']), 0)
+        self.assertEqual(self.measured[-1].url_name, 'search_reports')
+
+    def test_unresolved_url(self):
+        response = self.client.get('/does-not-exist/')
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('desc="unresolved"', response['Server-Timing'])
+
+    @override_settings(SLOW_REQUEST_MS=0)
+    def test_slow_request_log(self):
+        with self.assertLogs('controller.instrumentation', 'WARNING') as logs:
+            self.client.get('/get_chart_data/')
+        self.assertEqual(len(logs.records), 1)
+        message = logs.records[0].getMessage()
+        self.assertRegex(message, r'^Requisição lenta: GET /get_chart_data/ \(chart_data\) 200 em [\d.]+ ms')
+        self.assertIn('FROM "appointments_dailyappointmentstats"', message)
+        self.assertTrue(self.measured[-1].sql)
@@ -0,0 +1,150 @@
+import logging
+import os
+import queue
+import shutil
+import tempfile
+import time
+from unittest import mock, skipUnless
+from django.test import SimpleTestCase
+from setup.log_handlers import (
+    AsyncRotatingFileHandler, SizedTimedRotatingFileHandler, dropped_records, stop_listener,
+)
+
+
+class Payload:
+    formatted = 0
+
+    def __str__(self):
+        Payload.formatted += 1
+        return 'payload'
+
+
+class TestAsyncLogging(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        # Writes what is still queued before the directory goes away; the next handler restarts it
+        self.addCleanup(stop_listener)
+        self.logger = logging.getLogger('tests.async_logging')
+        self.logger.propagate = False
+        self.addCleanup(setattr, self.logger, 'handlers', [])
+
+    def read_when_written(self, path, expected):
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            if os.path.exists(path):
+                with open(path, encoding='utf-8') as file:
+                    content = file.read()
+                if expected in content:
+                    return content
+            time.sleep(0.01)
+        self.fail(f'{expected!r} not written to {path}')
+
+    def test_records_are_written_in_the_background(self):
+        path = os.path.join(self.directory, 'app', 'views.log')
+        handler = AsyncRotatingFileHandler(path)
+        handler.setFormatter(logging.Formatter('[%(levelname)s] %(name)s: %(message)s'))
+        self.logger.addHandler(handler)
+        self.logger.setLevel(logging.INFO)
+
+        self.logger.info('Atendimento %s registrado', 42)
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            self.logger.error('Falha', exc_info=True)
+        content = self.read_when_written(path, 'ValueError: boom')
+        self.assertIn('[INFO] tests.async_logging: Atendimento 42 registrado', content)
+        self.assertIn('[ERROR] tests.async_logging: Falha\nTraceback', content)
+
+    def test_failing_file_does_not_stop_the_writer(self):
+        broken = AsyncRotatingFileHandler(os.path.join(self.directory, 'broken', 'crud.log'))
+        shutil.rmtree(os.path.join(self.directory, 'broken'))
+        path = os.path.join(self.directory, 'views.log')
+        self.logger.addHandler(broken)
+        self.logger.addHandler(AsyncRotatingFileHandler(path))
+        self.logger.setLevel(logging.INFO)
+        with mock.patch.object(logging, 'raiseExceptions', False):
+            self.logger.info('Primeiro registro')
+            self.logger.info('Segundo registro')
+            content = self.read_when_written(path, 'Segundo registro')
+        self.assertIn('Primeiro registro', content)
+
+    def test_full_queue_drops_records(self):
+        handler = AsyncRotatingFileHandler(os.path.join(self.directory, 'views.log'))
+        handler.queue = queue.Queue(1)
+        self.logger.addHandler(handler)
+        self.logger.setLevel(logging.INFO)
+        dropped = dropped_records()
+        self.logger.info('Cabe na fila')
+        self.logger.info('Descartado')
+        self.assertEqual(dropped_records(), dropped + 1)
+
+    def test_disabled_level_does_not_format_payload(self):
+        self.logger.addHandler(AsyncRotatingFileHandler(os.path.join(self.directory, 'views.log')))
+        self.logger.setLevel(logging.INFO)
+        Payload.formatted = 0
+        self.logger.debug('Appointments found: %s', Payload())
+        self.assertEqual(Payload.formatted, 0)
+        self.logger.info('Appointments found: %s', Payload())
+        # Merged on the logging thread, not by the background writer
+        self.assertEqual(Payload.formatted, 1)
+
+    def test_rotates_by_size(self):
+        path = os.path.join(self.directory, 'crud.log')
+        handler = SizedTimedRotatingFileHandler(path, max_bytes=100, backupCount=2, delay=True)
+        self.addCleanup(handler.close)
+        record = logging.LogRecord('crud', logging.INFO, __file__, 1, 'x' * 60, None, None)
+        for _ in range(5):
+            handler.handle(record)
+        rotated = sorted(name for name in os.listdir(self.directory)
+                         if name != 'crud.log' and not name.endswith('.lock'))
+        self.assertEqual(len(rotated), 2)
+        self.assertTrue(all(name.startswith('crud.log.') for name in rotated))
+        self.assertEqual(os.path.getsize(path), 61)
+
+    @skipUnless(hasattr(os, 'fork'), 'requires fork')
+    def test_forked_process_writes_its_records(self):
+        path = os.path.join(self.directory, 'views.log')
+        self.logger.addHandler(AsyncRotatingFileHandler(path))
+        self.logger.setLevel(logging.INFO)
+        self.logger.info('Antes do fork')
+        self.read_when_written(path, 'Antes do fork')
+
+        pid = os.fork()
+        if pid == 0:
+            try:
+                self.logger.info('Registro do processo filho')
+                stop_listener()
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+        self.read_when_written(path, 'Registro do processo filho')
+
+    @skipUnless(hasattr(os, 'fork'), 'requires fork')
+    def test_processes_share_the_rotation(self):
+        path = os.path.join(self.directory, 'crud.log')
+        children = []
+        for process in range(3):
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    handler = SizedTimedRotatingFileHandler(path, max_bytes=500, backupCount=1000, delay=True)
+                    for line in range(100):
+                        handler.handle(logging.LogRecord('crud', logging.INFO, __file__, 1,
+                                                         f'{process}-{line:03d}' + 'x' * 40, None, None))
+                    handler.close()
+                finally:
+                    os._exit(0)
+            children.append(pid)
+        for pid in children:
+            os.waitpid(pid, 0)
+
+        lines = []
+        for name in os.listdir(self.directory):
+            if name.startswith('crud.log') and not name.endswith('.lock'):
+                with open(os.path.join(self.directory, name), encoding='utf-8') as file:
+                    lines.extend(file.read().splitlines())
+                self.assertLessEqual(os.path.getsize(os.path.join(self.directory, name)), 500)
+        # No record lost or overwritten by another process's rotation
+        self.assertEqual(sorted(lines), sorted(f'{p}-{l:03d}' + 'x' * 40 for p in range(3) for l in range(100)))
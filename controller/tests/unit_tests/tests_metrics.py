@@ -0,0 +1,99 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from collections import Counter
+from datetime import date
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from prometheus_client.parser import text_string_to_metric_families
+from appointments.models import DailyAppointmentStats
+from controller.metrics import record_import
+
+
+def read_metrics(response):
+    return {
+        (sample.name, tuple(sorted(sample.labels.items()))): sample.value
+        for family in text_string_to_metric_families(response.content.decode())
+        for sample in family.samples
+    }
+
+
+class TestMetricsEndpoint(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user(username='admin', password='secret', is_staff=True))
+
+    def value(self, name, **labels):
+        return read_metrics(self.client.get('/metrics/')).get((name, tuple(sorted(labels.items()))), 0)
+
+    def test_request_metrics(self):
+        before = self.value('enfermaria_requests_total', view='chart_data', method='GET', status='200')
+        queries = self.value('enfermaria_request_db_queries_sum', view='chart_data')
+        self.client.get('/get_chart_data/')
+        self.client.get('/get_chart_data/')
+        self.assertEqual(self.value('enfermaria_requests_total', view='chart_data', method='GET', status='200'),
+                         before + 2)
+        self.assertEqual(self.value('enfermaria_request_duration_seconds_count', view='chart_data', method='GET'),
+                         before + 2)
+        # The first request reads the rollup, the second the cache
+        self.assertGreaterEqual(self.value('enfermaria_request_db_queries_sum', view='chart_data'), queries + 1)
+
+    def test_cache_lookups(self):
+        hits = self.value('enfermaria_cache_lookups_total', cache='infirmary_totals', result='hit')
+        misses = self.value('enfermaria_cache_lookups_total', cache='infirmary_totals', result='miss')
+        self.client.get('/get_chart_data/')
+        self.client.get('/get_chart_data/')
+        self.assertEqual(self.value('enfermaria_cache_lookups_total', cache='infirmary_totals', result='miss'),
+                         misses + 1)
+        self.assertEqual(self.value('enfermaria_cache_lookups_total', cache='infirmary_totals', result='hit'),
+                         hits + 1)
+
+    def test_appointments_per_infirmary(self):
+        DailyAppointmentStats.objects.create(day=date(2026, 3, 10), infirmary='Infantil', nurse='Ana',
+                                             patient_type='student', count=3)
+        DailyAppointmentStats.objects.create(day=date(2026, 3, 11), infirmary='Infantil', nurse='Bia',
+                                             patient_type='student', count=2)
+        self.assertEqual(self.value('enfermaria_appointments_total', infirmary='Infantil', patient_type='student'), 5)
+
+    def test_import_metrics(self):
+        rows = self.value('enfermaria_import_rows_total', entity='department', result='created')
+        record_import('department', 1.5, Counter(created=4, skipped=1))
+        self.assertEqual(self.value('enfermaria_import_rows_total', entity='department', result='created'), rows + 4)
+        self.assertGreater(self.value('enfermaria_import_last_run_timestamp_seconds', entity='department'), 0)
+
+    def test_hidden_without_token(self):
+        self.client.logout()
+        self.assertEqual(self.client.get('/metrics/').status_code, 404)
+        self.client.force_login(User.objects.create_user(username='nurse', password='secret'))
+        self.assertEqual(self.client.get('/metrics/').status_code, 404)
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_token(self):
+        self.client.logout()
+        self.assertEqual(self.client.get('/metrics/').status_code, 401)
+        self.assertEqual(self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+        response = self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+    def test_aggregates_worker_processes(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        script = ('import django; django.setup(); from collections import Counter; '
+                  'from controller.metrics import record_import; '
+                  'record_import("student", 2.0, Counter(created=10, updated=1))')
+        env = {**os.environ, 'PROMETHEUS_MULTIPROC_DIR': directory, 'DJANGO_SETTINGS_MODULE': 'setup.settings',
+               'SECRET_KEY': os.environ.get('SECRET_KEY', 'x')}
+        for _ in range(2):
+            subprocess.run([sys.executable, '-c', script], env=env, cwd=settings.BASE_DIR, check=True)
+
+        with override_settings(PROMETHEUS_MULTIPROC_DIR=directory):
+            self.assertEqual(self.value('enfermaria_import_rows_total', entity='student', result='created'), 20)
+            self.assertEqual(self.value('enfermaria_import_duration_seconds_sum', entity='student'), 4.0)
+            self.assertEqual(self.value('enfermaria_appointments_total', infirmary='Infantil',
+                                        patient_type='student'), 0)
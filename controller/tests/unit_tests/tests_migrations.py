@@ -0,0 +1,117 @@
+from datetime import datetime
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+from django.utils import timezone
+from patients.models import Student, Employee, Visitor
+from appointments.partitions import is_partitioned, list_partitions
+
+
+'''
+    Forward and backward runs of appointments/migrations/0006_unified_appointment.py, which
+    merges the per-type appointment tables into appointments_appointment.
+'''
+
+BEFORE = [('appointments', '0005_yearly_partitions')]
+AFTER = [('appointments', '0006_unified_appointment')]
+
+
+class TestUnifiedAppointmentMigration(TransactionTestCase):
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def setUp(self):
+        apps = self.migrate(BEFORE)
+        self.addCleanup(lambda: self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes()))
+        # The patients tables stay at their latest migration
+        student = Student.objects.create(id='S1', name='John Doe', age=15, gender='Male', registry='S1')
+        employee = Employee.objects.create(id='E1', name='Ana Lima', age=30, gender='Female', registry='E1')
+        visitor = Visitor.objects.create(name='Paul Brown', age=35, gender='Male', email='paul@example.com',
+                                         relationship='Parente')
+        common = {'infirmary': 'Infantil', 'nurse': 'Ana', 'reason': 'Febre', 'treatment': 'Repouso'}
+
+        def day(year, month):
+            return timezone.make_aware(datetime(year, month, 10, 9, 0))
+
+        StudentAppointment = apps.get_model('appointments', 'StudentAppointment')
+        self.students = [
+            StudentAppointment.objects.create(student_id=student.pk, current_class='1A', date=day(2023, 3), **common).pk,
+            StudentAppointment.objects.create(student_id=student.pk, current_class='1A', date=day(2024, 5), **common).pk,
+        ]
+        self.employees = [apps.get_model('appointments', 'EmployeeAppointment').objects.create(
+            employee_id=employee.pk, date=day(2023, 4), **common).pk]
+        self.visitors = [apps.get_model('appointments', 'VisitorAppointment').objects.create(
+            visitor_id=visitor.pk, date=day(2024, 1), **common).pk]
+
+    def test_forward_keeps_the_former_ids(self):
+        apps = self.migrate(AFTER)
+        Appointment = apps.get_model('appointments', 'Appointment')
+        rows = {(row.patient_type, row.legacy_id): row.pk for row in Appointment.objects.all()}
+        self.assertEqual(len(rows), 4)
+        self.assertEqual([rows['student', pk] for pk in self.students], self.students)
+        # The overlapping employee and visitor ids moved above the student ones
+        self.assertGreater(min(rows['employee', self.employees[0]], rows['visitor', self.visitors[0]]),
+                           max(self.students))
+        with connection.cursor() as cursor:
+            partitions = dict(list_partitions(cursor, 'appointments_appointment'))
+        self.assertIn('appointments_appointment_y2023', partitions)
+        self.assertIn('appointments_appointment_y2024', partitions)
+        self.assertEqual(Appointment.objects.filter(search_document__isnull=False).count(), 4)
+
+    def test_no_stored_reference_to_remap(self):
+        # Only the employee and visitor ids change: nothing in the database may hold them
+        apps = self.migrate(BEFORE)
+        per_type = {apps.get_model('appointments', name) for name in
+                    ('StudentAppointment', 'EmployeeAppointment', 'VisitorAppointment')}
+        references = [
+            (model.__name__, field.name) for model in apps.get_models() for field in model._meta.get_fields()
+            if field.is_relation and field.concrete and field.related_model in per_type
+        ]
+        self.assertEqual(references, [])
+        with self.assertRaises(LookupError):
+            apps.get_model('appointments', 'AppointmentSubmission')
+
+        apps = self.migrate(AFTER)
+        Appointment = apps.get_model('appointments', 'Appointment')
+        moved = Appointment.objects.get(patient_type='employee', legacy_id=self.employees[0])
+        self.assertNotEqual(moved.pk, self.employees[0])
+        self.assertEqual(moved.employee_id, 'E1')
+
+    def test_backward_splits_the_table(self):
+        apps = self.migrate(AFTER)
+        Appointment = apps.get_model('appointments', 'Appointment')
+        Appointment.objects.create(
+            patient_type='employee', employee_id='E1', infirmary='Infantil', nurse='Bia', reason='Tosse',
+            treatment='Xarope', date=timezone.make_aware(datetime(2024, 6, 1, 8, 0)),
+        )
+
+        apps = self.migrate(BEFORE)
+        StudentAppointment = apps.get_model('appointments', 'StudentAppointment')
+        EmployeeAppointment = apps.get_model('appointments', 'EmployeeAppointment')
+        VisitorAppointment = apps.get_model('appointments', 'VisitorAppointment')
+        self.assertEqual(sorted(StudentAppointment.objects.values_list('pk', flat=True)), self.students)
+        self.assertEqual(list(VisitorAppointment.objects.values_list('pk', flat=True)), self.visitors)
+        employees = list(EmployeeAppointment.objects.order_by('date').values_list('pk', 'nurse'))
+        self.assertEqual(employees[0], (self.employees[0], 'Ana'))
+        # The appointment recorded after the merge gets the next id of the per-type table
+        self.assertEqual(employees[1], (self.employees[0] + 1, 'Bia'))
+
+        with connection.cursor() as cursor:
+            for table in ('appointments_studentappointment', 'appointments_employeeappointment',
+                          'appointments_visitorappointment'):
+                self.assertTrue(is_partitioned(cursor, table))
+        # The search document trigger of the per-type table is back
+        appointment = StudentAppointment.objects.create(
+            student_id='S1', current_class='1A', infirmary='Infantil', nurse='Ana', reason='Dor de cabeça',
+            treatment='Repouso', date=timezone.make_aware(datetime(2024, 6, 2, 8, 0)),
+        )
+        self.assertIsNotNone(StudentAppointment.objects.get(pk=appointment.pk).search_document)
+        self.assertEqual(StudentAppointment.objects.get(pk=appointment.pk).pk, max(self.students) + 1)
+
+        # And forward again
+        apps = self.migrate(AFTER)
+        self.assertEqual(apps.get_model('appointments', 'Appointment').objects.count(), 6)
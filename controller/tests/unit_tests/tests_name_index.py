@@ -0,0 +1,121 @@
+import json
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from patients.models import *
+from controller.name_index import NameIndex, student_name_index, visitor_name_index
+
+
+def name_only(row):
+    return {'name': row['name']}
+
+
+@override_settings(PATIENT_NAME_INDEX_REFRESH_SECONDS=3600)
+class TestNameIndex(TestCase):
+
+    def setUp(self):
+        Student.objects.create(id='S1', name='João Araújo', age=15, gender='Male', registry='S1')
+        Student.objects.create(id='S2', name='Ana Joaquina', age=14, gender='Female', registry='S2')
+        Student.objects.create(id='S3', name='Mariana Souza', age=12, gender='Female', registry='S3')
+        for i in range(30):
+            Student.objects.create(id=f'X{i}', name=f'Joana Silva {i}', age=10, gender='Female', registry=f'X{i}')
+        self.index = NameIndex(Student, [], name_only)
+        self.index.build()
+
+    def search(self, query, **kwargs):
+        return [row['name'] for row in self.index.search(query, **kwargs)]
+
+    def test_search_ignores_accents_and_case(self):
+        self.assertEqual(self.search('joao')[0], 'João Araújo')
+        self.assertEqual(self.search('ARAUJO'), ['João Araújo'])
+
+    def test_search_ranks_prefix_matches_first(self):
+        self.assertEqual(self.search('joaquina')[0], 'Ana Joaquina')
+        names = self.search('jo', limit=50)
+        self.assertEqual(names[-1], 'Ana Joaquina')
+        self.assertTrue(all(name.startswith('Jo') for name in names[:-1]))
+
+    def test_search_matches_inside_words_and_typos(self):
+        self.assertEqual(self.search('riana'), ['Mariana Souza'])
+        self.assertEqual(self.search('mariana sousa'), ['Mariana Souza'])
+
+    def test_search_is_capped_and_does_not_query(self):
+        with self.assertNumQueries(0):
+            names = self.search('joana')
+        self.assertEqual(len(names), 20)
+        self.assertEqual(self.search(''), [])
+
+    def test_refresh_loads_changed_rows(self):
+        Student.objects.create(id='S4', name='Zélia Duarte', age=11, gender='Female', registry='S4')
+        student = Student.objects.get(id='S3')
+        student.name = 'Mariana Souza Lima'
+        student.save()
+        self.assertEqual(self.search('zelia'), [])
+
+        self.assertGreaterEqual(self.index.refresh(), 2)
+        self.assertEqual(self.search('zelia'), ['Zélia Duarte'])
+        self.assertEqual(self.search('mariana'), ['Mariana Souza Lima'])
+
+    def test_refresh_without_changes_keeps_the_index(self):
+        data = self.index._data
+        self.assertEqual(self.index.refresh(), 0)
+        self.assertIs(self.index._data, data)
+
+    def test_refresh_drops_deleted_rows(self):
+        Student.objects.filter(id='S3').delete()
+        self.index.refresh()
+        self.assertEqual(self.search('mariana'), [])
+
+    def test_refresh_after_building_an_empty_table(self):
+        index = NameIndex(Visitor, [], name_only)
+        index.build()
+        Visitor.objects.create(name='Paulo Brito', age=35, gender='Male', email='paulo@example.com',
+                               relationship='Parente')
+        self.assertEqual(index.refresh(), 1)
+        self.assertEqual([row['name'] for row in index.search('paulo')], ['Paulo Brito'])
+
+    @override_settings(PATIENT_NAME_INDEX_REFRESH_SECONDS=0)
+    def test_search_refreshes_after_interval(self):
+        Student.objects.create(id='S4', name='Zélia Duarte', age=11, gender='Female', registry='S4')
+        self.assertEqual(self.search('zelia'), ['Zélia Duarte'])
+
+
+@override_settings(PATIENT_NAME_INDEX_ENABLED=True, PATIENT_NAME_INDEX_REFRESH_SECONDS=3600)
+class TestNameIndexViews(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.class_group = ClassGroup.objects.create(id='CG1', name='Class 1', segment='Primary', director='Director 1')
+        Student.objects.create(id='S1', name='João Araújo', age=15, gender='Male', registry='S1', class_group=self.class_group)
+        Visitor.objects.create(name='Márcia Lopes', age=40, gender='Female', email='marcia@example.com', relationship='Mãe')
+        student_name_index.build()
+        visitor_name_index.build()
+
+    def test_student_search_uses_index(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('search_student_by_name'), {'q': 'joao'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['results'], [
+            {'name': 'João Araújo', 'registry': 'S1', 'age': 15, 'class_group_name': 'Class 1'},
+        ])
+
+    def test_refresh_follows_class_group_changes(self):
+        self.class_group.name = 'Class 1A'
+        self.class_group.save()
+        ClassGroup.objects.create(id='CG2', name='Class 2', segment='Primary', director='Director 1')
+        Student.objects.create(id='S2', name='Joana Lima', age=14, gender='Female', registry='S2',
+                               class_group_id='CG2')
+        self.assertEqual(student_name_index.refresh(), 1)
+        self.assertEqual(student_name_index.search('joana')[0]['class_group_name'], 'Class 2')
+        self.assertEqual(student_name_index.search('joao')[0]['class_group_name'], 'Class 1A')
+
+        # Moved without touching updated_at
+        Student.objects.filter(id='S2').update(class_group_id='CG1')
+        student_name_index.refresh()
+        self.assertEqual(student_name_index.search('joana')[0]['class_group_name'], 'Class 1A')
+
+    def test_visitor_search_uses_index(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('search_visitor_by_name'), {'q': 'marcia'})
+        self.assertEqual(json.loads(response.content)['results'], [
+            {'name': 'Márcia Lopes', 'age': 40, 'email': 'marcia@example.com'},
+        ])
@@ -10,6 +10,8 @@ urlpatterns = [
     path('logout/', views.logout, name='logout'),
     path('get_user/', views.get_user_info, name='get_user_info'),
     path('get_chart_data/', views.get_chart_data, name='chart_data'),
+    path('dashboard/events/', views.dashboard_events, name='dashboard_events'),
+    path('metrics/', views.metrics, name='metrics'),
 
 
 ]
\ No newline at end of file
@@ -1,13 +1,14 @@
+import json
 import logging
+from django.conf import settings
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
-from django.db.models import Count
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse, Http404
+from django.utils.crypto import constant_time_compare
 from urllib.parse import unquote
-from appointments.models import StudentAppointment, EmployeeAppointment, VisitorAppointment
-from .crud import (get_nurse_appointments_current_year, get_total_appointments_current_year, 
-                   get_total_appointments_today, get_total_appointments_infirmary_current_year, 
-                   get_total_appointments_infirmary_today)
+from .crud import get_dashboard_stats, get_infirmary_totals
+from .events import broker, stream_events
+from .metrics import CONTENT_TYPE, render_metrics
 
 logger = logging.getLogger('controller.views')
 
@@ -20,26 +21,20 @@ def index(request):
         if selected_infirmary:
             selected_infirmary = unquote(selected_infirmary)
             selected_infirmary = selected_infirmary.strip()
-            logger.debug(f"Selected infirmary after decoding: '{selected_infirmary}'")
+            logger.debug("Selected infirmary after decoding: '%s'", selected_infirmary)
         else:
             selected_infirmary = None  # Ou defina um valor padrão, se necessário
             logger.debug("No infirmary selected, setting to None")
 
-        nurse_appointments = get_nurse_appointments_current_year()
-        total_appointments_year = get_total_appointments_current_year()
-        total_appointments_today = get_total_appointments_today()
-        total_appointments_infirmary_year = get_total_appointments_infirmary_current_year(selected_infirmary)
-        total_appointments_infirmary_today = get_total_appointments_infirmary_today(selected_infirmary)
+        dashboard = get_dashboard_stats(selected_infirmary)
 
         full_name = request.user.first_name
         context = {
             'first_name': full_name,
-            'nurse_appointments': nurse_appointments,
-            'total_appointments_year': total_appointments_year,
-            'total_appointments_today': total_appointments_today,
-            'total_appointments_infirmary_year': total_appointments_infirmary_year,
-            'total_appointments_infirmary_today': total_appointments_infirmary_today,
+            'dashboard': dashboard,
+            'infirmary_counts_json': json.dumps(dashboard.infirmary_counts, ensure_ascii=False),
             'selected_infirmary': selected_infirmary,
+            'live_updates': settings.DASHBOARD_LIVE_UPDATES,
         }
         logger.info('Dados enviados para a interface do usuário.')
         return render(request, 'index.html', context)
@@ -71,39 +66,18 @@ def get_chart_data(request):
     # Agregar as contagens por enfermaria
     labels = ["Infantil", "Fundamental", "Ensino Médio", "Atendimento Externo"]
     infirmary_counts = {label: 0 for label in labels}
-    logger.debug(f"Labels defined: {labels}")
+    logger.debug("Labels defined: %s", labels)
     logger.debug("Initialized infirmary_counts dictionary.")
 
-    # Agregar contagens do StudentAppointment
-    student_counts = StudentAppointment.objects.values('infirmary').annotate(count=Count('id'))
-    logger.debug(f"Student counts retrieved: {list(student_counts)}")
-    for item in student_counts:
-        infirmary = item['infirmary']
+    # Somar as contagens da tabela de estatísticas diárias em vez de contar os atendimentos
+    for infirmary, count in get_infirmary_totals().items():
         if infirmary in infirmary_counts:
-            infirmary_counts[infirmary] += item['count']
-    logger.debug(f"Infirmary counts after StudentAppointment: {infirmary_counts}")
-
-    # Agregar contagens do EmployeeAppointment
-    employee_counts = EmployeeAppointment.objects.values('infirmary').annotate(count=Count('id'))
-    logger.debug(f"Employee counts retrieved: {list(employee_counts)}")
-    for item in employee_counts:
-        infirmary = item['infirmary']
-        if infirmary in infirmary_counts:
-            infirmary_counts[infirmary] += item['count']
-    logger.debug(f"Infirmary counts after EmployeeAppointment: {infirmary_counts}")
-
-    # Agregar contagens do VisitorAppointment
-    visitor_counts = VisitorAppointment.objects.values('infirmary').annotate(count=Count('id'))
-    logger.debug(f"Visitor counts retrieved: {list(visitor_counts)}")
-    for item in visitor_counts:
-        infirmary = item['infirmary']
-        if infirmary in infirmary_counts:
-            infirmary_counts[infirmary] += item['count']
-    logger.debug(f"Final infirmary counts: {infirmary_counts}")
+            infirmary_counts[infirmary] += count
+    logger.debug("Final infirmary counts: %s", infirmary_counts)
 
     # Preparar os dados para o gráfico
     data = [infirmary_counts[label] for label in labels]
-    logger.debug(f"Data prepared for chart: {data}")
+    logger.debug("Data prepared for chart: %s", data)
 
     logger.info('Dados enviados para a interface do usuário.')
     # Retornar os dados em formato JSON com ensure_ascii=False
@@ -111,3 +85,44 @@ def get_chart_data(request):
         {'labels': labels, 'data': data},
         json_dumps_params={'ensure_ascii': False}
     )
+
+
+async def dashboard_events(request):
+    logger.info('Iniciando dashboard_events')
+    if not settings.DASHBOARD_LIVE_UPDATES:
+        raise Http404('Atualizações ao vivo desativadas')
+    user = await request.auser()
+    if not user.is_authenticated:
+        logger.error('Usuário não autenticado')
+        return JsonResponse({'error': 'Usuário não autenticado'}, status=401)
+
+    queue = broker.subscribe()
+
+    async def events():
+        try:
+            async for message in stream_events(queue):
+                yield message
+        finally:
+            broker.unsubscribe(queue)
+            logger.info('Conexão de eventos encerrada')
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    logger.info('Stream de eventos enviado para a interface do usuário.')
+    return response
+
+
+def metrics(request):
+    """
+    Serves the application metrics in the Prometheus text format (controller/metrics.py) to staff
+    users and to the scraper, which sends METRICS_TOKEN as a bearer token. Without METRICS_TOKEN
+    the endpoint is hidden from everyone else.
+    """
+    if not request.user.is_staff:
+        if not settings.METRICS_TOKEN:
+            raise Http404
+        if not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {settings.METRICS_TOKEN}'):
+            logger.error('Token de métricas inválido')
+            return HttpResponse('Não autorizado', status=401, content_type='text/plain; charset=utf-8')
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE)
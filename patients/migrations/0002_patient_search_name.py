@@ -0,0 +1,58 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:50
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+import patients.models
+from django.contrib.postgres.operations import TrigramExtension, UnaccentExtension
+from django.db import migrations, models
+
+
+# unaccent() is only STABLE (it depends on the dictionary), so it cannot be used in a generated
+# column. This wrapper pins the dictionary and is declared IMMUTABLE.
+CREATE_IMMUTABLE_UNACCENT = '''
+CREATE OR REPLACE FUNCTION immutable_unaccent(text) RETURNS text AS $$
+    SELECT public.unaccent('public.unaccent'::regdictionary, $1)
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT;
+'''
+
+DROP_IMMUTABLE_UNACCENT = 'DROP FUNCTION IF EXISTS immutable_unaccent(text);'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0001_initial'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        UnaccentExtension(),
+        migrations.RunSQL(CREATE_IMMUTABLE_UNACCENT, DROP_IMMUTABLE_UNACCENT),
+        migrations.AddField(
+            model_name='employee',
+            name='search_name',
+            field=models.GeneratedField(db_persist=True, expression=patients.models.ImmutableUnaccent(django.db.models.functions.text.Lower('name')), output_field=models.CharField(max_length=100)),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='search_name',
+            field=models.GeneratedField(db_persist=True, expression=patients.models.ImmutableUnaccent(django.db.models.functions.text.Lower('name')), output_field=models.CharField(max_length=100)),
+        ),
+        migrations.AddField(
+            model_name='visitor',
+            name='search_name',
+            field=models.GeneratedField(db_persist=True, expression=patients.models.ImmutableUnaccent(django.db.models.functions.text.Lower('name')), output_field=models.CharField(max_length=100)),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_name'], name='employee_search_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_name'], name='student_search_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='visitor',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_name'], name='visitor_search_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
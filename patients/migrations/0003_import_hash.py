@@ -0,0 +1,33 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0002_patient_search_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='classgroup',
+            name='import_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='department',
+            name='import_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='employee',
+            name='import_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='import_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+    ]
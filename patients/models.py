@@ -1,4 +1,16 @@
 from django.db import models
+from django.db.models.functions import Lower
+from django.contrib.postgres.indexes import GinIndex
+
+
+class ImmutableUnaccent(models.Func):
+    """
+    Calls immutable_unaccent(), an IMMUTABLE wrapper of unaccent() created by migration
+    0002_patient_search_name, so it can be used in generated columns and indexes.
+    """
+    function = 'immutable_unaccent'
+    output_field = models.CharField()
+
 
 
 
@@ -8,6 +20,8 @@ class ClassGroup(models.Model):
     name = models.CharField(max_length=255)
     segment = models.CharField(max_length=50, blank=True)
     director = models.CharField(max_length=100, blank=True)
+    # Hash of the fields last written by import_data, used to skip unchanged rows
+    import_hash = models.CharField(max_length=64, blank=True, default='', editable=False)
 
     def __str__(self):
         return self.name
@@ -27,9 +41,19 @@ class Student(models.Model):
     mother_phone = models.CharField(max_length=20, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-
-
-    
+    # Hash of the fields last written by import_data, used to skip unchanged rows
+    import_hash = models.CharField(max_length=64, blank=True, default='', editable=False)
+    # Lowercase, unaccented name used by the autocomplete (trigram index)
+    search_name = models.GeneratedField(
+        expression=ImmutableUnaccent(Lower('name')),
+        output_field=models.CharField(max_length=100),
+        db_persist=True,
+    )
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_name'], opclasses=['gin_trgm_ops'], name='student_search_name_trgm'),
+        ]
 
     def __str__(self):
         return self.name
@@ -55,6 +79,8 @@ class Department(models.Model):
     id = models.CharField(max_length=50, primary_key=True)
     name = models.CharField(max_length=255)
     director = models.CharField(max_length=100)
+    # Hash of the fields last written by import_data, used to skip unchanged rows
+    import_hash = models.CharField(max_length=64, blank=True, default='', editable=False)
 
     def __str__(self):
         return self.name
@@ -71,6 +97,19 @@ class Employee(models.Model):
     registry = models.CharField(max_length=20, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Hash of the fields last written by import_data, used to skip unchanged rows
+    import_hash = models.CharField(max_length=64, blank=True, default='', editable=False)
+    # Lowercase, unaccented name used by the autocomplete (trigram index)
+    search_name = models.GeneratedField(
+        expression=ImmutableUnaccent(Lower('name')),
+        output_field=models.CharField(max_length=100),
+        db_persist=True,
+    )
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_name'], opclasses=['gin_trgm_ops'], name='employee_search_name_trgm'),
+        ]
 
     def __str__(self):
         return self.name
@@ -100,6 +139,17 @@ class Visitor(models.Model):
     patient_notes = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Lowercase, unaccented name used by the autocomplete (trigram index)
+    search_name = models.GeneratedField(
+        expression=ImmutableUnaccent(Lower('name')),
+        output_field=models.CharField(max_length=100),
+        db_persist=True,
+    )
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_name'], opclasses=['gin_trgm_ops'], name='visitor_search_name_trgm'),
+        ]
 
     def __str__(self):
         return self.name
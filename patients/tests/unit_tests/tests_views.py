@@ -300,6 +300,37 @@ class TestSearchStudentByName(TestCase):
         self.assertEqual(len(response_data['results']), 0)
 
 
+class TestSearchStudentByNameAccents(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.class_group = ClassGroup.objects.create(id='CG1', name='Class 1', segment='Primary', director='Director 1')
+        Student.objects.create(id='S1', name='João Araújo', age=15, gender='Male', registry='S1', class_group=self.class_group)
+        Student.objects.create(id='S2', name='Ana Joaquina', age=14, gender='Female', registry='S2')
+        for i in range(30):
+            Student.objects.create(id=f'X{i}', name=f'Joana Silva {i}', age=10, gender='Female', registry=f'X{i}')
+
+    def search(self, query):
+        response = self.client.get(reverse('search_student_by_name'), {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [student['name'] for student in json.loads(response.content)['results']]
+
+    def test_search_ignores_accents_and_case(self):
+        self.assertEqual(self.search('joao')[0], 'João Araújo')
+        self.assertEqual(self.search('ARAUJO'), ['João Araújo'])
+
+    def test_search_ranks_prefix_matches_first(self):
+        self.assertEqual(self.search('joaquina')[0], 'Ana Joaquina')
+        names = self.search('joa')
+        self.assertNotIn('Ana Joaquina', names)
+        self.assertTrue(all(name.startswith('Jo') for name in names))
+
+    def test_search_is_capped_and_single_query(self):
+        with self.assertNumQueries(1):
+            names = self.search('joana')
+        self.assertEqual(len(names), 20)
+
+
 ################################ Employee Views ################################
 
 class TestCreateEmployees(TestCase):
@@ -720,3 +751,44 @@ class TestSearchVisitorByName(TestCase):
         self.assertEqual(response.status_code, 200)
         response_data = json.loads(response.content)
         self.assertEqual(len(response_data['results']), 0)
+
+
+################################ All Patients Views ################################
+
+class TestSearchPatients(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.class_group = ClassGroup.objects.create(id='CG1', name='Class 1', segment='Primary', director='Director 1')
+        self.department = Department.objects.create(id='D1', name='HR', director='Director HR')
+        Student.objects.create(id='S1', name='Mário Souza', age=15, gender='Male', registry='S1', class_group=self.class_group)
+        Employee.objects.create(id='E1', name='Ana Maria Lima', age=30, gender='Female', registry='E1',
+                                department=self.department, position='Nurse')
+        Visitor.objects.create(name='Maria Costa', age=40, gender='Female', email='maria@example.com', relationship='Mãe')
+
+    def search(self, query):
+        response = self.client.get(reverse('search_patients'), {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)['results']
+
+    def test_search_returns_typed_results_in_one_query(self):
+        with self.assertNumQueries(1):
+            results = self.search('maria')
+        self.assertEqual([result['type'] for result in results][:2], ['visitor', 'employee'])
+        visitor, employee = results[:2]
+        self.assertEqual(visitor['registry'], None)
+        self.assertEqual(visitor['detail'], 'Mãe')
+        self.assertEqual(visitor['url'], reverse('visitor_appointment') + '?email=maria%40example.com')
+        self.assertEqual(employee['id'], 'E1')
+        self.assertEqual(employee['detail'], 'HR')
+        self.assertEqual(employee['url'], reverse('employee_appointment') + '?registry=E1')
+
+    def test_search_ignores_accents(self):
+        results = self.search('mario')
+        self.assertEqual(results[0]['type'], 'student')
+        self.assertEqual(results[0]['name'], 'Mário Souza')
+        self.assertEqual(results[0]['detail'], 'Class 1')
+        self.assertEqual(results[0]['url'], reverse('student_appointment') + '?registry=S1')
+
+    def test_search_with_empty_query(self):
+        self.assertEqual(self.search(''), [])
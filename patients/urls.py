@@ -17,5 +17,7 @@ urlpatterns = [
     path('visitors/search/', search_visitor, name='search_visitor'),
     path('visitors/search/name/', search_visitor_by_name, name='search_visitor_by_name'),
     path('visitors/search/id/', search_visitor_by_id, name='search_visitor_by_id'),
+
+    path('search/', search_patients, name='search_patients'),
     
 ]
\ No newline at end of file
@@ -1,9 +1,14 @@
 from django.http import JsonResponse, Http404
 from django.shortcuts import render
+from django.urls import reverse
+from django.utils.http import urlencode
 from django.views.decorators.csrf import csrf_exempt
 from django.forms.models import model_to_dict
 from .models import *
-from controller.crud import create_objects, get_object, get_by_id, update_object, update_info, update_visitor_info
+from controller.crud import (create_objects, get_object, get_by_id, update_object, update_info,
+                             update_visitor_info, search_by_name, search_all_patients)
+from controller.name_index import student_name_index, employee_name_index, visitor_name_index
+from django.conf import settings
 import json
 import logging
 
@@ -44,7 +49,7 @@ def create_students(data):
     
     if data is not None:
         if isinstance(data, list):
-            logger.debug(f"Received data is a list with {len(data)} items.")
+            logger.debug("Received data is a list with %s items.", len(data))
             create_objects(Student, data)
             logger.info("Students successfully created.")
             logger.info("Dados enviados para a interface do usuário.")
@@ -76,7 +81,7 @@ def create_student_info(request):
         logger.info("Requisição POST recebida")
         try:
             data = json.loads(request.body)
-            logger.debug(f"Request data: {data}")
+            logger.debug("Request data: %s", data)
             
             if not isinstance(data, dict):
                 logger.error("Invalid data format, expected a dictionary")
@@ -92,9 +97,9 @@ def create_student_info(request):
                 logger.info("Dados enviados para a interface do usuário.")
                 return JsonResponse({'status': 'error', 'message': 'Missing required field: student_id'}, status=400)
 
-            logger.info(f"Calling update_info for student_id: {student_id}")
+            logger.info("Calling update_info for student_id: %s", student_id)
             updated_info = update_info(StudentInfo, student_id, 'student_id', allergies, patient_notes)
-            logger.info(f"Student info updated successfully for student_id: {student_id}")
+            logger.info("Student info updated successfully for student_id: %s", student_id)
             logger.info("Dados enviados para a interface do usuário.")
             return JsonResponse({'status': 'success', 'message': 'Student info updated successfully', 'data': updated_info.id}, status=200)
 
@@ -104,7 +109,7 @@ def create_student_info(request):
             return JsonResponse({'status': 'error', 'message': 'Invalid JSON'}, status=400)
     
     else:
-        logger.error(f"Invalid request method: {request.method}")
+        logger.error("Invalid request method: %s", request.method)
         logger.info("Dados enviados para a interface do usuário.")
         return JsonResponse({'status': 'error', 'message': 'Invalid request method'}, status=405)
         
@@ -122,7 +127,7 @@ def create_class_group(data):
     
     if data is not None:
         if isinstance(data, list):
-            logger.debug(f"Received data is a list with {len(data)} items.")
+            logger.debug("Received data is a list with %s items.", len(data))
             create_objects(ClassGroup, data)
             logger.info("Class groups successfully created.")
             logger.info("Dados enviados para a interface do usuário.")
@@ -148,11 +153,11 @@ def search_student(name, registry):
         dict or None: A dictionary containing the student's information if found, 
                       or None if no records were found.
     """
-    logger.info(f"Starting search for student with name: {name} and registry: {registry}.")
+    logger.info("Starting search for student with name: %s and registry: %s.", name, registry)
     
     try:
         students = get_object(Student, name=name, registry=registry, related_fields=['info', 'class_group'])
-        logger.debug(f"{len(students)} students found with the given criteria.")
+        logger.debug("%s students found with the given criteria.", len(students))
         
         if len(students) > 1:
             logger.warning("More than one record found for the given information.")
@@ -165,7 +170,7 @@ def search_student(name, registry):
         student_data['info'] = student_info_data
         student_data['class_group_name'] = student.class_group.name if student.class_group else None
 
-        logger.info(f"Student found: {student_data}")
+        logger.info("Student found: %s", student_data)
         logger.info("Dados enviados para a interface do usuário.")
         return student_data
     
@@ -178,32 +183,31 @@ def search_student(name, registry):
 def search_student_by_name(request):
     logger.info("Iniciando search_student_by_name")
     """
-    Search for a student by name.
+    Search for a student by name, ignoring accents and case, for the autocomplete.
     Args:
         request (HttpRequest): The HTTP request object.
     Returns:
         JsonResponse: A JSON response containing the search results.
     """
     query = request.GET.get('q', '')
-    logger.info(f"Starting search for student by name with query: {query}")
+    logger.info("Starting search for student by name with query: %s", query)
     
-    if query:
-        try: 
-            results = get_object(Student, name=query, related_fields=['class_group'])
-            logger.debug(f"{len(results)} students found with the query '{query}'.")
-
-            data = [
-                {
-                    'name': student.name,
-                    'registry': student.registry,
-                    'age': student.age,
-                    'class_group_name': student.class_group.name if student.class_group else None
-                }
-                for student in results
-            ]
-        except Http404:
-            logger.warning(f"No students found for the query '{query}'.")
-            data = []
+    if query and settings.PATIENT_NAME_INDEX_ENABLED:
+        data = student_name_index.search(query)
+        logger.debug("%s students found in the name index with the query '%s'.", len(data), query)
+    elif query:
+        results = search_by_name(Student, query, related_fields=['class_group'])
+        logger.debug("%s students found with the query '%s'.", len(results), query)
+
+        data = [
+            {
+                'name': student.name,
+                'registry': student.registry,
+                'age': student.age,
+                'class_group_name': student.class_group.name if student.class_group else None
+            }
+            for student in results
+        ]
     else: 
         logger.info("No query provided, returning empty results.")
         data = []
@@ -245,7 +249,7 @@ def create_employees(data):
     """
     if data is not None:
         if isinstance(data, list):
-            logger.debug(f"Received data is a list with {len(data)} items.")
+            logger.debug("Received data is a list with %s items.", len(data))
             create_objects(Employee, data)
             logger.info("Employees successfully created.")
             logger.info("Dados enviados para a interface do usuário.")
@@ -276,7 +280,7 @@ def create_employee_info(request):
         logger.info("Requisição POST recebida")
         try:
             data = json.loads(request.body)
-            logger.debug(f"Request data: {data}")
+            logger.debug("Request data: %s", data)
             
             if not isinstance(data, dict):
                 logger.error("Invalid data format, expected a dictionary")
@@ -292,9 +296,9 @@ def create_employee_info(request):
                 logger.info("Dados enviados para a interface do usuário.")
                 return JsonResponse({'status': 'error', 'message': 'Missing required field: employee_id'}, status=400)
 
-            logger.info(f"Calling update_info for employee_id: {employee_id}")
+            logger.info("Calling update_info for employee_id: %s", employee_id)
             updated_info = update_info(EmployeeInfo, employee_id, 'employee_id', allergies, patient_notes)
-            logger.info(f"Employee info updated successfully for employee_id: {employee_id}")
+            logger.info("Employee info updated successfully for employee_id: %s", employee_id)
             logger.info("Dados enviados para a interface do usuário.")
             return JsonResponse({'status': 'success', 'message': 'Employee info updated successfully', 'data': updated_info.id}, status=200)
 
@@ -304,7 +308,7 @@ def create_employee_info(request):
             return JsonResponse({'status': 'error', 'message': 'Invalid JSON'}, status=400)
     
     else:
-        logger.error(f"Invalid request method: {request.method}")
+        logger.error("Invalid request method: %s", request.method)
         logger.info("Dados enviados para a interface do usuário.")
         return JsonResponse({'status': 'error', 'message': 'Invalid request method'}, status=405)
 
@@ -320,7 +324,7 @@ def create_department(data):
     """
     if data is not None:
         if isinstance(data, list):
-            logger.debug(f"Received data is a list with {len(data)} items.")
+            logger.debug("Received data is a list with %s items.", len(data))
             create_objects(Department, data)
             logger.info("Departments successfully created.")
             logger.info("Dados enviados para a interface do usuário.")
@@ -346,11 +350,11 @@ def search_employee(name, registry):
         dict or None: A dictionary containing the employee's information if found, 
         or None if no records were found.
     """
-    logger.info(f"Starting search for employee with name: {name} and registry: {registry}.")
+    logger.info("Starting search for employee with name: %s and registry: %s.", name, registry)
     
     try:
         employees = get_object(Employee, name=name, registry=registry, related_fields=['info', 'department'])
-        logger.debug(f"{len(employees)} employees found with the given criteria.")
+        logger.debug("%s employees found with the given criteria.", len(employees))
         
         if len(employees) > 1:
             logger.warning("More than one record found for the given information.")
@@ -363,7 +367,7 @@ def search_employee(name, registry):
         employee_data['info'] = employee_info_data
         employee_data['department_name'] = employee.department.name if employee.department else None
         
-        logger.info(f"Employee found: {employee_data}")
+        logger.info("Employee found: %s", employee_data)
         logger.info("Dados enviados para a interface do usuário.")
         return employee_data
     
@@ -376,33 +380,31 @@ def search_employee(name, registry):
 def search_employee_by_name(request):
     logger.info("Iniciando search_employee_by_name")
     """
-    Search for an employee by name.
+    Search for an employee by name, ignoring accents and case, for the autocomplete.
     Args:
         request (HttpRequest): The HTTP request object.
     Returns:
         JsonResponse: A JSON response containing the search results.
     """
     query = request.GET.get('q', '')
-    logger.info(f"Starting search for employee by name with query: {query}")
+    logger.info("Starting search for employee by name with query: %s", query)
     
-    if query:
-        try: 
-            results = get_object(Employee, name=query, related_fields=['department'])
-            logger.debug(f"{len(results)} employees found with the query '{query}'.")
-
-            data = [
-                {
-                    'id': employee.id,
-                    'name': employee.name,
-                    'registry': employee.registry,
-                    'department_name': employee.department.name if employee.department else None
-                }
-                for employee in results
-            ]
-
-        except Http404:
-            logger.warning(f"No employees found for the query '{query}'.")
-            data = []
+    if query and settings.PATIENT_NAME_INDEX_ENABLED:
+        data = employee_name_index.search(query)
+        logger.debug("%s employees found in the name index with the query '%s'.", len(data), query)
+    elif query:
+        results = search_by_name(Employee, query, related_fields=['department'])
+        logger.debug("%s employees found with the query '%s'.", len(results), query)
+
+        data = [
+            {
+                'id': employee.id,
+                'name': employee.name,
+                'registry': employee.registry,
+                'department_name': employee.department.name if employee.department else None
+            }
+            for employee in results
+        ]
     else:
         logger.info("No query provided, returning empty results.")
         data = []
@@ -449,12 +451,12 @@ def manage_visitor_data(visitor_data):
 
         if visitors and len(visitors) > 0:
             visitor = visitors[0]
-            logger.info(f"Visitor already exists: {visitor}")
+            logger.info("Visitor already exists: %s", visitor)
 
             # Atualizar as informações do visitante se necessário
             if visitor.allergies != visitor_data['allergies'] or visitor.patient_notes != visitor_data['patient_notes']:
                 update_visitor_info(Visitor, visitor_email, visitor_data['allergies'], visitor_data['patient_notes'])
-                logger.info(f"Visitor info updated: {visitor}")
+                logger.info("Visitor info updated: %s", visitor)
 
             logger.info("Dados enviados para a interface do usuário.")
             return visitor  # Retornar o visitante existente
@@ -469,16 +471,16 @@ def manage_visitor_data(visitor_data):
                 created_visitor_data = visitor_response.content  # Acessar o conteúdo JSON diretamente
                 created_visitor_data = json.loads(created_visitor_data)['data'][0]  # Converter para dicionário Python
                 visitor = Visitor(**created_visitor_data)  # Criar uma instância local do visitante
-                logger.info(f"New visitor created: {visitor}")
+                logger.info("New visitor created: %s", visitor)
                 logger.info("Dados enviados para a interface do usuário.")
                 return visitor
             else:
-                logger.error(f"Error creating visitor: {visitor_response.content}")
+                logger.error("Error creating visitor: %s", visitor_response.content)
                 logger.info("Dados enviados para a interface do usuário.")
                 return None
 
     except Exception as e:
-        logger.error(f"Error managing visitor data: {e}", exc_info=True)
+        logger.error("Error managing visitor data: %s", e, exc_info=True)
         logger.info("Dados enviados para a interface do usuário.")
         return None
 
@@ -501,7 +503,7 @@ def search_visitor(name, email):
         
         visitor = visitors[0]  
         visitor_data = model_to_dict(visitor)
-        logger.info(f"Visitor found: {visitor_data}")
+        logger.info("Visitor found: %s", visitor_data)
         logger.info("Dados enviados para a interface do usuário.")
         return visitor_data
     
@@ -514,31 +516,30 @@ def search_visitor(name, email):
 def search_visitor_by_name(request):
     logger.info("Iniciando search_visitor_by_name")
     """
-    Search for a visitor by name.
+    Search for a visitor by name, ignoring accents and case, for the autocomplete.
     Args:
         request (HttpRequest): The HTTP request object.
     Returns:
         JsonResponse: A JSON response containing the search results.
     """
     query = request.GET.get('q', '')
-    logger.info(f"Starting search for visitor by name with query: {query}")
+    logger.info("Starting search for visitor by name with query: %s", query)
     
-    if query:
-        try: 
-            results = get_object(Visitor, name=query)
-            logger.debug(f"{len(results)} visitors found with the query '{query}'.")
-
-            data = [
-                {
-                    'name': visitor.name,
-                    'age': visitor.age,
-                    'email': visitor.email,
-                }
-                for visitor in results
-            ]
-        except Http404:
-            logger.warning(f"No visitors found for the query '{query}'.")
-            data = []
+    if query and settings.PATIENT_NAME_INDEX_ENABLED:
+        data = visitor_name_index.search(query)
+        logger.debug("%s visitors found in the name index with the query '%s'.", len(data), query)
+    elif query:
+        results = search_by_name(Visitor, query)
+        logger.debug("%s visitors found with the query '%s'.", len(results), query)
+
+        data = [
+            {
+                'name': visitor.name,
+                'age': visitor.age,
+                'email': visitor.email,
+            }
+            for visitor in results
+        ]
     else: 
         logger.info("No query provided, returning empty results.")
         data = []
@@ -559,3 +560,52 @@ def search_visitor_by_id(request):
     except Http404:
         logger.info("Dados enviados para a interface do usuário.")
         return JsonResponse({'status': 'error', 'message': 'No records found'}, status=404)
+
+############################################################################################################
+
+########################## ----------------- ALL PATIENTS VIEWS ----------------- ##########################
+
+PATIENT_APPOINTMENT_URLS = {
+    'student': ('student_appointment', 'registry'),
+    'employee': ('employee_appointment', 'registry'),
+    'visitor': ('visitor_appointment', 'email'),
+}
+
+# endpoint - /search -> # User operation
+def search_patients(request):
+    logger.info("Iniciando search_patients")
+    """
+    Search students, employees and visitors by name in a single query, for when the nurse does
+    not know which kind of patient is being attended.
+    Args:
+        request (HttpRequest): The HTTP request object.
+    Returns:
+        JsonResponse: A JSON response containing the results merged by relevance, each one with
+                      its type, id, name, registry, detail (class group, department or relationship)
+                      and the url of its appointment page.
+    """
+    query = request.GET.get('q', '')
+    logger.info("Starting search for patients by name with query: %s", query)
+
+    if query:
+        results = search_all_patients(query)
+        logger.debug("%s patients found with the query '%s'.", len(results), query)
+
+        data = []
+        for patient in results:
+            url_name, parameter = PATIENT_APPOINTMENT_URLS[patient['patient_type']]
+            data.append({
+                'type': patient['patient_type'],
+                'id': patient['patient_id'],
+                'name': patient['patient_name'],
+                'registry': patient['patient_key'] if parameter == 'registry' else None,
+                'detail': patient['patient_detail'],
+                'url': f"{reverse(url_name)}?{urlencode({parameter: patient['patient_key']})}",
+            })
+    else:
+        logger.info("No query provided, returning empty results.")
+        data = []
+
+    logger.info("Returning search results.")
+    logger.info("Dados enviados para a interface do usuário.")
+    return JsonResponse({'results': data}, status=200)
@@ -0,0 +1,187 @@
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+from urllib.parse import quote
+from django.conf import settings
+from django.utils import timezone
+from controller.crud import get_analytics_queryset
+
+logger = logging.getLogger('reports.analytics')
+
+'''
+    Columnar (Parquet) export of the unified appointment dataset, for analysis in notebooks.
+
+    export_analytics_dataset reads the appointments through a server-side cursor in batches and
+    writes one Parquet file per (year, infirmary) partition, in the hive layout understood by
+    pyarrow.dataset, pandas and DuckDB:
+
+        <ANALYTICS_EXPORT_DIR>/year=2026/infirmary=Infantil/part-0.parquet
+
+    Low-cardinality text columns are dictionary-encoded. The dataset is written to a temporary
+    directory and swapped in when complete, so readers and the download endpoint never see a
+    partial export. The endpoint only serves these files: it does not query the database.
+'''
+
+# Rows per server-side cursor round trip and per Parquet record batch
+ANALYTICS_BATCH_SIZE = 10000
+
+# Leading underscore: dataset readers (pyarrow, pandas, DuckDB) skip the file
+MANIFEST_NAME = '_manifest.json'
+
+
+def analytics_schema():
+    import pyarrow as pa
+
+    category = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ('patient_type', category),
+        ('id', pa.int32()),
+        ('date', pa.timestamp('us', tz=settings.TIME_ZONE)),
+        ('nurse', category),
+        ('reason', pa.string()),
+        ('treatment', pa.string()),
+        ('notes', pa.string()),
+        ('revaluation', pa.bool_()),
+        ('contact_parents', pa.bool_()),
+        ('current_class', category),
+        ('patient_id', pa.string()),
+        ('patient_name', pa.string()),
+        ('age', pa.int32()),
+        ('gender', category),
+        ('class_group', category),
+        ('segment', category),
+        ('department', category),
+        ('relationship', category),
+    ])
+
+
+# Dataset column -> key of the analytics query row
+COLUMN_SOURCES = {
+    'patient_type': 'patient_label', 'contact_parents': 'parents_contacted', 'current_class': 'class_at_visit',
+}
+
+
+def partition_path(year, infirmary):
+    """
+    Returns the relative directory of a partition, with the infirmary percent-encoded as in
+    pyarrow's hive partitioning (e.g. year=2026/infirmary=Ensino%20M%C3%A9dio).
+    """
+    return f"year={year}/infirmary={quote(infirmary, safe='')}"
+
+
+class _PartitionWriter:
+    """
+    Accumulates the rows of one partition and writes them as record batches of one Parquet file.
+    """
+
+    def __init__(self, directory, schema, batch_size):
+        import pyarrow.parquet as pq
+
+        directory.mkdir(parents=True, exist_ok=True)
+        self.path = directory / 'part-0.parquet'
+        self.schema = schema
+        self.batch_size = batch_size
+        self.columns = {name: [] for name in schema.names}
+        self.rows = 0
+        self._writer = pq.ParquetWriter(self.path, schema, compression='zstd', use_dictionary=True)
+
+    def add(self, row):
+        for name, values in self.columns.items():
+            values.append(row[COLUMN_SOURCES.get(name, name)])
+        if len(self.columns['id']) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        import pyarrow as pa
+
+        count = len(self.columns['id'])
+        if count:
+            self._writer.write_batch(pa.RecordBatch.from_pydict(self.columns, schema=self.schema))
+            self.rows += count
+            for values in self.columns.values():
+                values.clear()
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+
+
+def export_analytics_dataset(directory, since=None, batch_size=ANALYTICS_BATCH_SIZE):
+    """
+    Writes the unified appointment dataset as Parquet files partitioned by year and infirmary.
+    Args:
+        directory (str or Path): The dataset directory. Its previous content is replaced.
+        since (date, optional): Only export the appointments from this date on.
+        batch_size (int, optional): Rows per database round trip and per record batch.
+    Returns:
+        dict: The manifest of the export (generated_at, rows and the partitions with their
+              year, infirmary, path, rows and bytes), also saved as _manifest.json.
+    Raises:
+        ImportError: If pyarrow is not installed.
+    """
+    logger.info("Iniciando export_analytics_dataset")
+    schema = analytics_schema()
+    directory = Path(directory)
+    staging = directory.with_name(directory.name + '.tmp')
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+
+    partitions = []
+    writer = None
+    current = None
+    try:
+        for row in get_analytics_queryset(since).iterator(chunk_size=batch_size):
+            key = (row['year'], row['infirmary'])
+            if key != current:
+                if writer is not None:
+                    writer.close()
+                    partitions.append((current, writer))
+                current = key
+                writer = _PartitionWriter(staging / partition_path(*key), schema, batch_size)
+            writer.add(row)
+        if writer is not None:
+            writer.close()
+            partitions.append((current, writer))
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    manifest = {
+        'generated_at': timezone.now().isoformat(),
+        'since': since.isoformat() if since else None,
+        'rows': sum(writer.rows for _, writer in partitions),
+        'partitions': [
+            {
+                'year': year,
+                'infirmary': infirmary,
+                'path': f'{partition_path(year, infirmary)}/{writer.path.name}',
+                'rows': writer.rows,
+                'bytes': writer.path.stat().st_size,
+            }
+            for (year, infirmary), writer in partitions
+        ],
+    }
+    (staging / MANIFEST_NAME).write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding='utf-8')
+
+    # Troca o diretório inteiro de uma vez: quem lê nunca vê uma exportação pela metade
+    previous = directory.with_name(directory.name + '.old')
+    shutil.rmtree(previous, ignore_errors=True)
+    if directory.exists():
+        os.replace(directory, previous)
+    os.replace(staging, directory)
+    shutil.rmtree(previous, ignore_errors=True)
+
+    logger.info("%s appointments exported in %s partitions to %s.", manifest['rows'], len(partitions), directory)
+    return manifest
+
+
+def read_manifest(directory):
+    """
+    Returns the manifest of the last export, or None if the dataset was never exported.
+    """
+    try:
+        return json.loads((Path(directory) / MANIFEST_NAME).read_text(encoding='utf-8'))
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,218 @@
+import csv
+import io
+import re
+import zipfile
+from datetime import datetime
+from xml.sax.saxutils import escape
+from django.utils import timezone
+
+'''
+    Streaming export of the reports module (CSV and XLSX).
+
+    Rows are read from a server-side cursor in chunks of EXPORT_CHUNK_SIZE and encoded as they
+    arrive; the response body is yielded in blocks of about EXPORT_BUFFER_SIZE bytes, so memory
+    does not grow with the size of the period being exported.
+'''
+
+# Rows fetched per round trip of the server-side cursor
+EXPORT_CHUNK_SIZE = 2000
+
+# Bytes accumulated before a block of the response is yielded
+EXPORT_BUFFER_SIZE = 64 * 1024
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def yes_no(value):
+    return 'Sim' if value else 'Não'
+
+
+# Same columns as report_results_partial.html
+EXPORT_COLUMNS = (
+    ('Data', lambda row: row['date']),
+    ('Nome', lambda row: row['name']),
+    ('Turma/Departamento', lambda row: row['additional_info']),
+    ('Aula Atual', lambda row: row['current_class']),
+    ('Idade', lambda row: row['age']),
+    ('Gênero', lambda row: row['gender']),
+    ('Motivo', lambda row: row['reason']),
+    ('Tratamento', lambda row: row['treatment']),
+    ('Observações', lambda row: row['notes']),
+    ('Reavaliação', lambda row: yes_no(row['revaluation'])),
+    ('Contato com Pais', lambda row: yes_no(row['contact_parents'])),
+    ('Enfermaria', lambda row: row['infirmary']),
+    ('Enfermeira', lambda row: row['nurse']),
+    ('Paciente', lambda row: row['type']),
+)
+
+
+def export_filename(filters, export_format):
+    """
+    Returns the name of the exported file, e.g. atendimentos_2024-01-01_2024-12-31.csv.
+    """
+    return (f"atendimentos_{filters['date_begin']:%Y-%m-%d}_{filters['date_end']:%Y-%m-%d}"
+            f".{export_format}")
+
+
+def iter_report_csv(rows):
+    """
+    Encodes the report rows as CSV (semicolon-separated, as expected by Excel in pt-BR).
+    Args:
+        rows (iterable): The report rows (see get_report_appointments).
+    Yields:
+        bytes: Blocks of the UTF-8 file, starting with a BOM so Excel detects the encoding.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';')
+    buffer.write('\ufeff')
+    writer.writerow([header for header, _ in EXPORT_COLUMNS])
+    for row in rows:
+        values = [value(row) for _, value in EXPORT_COLUMNS]
+        values[0] = timezone.localtime(values[0]).strftime('%d/%m/%Y %H:%M')
+        writer.writerow(['' if value is None else value for value in values])
+        if buffer.tell() >= EXPORT_BUFFER_SIZE:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+class _DrainableStream(io.RawIOBase):
+    """
+    Write-only, unseekable file whose content is taken out with drain().
+    zipfile writes to it with data descriptors, so nothing has to be rewound.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.pending = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        self.pending += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        self.pending = 0
+        return data
+
+
+# Characters not allowed in XML 1.0 documents
+_INVALID_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_EXCEL_EPOCH = datetime(1899, 12, 30)
+
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Atendimentos" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+        'Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    # Style 1: date and time (dd/mm/yyyy hh:mm)
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<numFmts count="1"><numFmt numFmtId="164" formatCode="dd/mm/yyyy hh:mm"/></numFmts>'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="1"><fill><patternFill patternType="none"/></fill></fills>'
+        '<borders count="1"><border/></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+        '</styleSheet>'
+    ),
+}
+
+
+def _xlsx_cell(value):
+    if value is None or value == '':
+        return '<c/>'
+    if isinstance(value, datetime):
+        serial = (timezone.localtime(value).replace(tzinfo=None) - _EXCEL_EPOCH).total_seconds() / 86400
+        return f'<c s="1"><v>{serial:.10f}</v></c>'
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c><v>{value}</v></c>'
+    text = escape(_INVALID_XML.sub('', str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return '<row>' + ''.join(_xlsx_cell(value) for value in values) + '</row>'
+
+
+def iter_report_xlsx(rows):
+    """
+    Encodes the report rows as an XLSX workbook with a single sheet.
+    The sheet is written with inline strings into a ZIP entry that is compressed and yielded
+    while the rows arrive (the ZIP sizes go in data descriptors after each entry).
+    Args:
+        rows (iterable): The report rows (see get_report_appointments).
+    Yields:
+        bytes: Blocks of the XLSX file.
+    """
+    stream = _DrainableStream()
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_DEFLATED) as workbook:
+        for name, content in _XLSX_PARTS.items():
+            workbook.writestr(name, content)
+
+        with workbook.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write(
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                '<sheetData>'.encode('utf-8')
+            )
+            sheet.write(_xlsx_row([header for header, _ in EXPORT_COLUMNS]).encode('utf-8'))
+            for row in rows:
+                sheet.write(_xlsx_row([value(row) for _, value in EXPORT_COLUMNS]).encode('utf-8'))
+                if stream.pending >= EXPORT_BUFFER_SIZE:
+                    yield stream.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield stream.drain()
@@ -1,3 +1,188 @@
-from django.test import TestCase
+import csv
+import io
+import shutil
+import tempfile
+import zipfile
+from datetime import date, datetime
+from pathlib import Path
+from unittest import mock
+from xml.etree import ElementTree
+import pyarrow.dataset
+import pyarrow.parquet
+import pyarrow.types
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, Client, override_settings
+from django.utils import timezone
+from patients.models import Student, Employee, Visitor, ClassGroup, Department
+from appointments.models import StudentAppointment, EmployeeAppointment, VisitorAppointment
+from reports import export
+from reports.analytics import export_analytics_dataset, read_manifest
 
-# Create your tests here.
+SHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+
+
+class TestReportExport(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='nurse', password='secret')
+        self.client.force_login(self.user)
+        student = Student.objects.create(id='S1', name='João Souza', age=10, gender='Male', registry='S1')
+        visitor = Visitor.objects.create(
+            name='Paul Brown', age=35, gender='Male', email='paul@example.com', relationship='Parente',
+        )
+        common = {'nurse': 'Ana', 'treatment': 'Repouso'}
+        StudentAppointment.objects.create(
+            student=student, infirmary='Infantil', current_class='Matemática', contact_parents=True,
+            reason='Dor de cabeça; febre', date=timezone.make_aware(datetime(2026, 3, 10, 9, 30)), **common,
+        )
+        VisitorAppointment.objects.create(
+            visitor=visitor, infirmary='Fundamental', reason='Tontura <leve> & "súbita"',
+            date=timezone.make_aware(datetime(2026, 3, 11, 14, 0)), **common,
+        )
+        self.filters = {
+            'date_begin': '2026-03-01', 'date_end': '2026-03-31',
+            'infirmaries': ['Infantil', 'Fundamental'], 'search_term': '',
+        }
+
+    def export(self, export_format, **filters):
+        return self.client.post('/reports/search_reports/', {**self.filters, **filters, 'export': export_format})
+
+    def test_csv_export(self):
+        response = self.export('csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('atendimentos_2026-03-01_2026-03-31.csv', response['Content-Disposition'])
+
+        content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertTrue(content.startswith('\ufeff'))
+        rows = list(csv.reader(io.StringIO(content.lstrip('\ufeff')), delimiter=';'))
+        self.assertEqual(rows[0][:2], ['Data', 'Nome'])
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[1][0], '11/03/2026 14:00')
+        self.assertEqual(rows[1][6], 'Tontura <leve> & "súbita"')
+        self.assertEqual(rows[2][:4], ['10/03/2026 09:30', 'João Souza', '', 'Matemática'])
+        self.assertEqual(rows[2][10], 'Sim')
+
+    def test_csv_export_applies_filters(self):
+        content = b''.join(self.export('csv', infirmaries=['Infantil']).streaming_content).decode('utf-8')
+        self.assertEqual(len(content.strip().splitlines()), 2)
+        self.assertIn('João Souza', content)
+
+    def test_xlsx_export(self):
+        response = self.export('xlsx')
+        self.assertEqual(response['Content-Type'], export.EXPORT_FORMATS['xlsx'])
+
+        workbook = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(workbook.testzip())
+        sheet = ElementTree.fromstring(workbook.read('xl/worksheets/sheet1.xml'))
+        rows = sheet.findall(f'{SHEET_NS}sheetData/{SHEET_NS}row')
+        self.assertEqual(len(rows), 3)
+        cells = rows[1].findall(f'{SHEET_NS}c')
+        # 11/03/2026 14:00 as an Excel serial date
+        self.assertEqual(cells[0].get('s'), '1')
+        self.assertAlmostEqual(float(cells[0].find(f'{SHEET_NS}v').text), 46092 + 14 / 24, places=6)
+        self.assertEqual(cells[4].find(f'{SHEET_NS}v').text, '35')
+        self.assertEqual(''.join(cells[6].itertext()), 'Tontura <leve> & "súbita"')
+
+    def test_export_streams_in_blocks(self):
+        with mock.patch.object(export, 'EXPORT_BUFFER_SIZE', 1):
+            blocks = list(self.export('csv').streaming_content)
+        # Header and first row, then the second row
+        self.assertEqual(len(blocks), 2)
+        self.assertEqual(b''.join(blocks), b''.join(self.export('csv').streaming_content))
+
+    def test_export_reads_rows_in_chunks(self):
+        with mock.patch('reports.views.EXPORT_CHUNK_SIZE', 1), \
+                mock.patch('controller.crud.ReportAppointments.iterator',
+                           autospec=True, side_effect=lambda self, chunk_size: iter([])) as iterator:
+            b''.join(self.export('csv').streaming_content)
+        self.assertEqual(iterator.call_args.kwargs, {'chunk_size': 1})
+
+    def test_invalid_export_format(self):
+        self.assertEqual(self.export('pdf').status_code, 400)
+
+
+class TestAnalyticsExport(TestCase):
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp()) / 'analytics'
+        self.addCleanup(shutil.rmtree, self.directory.parent)
+        class_group = ClassGroup.objects.create(id='CG1', name='1A', segment='Fundamental', director='Director 1')
+        department = Department.objects.create(id='D1', name='TI', director='Director 2')
+        student = Student.objects.create(id='S1', name='João Souza', age=10, gender='Male', registry='S1',
+                                         class_group=class_group)
+        employee = Employee.objects.create(id='E1', name='Ana Lima', age=30, gender='Female', registry='E1',
+                                           department=department)
+        visitor = Visitor.objects.create(
+            name='Paul Brown', age=35, gender='Male', email='paul@example.com', relationship='Parente',
+        )
+        common = {'nurse': 'Ana', 'reason': 'Febre', 'treatment': 'Repouso'}
+
+        def local(*args):
+            return timezone.make_aware(datetime(*args))
+
+        for day in (1, 2, 3):
+            StudentAppointment.objects.create(student=student, infirmary='Ensino Médio', current_class='Física',
+                                              date=local(2026, 3, day, 9, 0), **common)
+        EmployeeAppointment.objects.create(employee=employee, infirmary='Ensino Médio',
+                                           date=local(2026, 3, 4, 10, 0), **common)
+        VisitorAppointment.objects.create(visitor=visitor, infirmary='Infantil', date=local(2025, 12, 31, 23, 0),
+                                          **common)
+
+    def read_dataset(self):
+        return pyarrow.dataset.dataset(self.directory, format='parquet', partitioning='hive').to_table()
+
+    def test_export_partitions_by_year_and_infirmary(self):
+        out = io.StringIO()
+        call_command('export_analytics', output=str(self.directory), batch_size=2, stdout=out)
+        self.assertIn('5 atendimentos em 2 partições', out.getvalue())
+
+        manifest = read_manifest(self.directory)
+        self.assertEqual(
+            [(p['year'], p['infirmary'], p['rows'], p['path']) for p in manifest['partitions']],
+            [(2025, 'Infantil', 1, 'year=2025/infirmary=Infantil/part-0.parquet'),
+             (2026, 'Ensino Médio', 4, 'year=2026/infirmary=Ensino%20M%C3%A9dio/part-0.parquet')],
+        )
+
+        table = self.read_dataset().sort_by([('date', 'ascending')])
+        self.assertEqual(table.num_rows, 5)
+        self.assertEqual(table.column('infirmary').unique().to_pylist(), ['Infantil', 'Ensino Médio'])
+        self.assertTrue(pyarrow.types.is_dictionary(table.schema.field('nurse').type))
+        rows = table.to_pylist()
+        self.assertEqual(rows[0]['relationship'], 'Parente')
+        self.assertEqual((rows[1]['class_group'], rows[1]['segment'], rows[1]['current_class']),
+                         ('1A', 'Fundamental', 'Física'))
+        self.assertEqual((rows[4]['department'], rows[4]['contact_parents']), ('TI', None))
+
+    def test_export_replaces_previous_dataset(self):
+        export_analytics_dataset(self.directory)
+        manifest = export_analytics_dataset(self.directory, since=date(2026, 1, 1))
+        self.assertEqual(manifest['rows'], 4)
+        self.assertEqual(self.read_dataset().num_rows, 4)
+        self.assertFalse(self.directory.with_name('analytics.tmp').exists())
+        self.assertFalse((self.directory / 'year=2025').exists())
+
+    def test_download_endpoints(self):
+        client = Client()
+        with override_settings(ANALYTICS_EXPORT_DIR=self.directory):
+            self.assertEqual(client.get('/reports/analytics/').status_code, 302)
+            client.force_login(User.objects.create_user(username='nurse', password='secret'))
+            self.assertEqual(client.get('/reports/analytics/').status_code, 404)
+
+            export_analytics_dataset(self.directory)
+            with self.assertNumQueries(2):
+                # Session and user only: the manifest comes from the export
+                manifest = client.get('/reports/analytics/').json()
+            self.assertEqual(manifest['rows'], 5)
+            url = manifest['partitions'][0]['url']
+            self.assertTrue(url.endswith('/reports/analytics/year=2025/infirmary=Infantil/part-0.parquet'))
+
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            table = pyarrow.parquet.read_table(io.BytesIO(b''.join(response.streaming_content)))
+            self.assertEqual(table.num_rows, 1)
+
+            self.assertEqual(client.get('/reports/analytics/_manifest.json').status_code, 404)
+            self.assertEqual(client.get('/reports/analytics/../../setup/settings.py').status_code, 404)
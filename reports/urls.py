@@ -11,6 +11,9 @@ urlpatterns = [
     path('records/employee/search/', employee_search, name='employee_search_record'),
 
     path('search_reports/', reports, name='search_reports'),
+    path('api/appointments/', reports_api, name='reports_api'),
+    path('analytics/', analytics_manifest, name='analytics_manifest'),
+    path('analytics/<path:path>', analytics_file, name='analytics_file'),
 
 
 
@@ -1,6 +1,7 @@
 import logging
+from django.conf import settings
 from django.shortcuts import render
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse, FileResponse, Http404
 from django.contrib import messages
 from django.core.paginator import Paginator 
 from django.template.loader import render_to_string
@@ -9,10 +10,16 @@ from django.utils import timezone
 from datetime import datetime, time
 from patients.views import search_student, search_employee
 from appointments.models import *
-from controller.crud import get_appointment, get_all_appointments
+from controller.crud import (get_appointment, get_report_appointments, get_report_keyset_page,
+                             REPORT_PAGE_SIZE)
+from .export import (iter_report_csv, iter_report_xlsx, export_filename, EXPORT_FORMATS,
+                     EXPORT_CHUNK_SIZE)
+from .analytics import read_manifest
 
 logger = logging.getLogger('reports.views')
 
+REPORT_API_MAX_PAGE_SIZE = 500
+
 def student_search(request):
     """
     Handles the student search functionality.
@@ -68,9 +75,8 @@ def student_record(request):
         # Obtém os dados dos atendimentos do paciente
         appointment = get_appointment(StudentAppointment, identifier_field, patient_id=student['id'])
 
-        logger.debug(f'Appointments found: {appointment}')
-
         list_appointments = list(appointment)
+        logger.debug('%s appointments found', len(list_appointments))
         list_appointments.sort(key=lambda x: x['date'], reverse=True)
 
         logger.info('Dados enviados para a interface do usuário.')
@@ -137,14 +143,57 @@ def employee_record(request):
         # Obtém os dados dos atendimentos do paciente
         appointment = get_appointment(EmployeeAppointment, identifier_field, patient_id=employee['id'])
 
-        logger.debug(f'Appointments found: {appointment}')
-
         list_appointments = list(appointment)
+        logger.debug('%s appointments found', len(list_appointments))
         list_appointments.sort(key=lambda x: x['date'], reverse=True)
 
         logger.info('Dados enviados para a interface do usuário.')
         return render(request, 'employee_record.html', {'employee': employee, 'appointment': list_appointments})
 
+def parse_report_filters(data):
+    """
+    Validates and converts the filters of the reports module.
+    Args:
+        data (QueryDict): The POST or GET parameters with date_begin, date_end, infirmaries and search_term.
+    Returns:
+        tuple: A (filters, errors) pair. filters is a dictionary with the date_begin, date_end, infirmaries
+               and search_term arguments of the report functions, or None when errors is not empty.
+    """
+    date_begin = data.get('date_begin')
+    date_end = data.get('date_end')
+    infirmaries = data.getlist('infirmaries')
+    search_term = data.get('search_term', '').strip()
+
+    logger.debug('info: %s, %s, %s, %s', date_begin, date_end, infirmaries, search_term)
+
+    # Validações
+    errors = []
+    if not date_begin:
+        errors.append("Por favor, preencha a data de início.")
+    if not date_end:
+        errors.append("Por favor, preencha a data de fim.")
+    if not infirmaries:
+        errors.append("Por favor, selecione pelo menos uma enfermaria.")
+    if errors:
+        return None, errors
+
+    # Conversão das datas
+    try:
+        date_begin = datetime.strptime(date_begin, '%Y-%m-%d')
+        date_end = datetime.strptime(date_end, '%Y-%m-%d')
+        date_end = datetime.combine(date_end.date(), time.max)  # Define a hora para 23:59:59.999999
+    except ValueError as e:
+        logger.error('Date parsing error: %s', e, exc_info=True)
+        return None, ['Data inválida.']
+
+    filters = {
+        'date_begin': date_begin,
+        'date_end': date_end,
+        'infirmaries': infirmaries,
+        'search_term': search_term,
+    }
+    return filters, []
+
 @login_required
 def reports(request):
     """
@@ -159,8 +208,12 @@ def reports(request):
     - If there are validation errors, returns a JSON response with errors for AJAX requests,
       or renders the 'reports.html' template with error messages for non-AJAX requests.
     - Converts date strings to datetime objects and handles any parsing errors.
-    - Retrieves all appointments based on the form data.
-    - Implements pagination for the retrieved appointments.
+    - Builds the report query on the unified appointment table based on the form data.
+    - With export=csv or export=xlsx, streams every matching row as a file download instead of
+      rendering a page (see export_report).
+    - Implements pagination in the database, fetching only the rows of the requested page.
+      With pagination=keyset, pages are addressed by a (date, type, id) cursor token instead of
+      a page number, and the total is only counted when with_count is sent.
     - Renders the appropriate template based on whether the request is an AJAX request or not.
     Args:
         request (HttpRequest): The HTTP request object.
@@ -177,24 +230,10 @@ def reports(request):
         logger.info('Requisição POST recebida')
         logger.debug('POST request received')
 
-        date_begin = request.POST.get('date_begin')
-        date_end = request.POST.get('date_end')
-        infirmaries = request.POST.getlist('infirmaries')
-        search_term = request.POST.get('search_term', '').strip()
-
-        logger.debug(f'info: {date_begin}, {date_end}, {infirmaries}, {search_term}')
-
-        # Validações
-        errors = []
-        if not date_begin:
-            errors.append("Por favor, preencha a data de início.")
-        if not date_end:
-            errors.append("Por favor, preencha a data de fim.")
-        if not infirmaries:
-            errors.append("Por favor, selecione pelo menos uma enfermaria.")
+        filters, errors = parse_report_filters(request.POST)
 
         if errors:
-            logger.error(f'Errors in form submission: {errors}')
+            logger.error('Errors in form submission: %s', errors)
             if request.headers.get('x-requested-with') == 'XMLHttpRequest':
                 logger.info('Dados enviados para a interface do usuário.')
                 return JsonResponse({'errors': errors}, status=400)
@@ -204,39 +243,49 @@ def reports(request):
                 logger.info('Dados enviados para a interface do usuário.')
                 return render(request, 'reports.html')
 
-        # Conversão das datas
-        try:
-            date_begin = datetime.strptime(date_begin, '%Y-%m-%d')
-            date_end = datetime.strptime(date_end, '%Y-%m-%d')
-            date_end = datetime.combine(date_end.date(), time.max)  # Define a hora para 23:59:59.999999
-        except ValueError as e:
-            logger.error(f'Date parsing error: {e}', exc_info=True)
-            logger.info('Dados enviados para a interface do usuário.')
-            return JsonResponse({'errors': ['Data inválida.']}, status=400)
+        export_format = request.POST.get('export')
+        if export_format:
+            return export_report(filters, export_format)
 
-        # Número de resultados por página
-        RESULTS_PER_PAGE = 100 
+        context = {
+            'date_begin': filters['date_begin'],
+            'date_end': filters['date_end'],
+            'search_term': filters['search_term'],
+        }
 
-        # Obtenção dos atendimentos
-        all_appointments = get_all_appointments(date_begin, date_end, infirmaries, search_term)
-        logger.debug(f'All appointments retrieved: {all_appointments}')
+        if request.POST.get('pagination') == 'keyset':
+            # Paginação por cursor (date, type, id; com busca, a relevância vem antes): cada página custa
+            # o mesmo que a primeira
+            try:
+                keyset = get_report_keyset_page(
+                    **filters,
+                    cursor=request.POST.get('cursor') or None,
+                    direction=request.POST.get('direction', 'next'),
+                    with_count=bool(request.POST.get('with_count')),
+                )
+            except ValueError as e:
+                logger.error('Invalid cursor: %s', e)
+                logger.info('Dados enviados para a interface do usuário.')
+                return JsonResponse({'errors': ['Página inválida.']}, status=400)
 
-        # Implementação da paginação
-        paginator = Paginator(all_appointments, RESULTS_PER_PAGE)
+            context['keyset'] = keyset
+            context['appointments'] = keyset['results']
+        else:
+            # Obtenção dos atendimentos (consulta única paginada no banco de dados)
+            all_appointments = get_report_appointments(**filters)
 
-        # Obtenha o número da página atual
-        page_number = request.POST.get('page') or 1
+            # Implementação da paginação
+            paginator = Paginator(all_appointments, REPORT_PAGE_SIZE)
 
-        # Obtenha a página desejada
-        page_obj = paginator.get_page(page_number)
+            # Obtenha o número da página atual
+            page_number = request.POST.get('page') or 1
 
-        context = {
-            'page_obj': page_obj,
-            'date_begin': date_begin,
-            'date_end': date_end,
-            'paginator': paginator,
-            'search_term': search_term,
-        }
+            # Obtenha a página desejada
+            page_obj = paginator.get_page(page_number)
+
+            context['page_obj'] = page_obj
+            context['paginator'] = paginator
+            context['appointments'] = page_obj.object_list
 
         if request.headers.get('x-requested-with') == 'XMLHttpRequest':
             # Renderiza o template parcial e retorna como HTML
@@ -247,6 +296,121 @@ def reports(request):
             logger.info('Dados enviados para a interface do usuário.')
             return render(request, 'report_results.html', context)
     else:
-        logger.error(f'Request method {request.method} not allowed')
+        logger.error('Request method %s not allowed', request.method)
         logger.info('Dados enviados para a interface do usuário.')
         return render(request, 'reports.html')
+
+
+def export_report(filters, export_format):
+    """
+    Streams every appointment matching the report filters as a CSV or XLSX download.
+    The rows are read through a server-side cursor, EXPORT_CHUNK_SIZE at a time, and encoded
+    while they are sent, so the memory used does not depend on the period exported.
+    Args:
+        filters (dict): The report filters, as returned by parse_report_filters.
+        export_format (str): 'csv' or 'xlsx'.
+    Returns:
+        StreamingHttpResponse: The file download, or a JsonResponse with status 400 for an unknown format.
+    """
+    logger.info('Iniciando export_report (%s)', export_format)
+    if export_format not in EXPORT_FORMATS:
+        logger.error('Invalid export format: %s', export_format)
+        return JsonResponse({'errors': ['Formato de exportação inválido.']}, status=400)
+
+    rows = get_report_appointments(**filters).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    encode = iter_report_csv if export_format == 'csv' else iter_report_xlsx
+    response = StreamingHttpResponse(encode(rows), content_type=EXPORT_FORMATS[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(filters, export_format)}"'
+    logger.info('Dados enviados para a interface do usuário.')
+    return response
+
+
+@login_required
+def reports_api(request):
+    """
+    JSON endpoint of the reports module for API consumers, paginated by cursor.
+    Accepts the same filters as the reports view as GET parameters, plus:
+    - cursor: The next_cursor or previous_cursor token of a previous response.
+    - direction: 'next' (default) or 'previous'.
+    - page_size: The number of rows per page, up to REPORT_API_MAX_PAGE_SIZE.
+    - with_count: Any non-empty value to include the total number of rows.
+    Args:
+        request (HttpRequest): The HTTP request object.
+    Returns:
+        JsonResponse: The page (results, next_cursor, previous_cursor, count) or the validation errors.
+    """
+    logger.info('Iniciando reports_api')
+    if request.method != 'GET':
+        logger.error('Request method %s not allowed', request.method)
+        return JsonResponse({'errors': ['Método não permitido']}, status=405)
+
+    filters, errors = parse_report_filters(request.GET)
+    if errors:
+        logger.error('Errors in API request: %s', errors)
+        return JsonResponse({'errors': errors}, status=400)
+
+    try:
+        page_size = min(int(request.GET.get('page_size', REPORT_PAGE_SIZE)), REPORT_API_MAX_PAGE_SIZE)
+        if page_size < 1:
+            raise ValueError(page_size)
+        page = get_report_keyset_page(
+            **filters,
+            cursor=request.GET.get('cursor') or None,
+            direction=request.GET.get('direction', 'next'),
+            page_size=page_size,
+            with_count=bool(request.GET.get('with_count')),
+        )
+    except ValueError as e:
+        logger.error('Invalid pagination parameters: %s', e)
+        return JsonResponse({'errors': ['Parâmetros de paginação inválidos.']}, status=400)
+
+    logger.info('Dados enviados para a interface do usuário.')
+    return JsonResponse(page, json_dumps_params={'ensure_ascii': False})
+
+
+@login_required
+def analytics_manifest(request):
+    """
+    Lists the Parquet files of the last analytics export (see the export_analytics command).
+    Only the manifest written by the export is read: the database is not queried.
+    Args:
+        request (HttpRequest): The HTTP request object.
+    Returns:
+        JsonResponse: The manifest (generated_at, rows and partitions, each with its download url),
+                      or status 404 if the dataset was never exported.
+    """
+    logger.info('Iniciando analytics_manifest')
+    manifest = read_manifest(settings.ANALYTICS_EXPORT_DIR)
+    if manifest is None:
+        logger.error('Analytics dataset not exported')
+        return JsonResponse({'errors': ['Nenhuma exportação disponível.']}, status=404)
+
+    for partition in manifest['partitions']:
+        partition['url'] = request.build_absolute_uri(f"{request.path}{partition['path']}")
+    logger.info('Dados enviados para a interface do usuário.')
+    return JsonResponse(manifest, json_dumps_params={'ensure_ascii': False})
+
+
+@login_required
+def analytics_file(request, path):
+    """
+    Downloads one Parquet file of the last analytics export.
+    Args:
+        request (HttpRequest): The HTTP request object.
+        path (str): The path of the file in the dataset, as listed by the manifest.
+    Returns:
+        FileResponse: The Parquet file.
+    Raises:
+        Http404: If the path is not a Parquet file of the dataset.
+    """
+    logger.info('Iniciando analytics_file')
+    directory = settings.ANALYTICS_EXPORT_DIR.resolve()
+    file_path = (directory / path).resolve()
+    if file_path.suffix != '.parquet' or not file_path.is_relative_to(directory) or not file_path.is_file():
+        logger.error('Analytics file not found: %s', path)
+        raise Http404('Arquivo não encontrado')
+
+    logger.info('Dados enviados para a interface do usuário.')
+    filename = '_'.join(file_path.relative_to(directory).parts)
+    return FileResponse(open(file_path, 'rb'), as_attachment=True, filename=filename,
+                        content_type='application/vnd.apache.parquet')
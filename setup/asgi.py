@@ -12,5 +12,13 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'setup.settings')
+# Persistent connections are per thread, and under ASGI the sync code of a request does not
+# always run on the same thread: unless configured, open one connection per request
+# (see DB_CONN_MAX_AGE in setup/settings.py).
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
+
+from controller.name_index import warm_name_indexes  # noqa: E402 - needs the apps loaded
+
+warm_name_indexes()
@@ -0,0 +1,213 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+
+try:
+    import fcntl
+except ImportError:  # Windows: no lock between processes
+    fcntl = None
+
+'''
+    Non-blocking log files (used by LOGGING in setup/settings.py).
+
+    The request threads only put their records on a queue; a single background thread per
+    process takes them off and writes each one to the file of the handler that queued it, so a
+    slow disk or a large message never holds up a response. The message is rendered (args
+    merged, traceback appended) before it is queued, on the thread that logged it, because the
+    args may be querysets or model instances that must not be touched from another thread; the
+    file formatter and the write run in the background.
+
+    Each file rotates at midnight and whenever it reaches max_bytes, keeping backup_count
+    rotated files (views.log.2026-03-10, views.log.2026-03-10.1, ...).
+
+    The worker processes of a server share the log files: each write and rotation happens under
+    an exclusive lock on <file>.lock, and a process whose file was rotated by another one
+    reopens the new file instead of rotating it again. The lock needs fcntl, so on Windows only
+    one process may write each log directory. Processes forked after logging is configured
+    (e.g. gunicorn --preload) start their own background thread.
+
+    The queue holds at most QUEUE_SIZE records: when the writer falls that far behind, new
+    records are dropped and counted (dropped_records) instead of growing the memory of the
+    process. A record that cannot be written (e.g. the log directory was removed) is reported
+    by logging's handleError and the writer goes on with the next one.
+'''
+
+QUEUE_SIZE = 10000
+
+_queue = queue.Queue(QUEUE_SIZE)
+_dropped = 0
+_dropped_lock = threading.Lock()
+_listener = None
+_listener_lock = threading.Lock()
+_targets = []
+_handlers = []
+
+
+class SizedTimedRotatingFileHandler(TimedRotatingFileHandler):
+    """
+    A TimedRotatingFileHandler that also rotates when the file reaches max_bytes. Files rotated
+    more than once in the same period get a counter after the date.
+    """
+
+    def __init__(self, filename, max_bytes=0, **kwargs):
+        self.max_bytes = max_bytes
+        super().__init__(filename, **kwargs)
+
+    def emit(self, record):
+        try:
+            with self._process_lock():
+                super().emit(record)
+        except Exception:
+            self.handleError(record)
+
+    @contextmanager
+    def _process_lock(self):
+        if fcntl is None:
+            yield
+            return
+        # Opened for each write: a descriptor inherited through fork would share the lock
+        with open(self.baseFilename + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _reopen_if_rotated(self):
+        # Another process renamed the file: write to the new one and take its rotation as ours
+        if self.stream is None:
+            return
+        try:
+            current = os.stat(self.baseFilename)
+        except FileNotFoundError:
+            current = None
+        opened = os.fstat(self.stream.fileno())
+        if current is None or (current.st_dev, current.st_ino) != (opened.st_dev, opened.st_ino):
+            self.stream.close()
+            self.stream = self._open()
+            self.rolloverAt = self.computeRollover(int(time.time()))
+
+    def shouldRollover(self, record):
+        self._reopen_if_rotated()
+        if super().shouldRollover(record):
+            return True
+        if not self.max_bytes:
+            return False
+        if self.stream is None:
+            self.stream = self._open()
+        # Never rotate anything other than a regular file (e.g. /dev/null)
+        if not os.path.isfile(self.baseFilename):
+            return False
+        self.stream.seek(0, os.SEEK_END)
+        return self.stream.tell() + len(self.format(record)) + 1 >= self.max_bytes
+
+    def rotation_filename(self, default_name):
+        name = super().rotation_filename(default_name)
+        counter = 1
+        candidate = name
+        while os.path.exists(candidate):
+            candidate = f'{name}.{counter}'
+            counter += 1
+        return candidate
+
+
+class _Dispatcher(QueueListener):
+    # The queue holds (target handler, record) pairs
+    def handle(self, item):
+        target, record = item
+        if record.levelno >= target.level:
+            try:
+                target.handle(record)
+            except Exception:
+                # The only writer of the process must not stop because of one handler
+                target.handleError(record)
+
+    def enqueue_sentinel(self):
+        # Waits for room in a full queue: the writer is still taking records off it
+        self.queue.put(self._sentinel)
+
+
+def _start_listener():
+    global _listener
+    with _listener_lock:
+        if _listener is None:
+            _listener = _Dispatcher(_queue)
+            _listener.start()
+
+
+def dropped_records():
+    """
+    Returns the number of records dropped by this process because the queue was full.
+    """
+    return _dropped
+
+
+def stop_listener():
+    """
+    Writes the records still queued and closes the log files. Called at exit.
+    """
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+        for target in _targets:
+            target.close()
+
+
+def _restart_listener_in_child():
+    # A forked process inherits the queue and _listener but not the background thread: without
+    # a new one its records would pile up in the queue and never be written
+    global _queue, _listener, _listener_lock, _dropped_lock
+    _queue = queue.Queue(QUEUE_SIZE)
+    _listener_lock = threading.Lock()
+    _dropped_lock = threading.Lock()
+    running = _listener is not None
+    _listener = None
+    for handler in _handlers:
+        handler.queue = _queue
+    if running:
+        _start_listener()
+
+
+atexit.register(stop_listener)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_listener_in_child)
+
+
+class AsyncRotatingFileHandler(QueueHandler):
+    """
+    Queues the records for the background writer, which appends them to filename with a
+    SizedTimedRotatingFileHandler.
+    Args:
+        filename (str): The log file; its directory is created if needed.
+        max_bytes (int, optional): Rotate when the file reaches this size (0: never). Defaults to 10 MB.
+        backup_count (int, optional): Rotated files kept. Defaults to 14.
+        when (str, optional): The time rotation interval, as in TimedRotatingFileHandler. Defaults to 'midnight'.
+    """
+
+    def __init__(self, filename, max_bytes=10 * 1024 * 1024, backup_count=14, when='midnight', encoding='utf-8'):
+        super().__init__(_queue)
+        os.makedirs(os.path.dirname(os.fspath(filename)), exist_ok=True)
+        self.target = SizedTimedRotatingFileHandler(
+            filename, max_bytes=max_bytes, when=when, backupCount=backup_count, encoding=encoding, delay=True,
+        )
+        _targets.append(self.target)
+        _handlers.append(self)
+        _start_listener()
+
+    def setFormatter(self, fmt):
+        # The file formatter runs in the background; the queued message is rendered plainly
+        self.target.setFormatter(fmt)
+
+    def enqueue(self, record):
+        global _dropped
+        try:
+            self.queue.put_nowait((self.target, record))
+        except queue.Full:
+            with _dropped_lock:
+                _dropped += 1
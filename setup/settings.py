@@ -1,4 +1,5 @@
 import os
+import tempfile
 import logging
 from pathlib import Path
 from dotenv import load_dotenv
@@ -55,6 +56,59 @@ ALLOWED_HOSTS = []
 
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 
+# In-process name index for the patient autocomplete (controller/name_index.py).
+# Each worker keeps its own copy and checks updated_at for changes every REFRESH_SECONDS.
+PATIENT_NAME_INDEX_ENABLED = os.getenv('PATIENT_NAME_INDEX_ENABLED', 'False') == 'True'
+PATIENT_NAME_INDEX_REFRESH_SECONDS = int(os.getenv('PATIENT_NAME_INDEX_REFRESH_SECONDS', '30'))
+
+# Cache of the dashboard counters (controller/crud.py), invalidated by the appointment signals.
+# It is a file cache in DASHBOARD_CACHE_DIR, so every worker process of the host sees the
+# invalidations. DASHBOARD_CACHE_LOCAL=True switches to a local-memory cache, which is per
+# process: only for a single-process server.
+DASHBOARD_CACHE_DIR = os.getenv('DASHBOARD_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'enfermaria-cache'))
+DASHBOARD_CACHE_LOCAL = os.getenv('DASHBOARD_CACHE_LOCAL', 'False') == 'True'
+DASHBOARD_CACHE_TIMEOUT = int(os.getenv('DASHBOARD_CACHE_TIMEOUT', '3600'))
+
+# Live dashboard updates over Server-Sent Events (controller/events.py). The stream is an async
+# view: it needs the ASGI application (setup/asgi.py, e.g. uvicorn setup.asgi:application).
+DASHBOARD_LIVE_UPDATES = os.getenv('DASHBOARD_LIVE_UPDATES', 'False') == 'True'
+
+# Request instrumentation (controller/instrumentation.py): every response carries a Server-Timing
+# header with its total, database and template time. Requests slower than SLOW_REQUEST_MS are
+# logged with their SQL to logs/controller/instrumentation.log (unset: no slow-request log).
+SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS')) if os.getenv('SLOW_REQUEST_MS') else None
+
+# Prometheus metrics at /metrics/ (controller/metrics.py). With more than one worker process, set
+# PROMETHEUS_MULTIPROC_DIR to an empty directory shared by the workers and the import_data runs,
+# so the endpoint adds up every process. /metrics/ answers staff users and requests bearing
+# METRICS_TOKEN; without METRICS_TOKEN it is a 404 for everyone else.
+PROMETHEUS_MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+# Database connection reuse. Each worker thread keeps its PostgreSQL connection for
+# DB_CONN_MAX_AGE seconds instead of opening one per request ('None' keeps it indefinitely, 0
+# closes it at the end of every request); with DB_CONN_HEALTH_CHECKS a reused connection is
+# checked first and replaced if the server dropped it. Compare the modes with the
+# benchmark_connections command. The ASGI application defaults to 0 (setup/asgi.py): there a
+# request's sync code may run on a different thread each time, so reuse is better left to a
+# pooler such as PgBouncer (session mode), reached through DB_HOST and DB_PORT.
+DB_CONN_MAX_AGE = None if os.getenv('DB_CONN_MAX_AGE') == 'None' else int(os.getenv('DB_CONN_MAX_AGE', '60'))
+DB_CONN_HEALTH_CHECKS = os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True'
+
+# Parquet dataset of the appointments for analysis (reports/analytics.py), written by the
+# export_analytics command and downloaded from /reports/analytics/.
+ANALYTICS_EXPORT_DIR = Path(os.getenv('ANALYTICS_EXPORT_DIR', BASE_DIR / 'analytics'))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'enfermaria',
+    } if DASHBOARD_CACHE_LOCAL else {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': DASHBOARD_CACHE_DIR,
+    }
+}
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -65,6 +119,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     # Authentication apps
 
@@ -85,6 +140,7 @@ INSTALLED_APPS = [
 SITE_ID = 1
 
 MIDDLEWARE = [
+    'controller.instrumentation.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -100,7 +156,8 @@ ROOT_URLCONF = 'setup.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, timing the renders for RequestTimingMiddleware
+        'BACKEND': 'controller.instrumentation.TimedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -130,26 +187,31 @@ DATABASES = {
         'NAME': 'ENFERMARIA_DB',
         'USER': 'postgres',
         'PASSWORD': os.getenv('DB_PASSWORD'),
-        'HOST': 'localhost',
-        'PORT': '5432',
+        'HOST': os.getenv('DB_HOST', 'localhost'),
+        'PORT': os.getenv('DB_PORT', '5432'),
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
     }
 }
 
-def create_log_dirs():
-    app_dirs = {
-        'patients': ['views', 'models'],
-        'appointments': ['views', 'models'],
-        'controller': ['crud', 'api_totvs'],
+# Logging: the files are written by a background thread (setup/log_handlers.py) and rotate
+# daily and at LOG_MAX_BYTES, keeping LOG_BACKUP_COUNT rotated files each; the worker processes
+# of a server can share LOGS_DIR (the rotation is locked on Linux/macOS). LOG_LEVEL defaults
+# to DEBUG in development and INFO otherwise; debug messages are not even formatted below it.
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG' if DEBUG else 'INFO').upper()
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 14))
+
+
+def log_file_handler(path):
+    return {
+        'level': 'DEBUG',
+        'class': 'setup.log_handlers.AsyncRotatingFileHandler',
+        'filename': LOGS_DIR / path,
+        'max_bytes': LOG_MAX_BYTES,
+        'backup_count': LOG_BACKUP_COUNT,
+        'formatter': 'verbose',
     }
-    
-    for app, modules in app_dirs.items():
-        for module in modules:
-            dir_path = LOGS_DIR / app
-            if not dir_path.exists():
-                os.makedirs(dir_path)
-
-# Crie os diretórios antes de configurar o logging
-create_log_dirs()
 
 
 LOGGING = {
@@ -165,78 +227,67 @@ LOGGING = {
     },
     'handlers': {
         # Handlers app patients
-        'patients_views_file': {
-            'level': 'DEBUG',
-            'class': 'logging.FileHandler',
-            'filename': LOGS_DIR / 'patients' / 'views.log',
-            'formatter': 'verbose',
-        },
-        'patients_models_file': {
-            'level': 'DEBUG',
-            'class': 'logging.FileHandler',
-            'filename': LOGS_DIR / 'patients' / 'models.log',
-            'formatter': 'verbose',
-        },
+        'patients_views_file': log_file_handler('patients/views.log'),
+        'patients_models_file': log_file_handler('patients/models.log'),
         # Handlers app appointments
-        'appointments_views_file': {
-            'level': 'DEBUG',
-            'class': 'logging.FileHandler',
-            'filename': LOGS_DIR / 'appointments' / 'views.log',
-            'formatter': 'verbose',
-        },
-        'appointments_models_file': {
-            'level': 'DEBUG',
-            'class': 'logging.FileHandler',
-            'filename': LOGS_DIR / 'appointments' / 'models.log',
-            'formatter': 'verbose',
-        },
+        'appointments_views_file': log_file_handler('appointments/views.log'),
+        'appointments_models_file': log_file_handler('appointments/models.log'),
         # Handlers app controller
-        'controller_crud_file': {
-            'level': 'DEBUG',
-            'class': 'logging.FileHandler',
-            'filename': LOGS_DIR / 'controller' / 'crud.log',
-            'formatter': 'verbose',
-        },
-        'controller_views_file': {
-            'level': 'DEBUG',
-            'class': 'logging.FileHandler',
-            'filename': LOGS_DIR / 'controller' / 'views.log',
-            'formatter': 'verbose',
-        },
-        'reports_views_file': {
-            'level': 'DEBUG',
-            'class': 'logging.FileHandler',
-            'filename': LOGS_DIR / 'reports' / 'views.log',
-            'formatter': 'verbose',
-        },
+        'controller_crud_file': log_file_handler('controller/crud.log'),
+        'controller_views_file': log_file_handler('controller/views.log'),
+        'controller_events_file': log_file_handler('controller/events.log'),
+        'controller_name_index_file': log_file_handler('controller/name_index.log'),
+        'controller_instrumentation_file': log_file_handler('controller/instrumentation.log'),
+        'reports_analytics_file': log_file_handler('reports/analytics.log'),
+        'reports_views_file': log_file_handler('reports/views.log'),
     },
     'loggers': {
         # Loggers app patients
         'patients.views': {
             'handlers': ['patients_views_file'],
-            'level': 'DEBUG',
+            'level': LOG_LEVEL,
             'propagate': False,
         },
         # Loggers app appointments
         'appointments.views': {
             'handlers': ['appointments_views_file'],
-            'level': 'DEBUG',
+            'level': LOG_LEVEL,
             'propagate': False,
         },
         # Loggers app controller
         'controller.crud': {
             'handlers': ['controller_crud_file'],
-            'level': 'DEBUG',
+            'level': LOG_LEVEL,
             'propagate': False,
         },
         'controller.views': {
             'handlers': ['controller_views_file'],
-            'level': 'DEBUG',
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+        'controller.events': {
+            'handlers': ['controller_events_file'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+        'controller.name_index': {
+            'handlers': ['controller_name_index_file'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+        'controller.instrumentation': {
+            'handlers': ['controller_instrumentation_file'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+        'reports.analytics': {
+            'handlers': ['reports_analytics_file'],
+            'level': LOG_LEVEL,
             'propagate': False,
         },
         'reports.views': {
             'handlers': ['reports_views_file'],
-            'level': 'DEBUG',
+            'level': LOG_LEVEL,
             'propagate': False,
         },
     }
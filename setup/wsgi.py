@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'setup.settings')
 
 application = get_wsgi_application()
+
+from controller.name_index import warm_name_indexes  # noqa: E402 - needs the apps loaded
+
+warm_name_indexes()
@@ -69,6 +69,8 @@ $(function() {
         data: data,
         options: options
       });
+      // Atualizado em tempo real por live-dashboard.js
+      window.barChart = barChart;
     }
 
   
@@ -0,0 +1,112 @@
+$(function() {
+  /* Atualizações ao vivo do dashboard
+   * ---------------------------------
+   * Recebe os deltas de atendimentos (Server-Sent Events) e atualiza os contadores,
+   * a tabela de enfermeiras e o gráfico sem recarregar a página.
+   */
+  'use strict';
+
+  if (!window.EventSource || typeof liveDashboardUrl === 'undefined') {
+    return;
+  }
+
+  function pad(value) {
+    return value < 10 ? '0' + value : '' + value;
+  }
+
+  // Data local no mesmo formato do evento (AAAA-MM-DD)
+  function localDate() {
+    var now = new Date();
+    return now.getFullYear() + '-' + pad(now.getMonth() + 1) + '-' + pad(now.getDate());
+  }
+
+  function normalize(infirmary) {
+    return (infirmary || '').trim().toLowerCase();
+  }
+
+  function addToCounter(element, delta) {
+    if (element) {
+      element.textContent = Math.max(0, (parseInt(element.textContent, 10) || 0) + delta);
+    }
+  }
+
+  function updateNurse(nurse, delta) {
+    var table = document.getElementById('nurseAppointments');
+    if (!table) {
+      return;
+    }
+    var row = Array.prototype.find.call(table.rows, function(row) {
+      return row.dataset.nurse === nurse;
+    });
+    if (!row) {
+      if (delta < 0) {
+        return;
+      }
+      row = table.insertRow();
+      row.dataset.nurse = nurse;
+      row.insertCell().textContent = nurse;
+      var count = row.insertCell();
+      count.className = 'badge badge-warning ml-5 mr-1 mt-1 mb-1';
+      count.textContent = '0';
+    }
+    addToCounter(row.cells[1], delta);
+  }
+
+  function updateChart(infirmary, delta) {
+    var chart = window.barChart;
+    if (!chart) {
+      return;
+    }
+    var index = chart.data.labels.indexOf(infirmary);
+    if (index < 0) {
+      return;
+    }
+    var data = chart.data.datasets[0].data;
+    data[index] = Math.max(0, data[index] + delta);
+    chart.update();
+  }
+
+  var source = new EventSource(liveDashboardUrl);
+
+  source.addEventListener('appointment', function(message) {
+    var event = JSON.parse(message.data);
+    var today = localDate();
+    var selected = normalize(liveDashboardInfirmary) !== '' && normalize(event.infirmary) === normalize(liveDashboardInfirmary);
+
+    // O gráfico mostra o total de todos os anos
+    updateChart(event.infirmary, event.delta);
+
+    if (event.day.slice(0, 4) !== today.slice(0, 4)) {
+      return;
+    }
+    addToCounter(document.getElementById('totalYear'), event.delta);
+    updateNurse(event.nurse, event.delta);
+    if (selected) {
+      addToCounter(document.getElementById('infirmaryYear'), event.delta);
+    }
+    if (event.day === today) {
+      addToCounter(document.getElementById('totalToday'), event.delta);
+      if (selected) {
+        addToCounter(document.getElementById('infirmaryToday'), event.delta);
+      }
+    }
+  });
+
+  // Eventos perdidos (conexão lenta): os contadores são recarregados
+  source.addEventListener('resync', function() {
+    window.location.reload();
+  });
+
+  // Depois de uma reconexão, os eventos do intervalo foram perdidos
+  var disconnected = false;
+  source.onopen = function() {
+    if (disconnected) {
+      window.location.reload();
+    }
+  };
+
+  source.onerror = function() {
+    disconnected = true;
+    console.error('Conexão de atualizações ao vivo perdida, tentando novamente.');
+  };
+});
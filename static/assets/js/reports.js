@@ -3,8 +3,11 @@ document.addEventListener('DOMContentLoaded', function() {
     const errorMessageContainer = document.getElementById('error-message-container');
     const reportResultsContainer = document.getElementById('report-results-container');
 
-    // Função para enviar o formulário com a página especificada
-    function submitForm(page = 1) {
+    // Posição atual da paginação por cursor (usada para reenviar a página com o total)
+    let currentPosition = { cursor: '', direction: 'next' };
+
+    // Função para enviar o formulário com a posição especificada (cursor ou página)
+    function submitForm(position = {}, withCount = false) {
         // Limpa mensagens de erro anteriores
         errorMessageContainer.innerHTML = '';
 
@@ -46,8 +49,14 @@ document.addEventListener('DOMContentLoaded', function() {
         // Prepara os dados para envio
         const formData = new FormData(reportForm);
 
-        // Adiciona o número da página ao FormData
-        formData.append('page', page);
+        // Paginação por cursor: envia o cursor e a direção em vez do número da página
+        currentPosition = { cursor: position.cursor || '', direction: position.direction || 'next' };
+        formData.append('pagination', 'keyset');
+        formData.append('cursor', currentPosition.cursor);
+        formData.append('direction', currentPosition.direction);
+        if (withCount) {
+            formData.append('with_count', '1');
+        }
 
         // Envia a requisição via AJAX
         fetch(reportForm.action, {
@@ -97,8 +106,28 @@ document.addEventListener('DOMContentLoaded', function() {
         pageLinks.forEach(link => {
             link.addEventListener('click', function(event) {
                 event.preventDefault();
-                const page = this.getAttribute('data-page');
-                submitForm(page);
+                // "Primeira" volta ao início da listagem
+                submitForm();
+            });
+        });
+
+        const cursorLinks = document.querySelectorAll('.page-link.cursor-btn');
+        cursorLinks.forEach(link => {
+            link.addEventListener('click', function(event) {
+                event.preventDefault();
+                submitForm({
+                    cursor: this.getAttribute('data-cursor'),
+                    direction: this.getAttribute('data-direction'),
+                });
+            });
+        });
+
+        // O total só é calculado quando o usuário pede
+        const countLinks = document.querySelectorAll('.count-btn');
+        countLinks.forEach(link => {
+            link.addEventListener('click', function(event) {
+                event.preventDefault();
+                submitForm(currentPosition, true);
             });
         });
     }
@@ -107,8 +136,22 @@ document.addEventListener('DOMContentLoaded', function() {
     reportForm.addEventListener('submit', function(event) {
         event.preventDefault(); // Impede o envio padrão do formulário
 
-        // Envia o formulário com a página 1
-        submitForm(1);
+        // Envia o formulário a partir da primeira página
+        submitForm();
+    });
+
+    // Exportação: envia os mesmos filtros em um POST comum, para o navegador baixar o arquivo
+    document.querySelectorAll('.export-btn').forEach(button => {
+        button.addEventListener('click', function() {
+            const exportInput = document.createElement('input');
+            exportInput.type = 'hidden';
+            exportInput.name = 'export';
+            exportInput.value = this.getAttribute('data-format');
+            reportForm.appendChild(exportInput);
+            reportForm.method = 'post';
+            reportForm.submit();
+            reportForm.removeChild(exportInput);
+        });
     });
 
     // Inicializa os eventos de paginação (caso a página já carregue com resultados)